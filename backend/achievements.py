@@ -0,0 +1,143 @@
+import json
+import threading
+
+import database
+
+# --- Achievements ---
+# Badges live in achievements (one row per distinct badge) and
+# player_achievements (a player's badges in display order). The JSON text an
+# admin submits is decoded once, when the player is written; read snapshots
+# take decoded badge lists from BadgeCache, which reloads only when
+# database.players_version moves.
+
+
+def parse(text):
+    """
+    Decodes the admin's achievements JSON into a list of badge dicts.
+    Raises ValueError if the text is not a JSON list of objects.
+    """
+    if not text or not text.strip():
+        return []
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Achievements must be valid JSON: {e}") from e
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        raise ValueError("Achievements must be a JSON list of objects.")
+    return [
+        {
+            "name": str(item.get("name", "")),
+            "description": str(item.get("description", "")),
+            "icon_url": str(item.get("icon_url", "")),
+        }
+        for item in items
+    ]
+
+
+def set_player(cursor, username, badges):
+    """
+    Replaces a player's badges. Bump database.players_version in the same
+    transaction so every process drops its cached lists.
+    """
+    cursor.execute("DELETE FROM player_achievements WHERE username = ?", (username,))
+    for position, badge in enumerate(badges):
+        cursor.execute(
+            """INSERT INTO achievements (name, description, icon_url) VALUES (?, ?, ?)
+            ON CONFLICT (name, description, icon_url) DO NOTHING""",
+            (badge["name"], badge["description"], badge["icon_url"]),
+        )
+        cursor.execute(
+            """INSERT INTO player_achievements (username, position, achievement_id)
+            SELECT ?, ?, id FROM achievements
+            WHERE name = ? AND description = ? AND icon_url = ?""",
+            (
+                username,
+                position,
+                badge["name"],
+                badge["description"],
+                badge["icon_url"],
+            ),
+        )
+
+
+def import_legacy(conn):
+    """
+    Migration step: moves players.achievements text into the new tables.
+    Malformed text is imported as no badges, as get_data() used to show it.
+    """
+    cursor = conn.cursor()
+    rows = cursor.execute("SELECT username, achievements FROM players").fetchall()
+    for username, text in rows:
+        try:
+            badges = parse(text)
+        except ValueError:
+            badges = []
+        set_player(cursor, username, badges)
+
+
+def load_all(cursor):
+    """
+    Returns {username: [badge, ...]} for every player that has badges.
+    """
+    cursor.execute(
+        """SELECT pa.username, a.id, a.name, a.description, a.icon_url
+        FROM player_achievements pa
+        JOIN achievements a ON a.id = pa.achievement_id
+        ORDER BY pa.username, pa.position"""
+    )
+    badges = {}
+    for username, badge_id, name, description, icon_url in cursor.fetchall():
+        badges.setdefault(username, []).append(
+            {
+                "badge_id": str(badge_id),
+                "name": name,
+                "description": description,
+                "icon_url": icon_url,
+            }
+        )
+    return badges
+
+
+class BadgeCache:
+    """
+    Decoded badge lists per player for the current players_version. The
+    lists are shared between requests and must not be modified.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._badges = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.reloads = 0
+
+    def get(self, conn):
+        version = database.players_version(conn)
+        with self._lock:
+            if version == self._version:
+                self.hits += 1
+                return self._badges
+        badges = load_all(conn.cursor())
+        with self._lock:
+            if self._version is None or self._version <= version:
+                self._version = version
+                self._badges = badges
+                self.reloads += 1
+        return badges
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.reloads
+            return {
+                "name": "achievements",
+                "hits": self.hits,
+                "misses": self.reloads,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "players": len(self._badges),
+            }
+
+    def for_player(self, conn, username):
+        return self.get(conn).get(username, [])
+
+
+cache = BadgeCache()
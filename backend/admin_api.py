@@ -1,22 +1,54 @@
 from flask import Flask, jsonify, request
 import json  # Kept as per user's original imports
+import csv
 import sqlite3
 from flask_cors import CORS
-import time
+import achievements
+import database
+import deploy_queue
+import head_to_head
+import json_stream
+import metrics
+import elo_engine
+import game_store
+import ingest
+import migrations
+import player_ids
+import player_stats
+import rating_sweep
+import read_snapshot
+import replication
+import response_cache
+import write_queue
 import subprocess  # NEW: For running external scripts
 import os  # NEW: For path operations if needed
 
 app = Flask(__name__)
 CORS(app)
+get_data_cache = response_cache.VersionedResponseCache("get_data")
+# The other cached read routes; their keys are fixed, so it stays small.
+api_cache = response_cache.VersionedResponseCache("api")
+metrics.instrument_app(app, "admin")
+metrics.register_cache(get_data_cache)
+metrics.register_cache(api_cache)
 
 # --- Configuration ---
 K = 32  # User's original K-factor for ELO calculation
 db = "./game_database.db"  # User's original database path
 DEFAULT_ELO = 480  # Centralized default ELO
-SCRIPT_PATH = "./scripts/deploy_db.sh"  # Path to your deployment script
+# Path to your deployment script; point DEPLOY_SCRIPT at a stub to test locally
+SCRIPT_PATH = os.environ.get("DEPLOY_SCRIPT", "./scripts/deploy_db.sh")
+# Seconds without new writes before a deploy runs, and the longest a write waits
+DEPLOY_QUIET_PERIOD = float(os.environ.get("DEPLOY_QUIET_PERIOD", "10"))
+DEPLOY_MAX_DELAY = float(os.environ.get("DEPLOY_MAX_DELAY", "120"))
+SNAPSHOT_DIR = "./snapshots"  # Compacted change-log snapshots (see replication.py)
+# Writes arriving this many seconds apart share one transaction (see write_queue.py)
+WRITE_BATCH_WINDOW = float(os.environ.get("WRITE_BATCH_WINDOW", "0.002"))
+WRITE_MAX_BATCH = int(os.environ.get("WRITE_MAX_BATCH", "64"))
 
 
 # --- Helper Function to Trigger Deployment Script ---
+@metrics.timed("trigger_deploy_script")
 def trigger_deploy_script():
     """
     Executes the deploy_db.sh script.
@@ -38,6 +70,12 @@ def trigger_deploy_script():
             )
             return False, f"Script at {SCRIPT_PATH} is not executable."
 
+        # Recent commits may still be in the WAL file, which is not deployed.
+        database.checkpoint(db)
+        snapshot = replication.maybe_snapshot(db, SNAPSHOT_DIR)
+        if snapshot:
+            print(f"Wrote replication snapshot {snapshot}")
+
         # Using shell=False is generally safer if you construct the command list directly
         # If SCRIPT_PATH can contain spaces or special characters, and you use shell=True, be very careful.
         # For a simple script path like "./scripts/deploy_db.sh", shell=True is often used for convenience.
@@ -84,6 +122,25 @@ def trigger_deploy_script():
         return False, str(e)
 
 
+deploys = deploy_queue.DeployQueue(
+    trigger_deploy_script,
+    quiet_period=DEPLOY_QUIET_PERIOD,
+    max_delay=DEPLOY_MAX_DELAY,
+)
+
+# GET routes read from this process's snapshot of db (see read_snapshot.py)
+snapshots = read_snapshot.SnapshotHolder(db)
+metrics.register_cache(snapshots)
+
+# Every mutation below goes through this single writer; see write_queue.py.
+writes = write_queue.WriteQueue(
+    db,
+    window=WRITE_BATCH_WINDOW,
+    max_batch=WRITE_MAX_BATCH,
+    on_commit=snapshots.changed,
+)
+
+
 # --- User's Original ELO Helper Functions (UNCHANGED) ---
 def expected(score_a, score_b):
     return 1 / (1 + 10 ** ((score_b - score_a) / 400))
@@ -96,139 +153,167 @@ def update_elo(winner_elo, loser_elo):  # Kept as is
 
 
 def get_k(username, cursor):
-    cursor.execute(
-        "SELECT COUNT(*) FROM games WHERE p1 = ? OR p2 = ?", (username, username)
-    )
-    count_row = cursor.fetchone()
-    count = count_row[0] if count_row else 0
+    # Reads the maintained games-played counters (all seasons) instead of
+    # scanning games. Callers count the new game first, hence "> 30".
+    count = elo_engine.games_played(cursor, username)
     return 16 if count > 30 else 32
 
 
 # --- REVERTED Recalculate All ELOs Function (to match user's provided logic) ---
+@metrics.timed("recalculate_all_elos")
 def recalculate_all_elos():
     print("Recalculating all ELOs using locked K-factor logic...")
-    conn = None
     try:
-        conn = sqlite3.connect(db)
-        cursor = conn.cursor()
-
-        # Reset all player ELOs to the default before recalculating
-        cursor.execute("UPDATE players SET ELO = ?", (DEFAULT_ELO,))
-
-        # Fetch all games in chronological order
-        cursor.execute("SELECT p1, p2, winner FROM games ORDER BY id ASC")
-        all_games = cursor.fetchall()
-
-        if not all_games:
+        _, game_counts = writes.submit(
+            lambda conn: elo_engine.replay_all(conn, default_elo=DEFAULT_ELO)
+        )
+        if not game_counts:
             print("No games found. ELOs reset to default.")
-            conn.commit()
             return
-
-        game_counts = {}  # Track number of games played per user so far
-
-        for p1_name, p2_name, winner_name in all_games:
-            # Initialize counts if new player
-            game_counts[p1_name] = game_counts.get(p1_name, 0)
-            game_counts[p2_name] = game_counts.get(p2_name, 0)
-
-            # Fetch current ELOs
-            cursor.execute("SELECT ELO FROM players WHERE username = ?", (p1_name,))
-            p1_row = cursor.fetchone()
-            cursor.execute("SELECT ELO FROM players WHERE username = ?", (p2_name,))
-            p2_row = cursor.fetchone()
-
-            if not p1_row or not p2_row:
-                print(
-                    f"Warning: Missing player in game ({p1_name} vs {p2_name}). Skipping."
-                )
-                continue
-
-            p1_elo = p1_row[0]
-            p2_elo = p2_row[0]
-
-            # Determine K-factor based on games played so far
-            k1 = 16 if game_counts[p1_name] >= 30 else 32
-            k2 = 16 if game_counts[p2_name] >= 30 else 32
-
-            exp_p1 = expected(p1_elo, p2_elo)
-            exp_p2 = expected(p2_elo, p1_elo)
-
-            if winner_name == p1_name:
-                p1_elo += k1 * (1 - exp_p1)
-                p2_elo += k2 * (0 - exp_p2)
-            elif winner_name == p2_name:
-                p1_elo += k1 * (0 - exp_p1)
-                p2_elo += k2 * (1 - exp_p2)
-            else:
-                print(
-                    f"Warning: Invalid winner '{winner_name}' in game ({p1_name} vs {p2_name}). Skipping."
-                )
-                continue
-
-            cursor.execute(
-                "UPDATE players SET ELO = ? WHERE username = ?",
-                (round(p1_elo), p1_name),
-            )
-            cursor.execute(
-                "UPDATE players SET ELO = ? WHERE username = ?",
-                (round(p2_elo), p2_name),
-            )
-
-            # Increment game counts after processing
-            game_counts[p1_name] += 1
-            game_counts[p2_name] += 1
-
-        conn.commit()
         print("ELO recalculation complete.")
     except sqlite3.Error as e:
         print(f"SQLite error: {e}")
-        if conn:
-            conn.rollback()
     except Exception as e:
         print(f"Unexpected error: {e}")
-    finally:
-        if conn:
-            conn.close()
+
+
+@metrics.timed("ensure_elos")
+def ensure_elos():
+    # Startup: skips the replay when the ratings on disk were computed from
+    # the current games and players (see elo_engine.ensure_ratings).
+    try:
+        if elo_engine.ensure_ratings(db, default_elo=DEFAULT_ELO):
+            print("ELO recalculation complete.")
+        else:
+            print("Ratings are up to date; skipped the ELO replay.")
+    except sqlite3.Error as e:
+        print(f"SQLite error: {e}")
+
+
+@metrics.timed("recalculate_elos_from")
+def recalculate_elos_from(conn, game_id):
+    # Restores the nearest rating checkpoint before game_id and replays only
+    # the games after it, instead of the whole league history. Runs inside
+    # the calling write job's transaction.
+    print(f"Recalculating ELOs from game {game_id} onward...")
+    elo_engine.replay_from(conn, game_id, default_elo=DEFAULT_ELO)
 
 
 # --- User's Original Get Data Function ---
+# Every season's non-archived games with the all-seasons ratings, served
+# from the read snapshot (see read_snapshot.py).
 def get_data():
-    conn = sqlite3.connect(db)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, p1, p2, winner, date_played, archived, season FROM games WHERE archived = 0 ORDER BY id ASC"
+    return snapshots.get().data()
+
+
+def stream_get_data(dumps=json.dumps):
+    """
+    Same payload as get_data(), serialized in chunks (see json_stream). The
+    rows come from the in-memory snapshot, so this only avoids holding the
+    whole serialized body; memory still grows with the snapshot.
+    """
+    snapshot = snapshots.get()
+    return json_stream.stream_object(
+        [
+            ("games", snapshot.iter_games()),
+            ("players", snapshot.iter_players()),
+        ],
+        dumps,
+    )
+
+
+def stream_export(dumps=json.dumps):
+    """
+    Streams every table row the league is built from: all games (archived
+    and every season included), players, tournaments and tournament games.
+    """
+    return json_stream.stream_query_sections(
+        db,
+        [
+            (
+                "games",
+                "SELECT id, p1, p2, doubles, winner, archived, season, date_played FROM ("
+                + player_ids.GAMES_WITH_NAMES
+                + ") ORDER BY id ASC",
+                (),
+                lambda r: {
+                    "id": r[0],
+                    "p1": r[1],
+                    "p2": r[2],
+                    "doubles": r[3],
+                    "winner": r[4],
+                    "archived": r[5],
+                    "season": r[6],
+                    "date_played": r[7],
+                },
+            ),
+            (
+                "players",
+                "SELECT id, username, description, ELO, achievements FROM players ORDER BY id ASC",
+                (),
+                lambda r: {
+                    "id": r[0],
+                    "username": r[1],
+                    "description": r[2],
+                    "ELO": r[3],
+                    "achievements": r[4],
+                },
+            ),
+            (
+                "achievements",
+                "SELECT id, name, description, icon_url FROM achievements ORDER BY id ASC",
+                (),
+                lambda r: {
+                    "id": r[0],
+                    "name": r[1],
+                    "description": r[2],
+                    "icon_url": r[3],
+                },
+            ),
+            (
+                "player_achievements",
+                "SELECT username, position, achievement_id FROM player_achievements ORDER BY username, position",
+                (),
+                lambda r: {
+                    "username": r[0],
+                    "position": r[1],
+                    "achievement_id": r[2],
+                },
+            ),
+            (
+                "tournaments",
+                f"""SELECT t.id, t.name, t.active, {player_ids.player_name("t.winner")}, t.finished
+                FROM tournaments t ORDER BY t.id ASC""",
+                (),
+                lambda r: {
+                    "id": r[0],
+                    "name": r[1],
+                    "active": r[2],
+                    "winner": r[3],
+                    "finished": r[4],
+                },
+            ),
+            (
+                "tournament_games",
+                f"""SELECT g.id, g.tournament_id, g.round,
+                    {player_ids.player_name("g.player_one")},
+                    {player_ids.player_name("g.player_two")},
+                    {player_ids.player_name("g.winner")}, g.finished
+                FROM tournament_games g ORDER BY g.id ASC""",
+                (),
+                lambda r: {
+                    "id": r[0],
+                    "tournament_id": r[1],
+                    "round": r[2],
+                    "player_one": r[3],
+                    "player_two": r[4],
+                    "winner": r[5],
+                    "finished": r[6],
+                },
+            ),
+        ],
+        dumps,
     )
-    all_games_rows = cursor.fetchall()
-    games_list = []
-    for row in all_games_rows:
-        id_val, p1_val, p2_val, winner_val, timestamp_val, archived_val, season_val = (
-            row
-        )
-        if not archived_val:
-            games_list.append(
-                {
-                    "id": id_val,
-                    "players": [p1_val, p2_val],
-                    "winner": winner_val,
-                    "date": timestamp_val,
-                    "season": season_val,
-                }
-            )
-    players_list = []
-    cursor.execute("SELECT username, ELO, description, achievements FROM players")
-    all_players_rows = cursor.fetchall()
-    for username_val, elo_val, desc_val, achieve_val in all_players_rows:
-        players_list.append(
-            {
-                "username": username_val,
-                "elo": elo_val,
-                "description": desc_val,
-                "achievements": achieve_val,
-            }
-        )
-    obj = {"players": players_list, "games": games_list}
-    conn.close()
-    return obj
 
 
 # --- User's Original Routes ---
@@ -236,15 +321,14 @@ def get_data():
 @app.route("/get_data", methods=["GET"])
 def get_data_route():
     try:
-        obj = get_data()
-        return jsonify(obj), 200
-    except sqlite3.Error as e:
-        print(f"Database error in get_data_route: {e}")
-        return (
-            jsonify(
-                {"error": "Failed to retrieve data from database", "details": str(e)}
-            ),
-            500,
+        # ?stream=1 skips the cache and writes the payload incrementally.
+        if request.args.get("stream", type=int):
+            return app.response_class(
+                stream_get_data(app.json.dumps), mimetype="application/json"
+            )
+        snapshot = snapshots.get()
+        return response_cache.cached_json_response(
+            get_data_cache, "all", snapshot.version, snapshot.data
         )
     except Exception as e:
         print(f"Unexpected error in get_data_route: {e}")
@@ -265,52 +349,50 @@ def add_player_route():
         return jsonify({"error": "Username is required"}), 400
     username = data["username"].strip()
     description = data.get("description", "").strip()
-    achievements = data.get("achievements", "").strip()
+    achievements_text = data.get("achievements", "").strip()
     elo = data.get("ELO", DEFAULT_ELO)
     try:
         elo = int(elo)
     except ValueError:
         return jsonify({"error": "ELO must be a valid number."}), 400
-
-    conn = None
     try:
-        conn = sqlite3.connect(db)
+        badges = achievements.parse(achievements_text)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def insert_player(conn):
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO players (username, description, ELO, achievements) VALUES (?, ?, ?, ?)",
-            (username, description, elo, achievements),
+            (username, description, elo, achievements_text),
         )
-        conn.commit()
-        new_player_id = cursor.lastrowid
+        player_id = cursor.lastrowid
+        achievements.set_player(cursor, username, badges)
+        replication.log_player(cursor, player_id)
+        database.bump_players_version(conn)
+        # Games naming a player who did not exist yet were skipped when the
+        # rating checkpoints were taken, so they no longer match a full replay.
+        elo_engine.clear_checkpoints(conn)
+        database.bump_data_version(conn)
+        return player_id
 
-        # Trigger deployment script
-        script_success, script_output = trigger_deploy_script()
-        if not script_success:
-            print(
-                f"Warning: Deployment script failed after adding player: {script_output}"
-            )
-            # Decide if this should be a hard error for the user or just a logged warning
-            # For now, we'll still return success for the player addition.
+    try:
+        new_player_id = writes.submit(insert_player)
+
+        # Deploy in the background once this burst of writes settles
+        deploys.request("add_player")
 
         return (
             jsonify(
                 {
-                    "message": "Player added successfully."
-                    + (
-                        " Deployment script triggered."
-                        if script_success
-                        else " Deployment script failed."
-                    ),
+                    "message": "Player added successfully. Deployment queued.",
                     "player": {
                         "id": new_player_id,
                         "username": username,
                         "description": description,
                         "ELO": elo,
-                        "achievements": achievements,
+                        "achievements": badges,
                     },
-                    "script_output": (
-                        script_output if not script_success else None
-                    ),  # Optionally include script output on failure
                 }
             ),
             201,
@@ -320,9 +402,6 @@ def add_player_route():
     except sqlite3.Error as e:
         print(f"Database error in add_player_route: {e}")
         return jsonify({"error": "Database operation failed"}), 500
-    finally:
-        if conn:
-            conn.close()
 
 
 # --- Add Single Game Route (MODIFIED to trigger script) ---
@@ -352,29 +431,31 @@ def add_game_route():
     if winner_name not in [p1_name, p2_name]:
         return jsonify({"error": "Winner must be one of the players"}), 400
 
-    conn = None
-    try:
-        conn = sqlite3.connect(db)
+    def insert_game(conn):
         cursor = conn.cursor()
+        # Raises PlayerNotFound, which rolls the job back, for an unknown name.
+        ids = player_ids.require_ids(cursor, (p1_name, p2_name))
         cursor.execute(
-            "INSERT INTO games (p1, p2, doubles, winner, archived, season, date_played) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (p1_name, p2_name, doubles, winner_name, archived, season, date_played),
+            "INSERT INTO games (p1_id, p2_id, doubles, winner_id, archived, season, date_played) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (ids[p1_name], ids[p2_name], doubles, ids[winner_name], archived, season, date_played),
+        )
+        game_id = cursor.lastrowid
+        replication.log_game(cursor, game_id)
+        elo_engine.adjust_fingerprint(cursor, added=elo_engine.fingerprint_rows(cursor, [game_id]))
+        elo_engine.count_game(cursor, p1_name, p2_name, season)
+        player_stats.record_game(
+            cursor, p1_name, p2_name, winner_name, season, archived
+        )
+        head_to_head.record_game(
+            cursor, p1_name, p2_name, winner_name, season, date_played, game_id, archived
         )
 
-        p1_elo_row = cursor.execute(
-            "SELECT ELO FROM players WHERE username = ?", (p1_name,)
-        ).fetchone()
-        p2_elo_row = cursor.execute(
-            "SELECT ELO FROM players WHERE username = ?", (p2_name,)
-        ).fetchone()
-        if not p1_elo_row or not p2_elo_row:
-            conn.rollback()
-            return (
-                jsonify({"error": "Player not found for ELO update. Game not added."}),
-                500,
-            )
-
-        p1_elo_b, p2_elo_b = p1_elo_row[0], p2_elo_row[0]
+        p1_elo_b = cursor.execute(
+            "SELECT ELO FROM players WHERE id = ?", (ids[p1_name],)
+        ).fetchone()[0]
+        p2_elo_b = cursor.execute(
+            "SELECT ELO FROM players WHERE id = ?", (ids[p2_name],)
+        ).fetchone()[0]
         k1, k2 = get_k(p1_name, cursor), get_k(p2_name, cursor)
         exp_p1, exp_p2 = expected(p1_elo_b, p2_elo_b), expected(p2_elo_b, p1_elo_b)
         if winner_name == p1_name:
@@ -386,174 +467,168 @@ def add_game_route():
                 1 - exp_p2
             )
         cursor.execute(
-            "UPDATE players SET ELO = ? WHERE username = ?", (round(p1_elo_a), p1_name)
+            "UPDATE players SET ELO = ? WHERE id = ?", (round(p1_elo_a), ids[p1_name])
         )
         cursor.execute(
-            "UPDATE players SET ELO = ? WHERE username = ?", (round(p2_elo_a), p2_name)
+            "UPDATE players SET ELO = ? WHERE id = ?", (round(p2_elo_a), ids[p2_name])
         )
-        conn.commit()
+        elo_engine.record_history(
+            cursor,
+            [
+                (game_id, p1_name, p1_elo_b, round(p1_elo_a), k1),
+                (game_id, p2_name, p2_elo_b, round(p2_elo_a), k2),
+            ],
+        )
+        elo_engine.apply_season_games(
+            cursor, [(game_id, p1_name, p2_name, winner_name, season)], DEFAULT_ELO
+        )
+        database.bump_data_version(conn)
 
-        script_success, script_output = trigger_deploy_script()
-        if not script_success:
-            print(
-                f"Warning: Deployment script failed after adding game: {script_output}"
-            )
+    try:
+        writes.submit(insert_game)
+
+        deploys.request("add_game")
 
         return (
-            jsonify(
-                {
-                    "message": "Game added, ELOs updated."
-                    + (
-                        " Deployment script triggered."
-                        if script_success
-                        else " Deployment script failed."
-                    )
-                }
-            ),
+            jsonify({"message": "Game added, ELOs updated. Deployment queued."}),
             201,
         )
+    except player_ids.PlayerNotFound:
+        return (
+            jsonify({"error": "Player not found for ELO update. Game not added."}),
+            500,
+        )
     except sqlite3.Error as e:
-        if conn:
-            conn.rollback()
         print(f"Database error in add_game_route: {e}")
         return jsonify({"error": "Database operation failed"}), 500
-    finally:
-        if conn:
-            conn.close()
 
 
-# --- Add Multiple Games Route (MODIFIED to trigger script) ---
-@app.route("/add_multiple_games", methods=["POST"])
-@app.route("/api/add_multiple_games", methods=["POST"])
-def add_multiple_games_route():
-    data = request.get_json()
-    games_to_add = data.get("games")
-    use_current_time_for_batch = data.get("use_current_time", False)
+# --- Bulk Game Ingestion (see ingest.py) ---
+def ingest_games(games, use_current_time, route_name):
+    """
+    Validates and inserts a whole batch in one transaction. Returns a Flask
+    response tuple.
+    """
 
-    if not isinstance(games_to_add, list) or not games_to_add:
-        return (
-            jsonify({"error": "Request must include a non-empty list of games."}),
-            400,
-        )
+    def insert_games(conn):
+        # Reads games (a streamed upload, for import_games) batch by batch.
+        # A BatchError in any batch rolls the job back, so the upload is
+        # still added whole or not at all.
+        game_ids = ingest.ingest_batches(conn.cursor(), games, use_current_time, DEFAULT_ELO)
+        database.bump_data_version(conn)
+        return game_ids
 
-    conn = None
-    processed_games_count = 0
     try:
-        conn = sqlite3.connect(db)
-        cursor = conn.cursor()
-        for game_data in games_to_add:
-            p1_name, p2_name = game_data.get("p1"), game_data.get("p2")
-            winner_name, season_str = game_data.get("winner"), str(
-                game_data.get("season")
-            )
-            try:
-                season = int(season_str)
-            except ValueError:
-                raise ValueError(f"Invalid season in game: {game_data}")
-            if season <= 0:
-                raise ValueError(f"Season must be positive: {game_data}")
-            if not all([p1_name, p2_name, winner_name]):
-                raise ValueError(f"Missing data: {game_data}")
-            if p1_name == p2_name:
-                raise ValueError(f"Players same: {game_data}")
-            if winner_name not in [p1_name, p2_name]:
-                raise ValueError(f"Winner invalid: {game_data}")
-
-            date_played = (
-                int(time.time())
-                if use_current_time_for_batch
-                else game_data.get("date_played", None)
-            )
-            cursor.execute(
-                "INSERT INTO games (p1, p2, doubles, winner, archived, season, date_played) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (p1_name, p2_name, 0, winner_name, 0, season, date_played),
-            )
-            p1r, p2r = (
-                cursor.execute(
-                    "SELECT ELO FROM players WHERE username=?", (p1_name,)
-                ).fetchone(),
-                cursor.execute(
-                    "SELECT ELO FROM players WHERE username=?", (p2_name,)
-                ).fetchone(),
-            )
-            if not p1r or not p2r:
-                raise ValueError(f"Player not found for ELO: {game_data}")
-            p1eb, p2eb = p1r[0], p2r[0]
-            k1, k2 = get_k(p1_name, cursor), get_k(p2_name, cursor)
-            e1, e2 = expected(p1eb, p2eb), expected(p2eb, p1eb)
-            if winner_name == p1_name:
-                p1ea, p2ea = p1eb + k1 * (1 - e1), p2eb + k2 * (0 - e2)
-            else:
-                p1ea, p2ea = p1eb + k1 * (0 - e1), p2eb + k2 * (1 - e2)
-            cursor.execute(
-                "UPDATE players SET ELO=? WHERE username=?", (round(p1ea), p1_name)
-            )
-            cursor.execute(
-                "UPDATE players SET ELO=? WHERE username=?", (round(p2ea), p2_name)
-            )
-            processed_games_count += 1
-        conn.commit()
+        game_ids = writes.submit(insert_games)
 
-        script_success, script_output = trigger_deploy_script()
-        if not script_success:
-            print(
-                f"Warning: Deployment script failed after adding multiple games: {script_output}"
-            )
+        deploys.request(route_name)
 
         return (
             jsonify(
                 {
-                    "message": f"Added {processed_games_count} games, ELOs updated."
-                    + (
-                        " Deployment script triggered."
-                        if script_success
-                        else " Deployment script failed."
-                    )
+                    "message": f"Added {len(game_ids)} games, ELOs updated. Deployment queued.",
+                    "first_game_id": game_ids[0],
+                    "last_game_id": game_ids[-1],
                 }
             ),
             201,
         )
-    except ValueError as e:
-        if conn:
-            conn.rollback()
+    except ingest.BatchError as e:
+        return (
+            jsonify(
+                {
+                    "error": str(e),
+                    "errors": [
+                        {"game": index, "error": message} for index, message in e.errors
+                    ],
+                }
+            ),
+            400,
+        )
+    except (ValueError, csv.Error) as e:
         return jsonify({"error": str(e)}), 400
     except sqlite3.Error as e:
-        if conn:
-            conn.rollback()
-        print(f"Database error in add_multiple_games_route: {e}")
+        print(f"Database error in {route_name}_route: {e}")
         return (
             jsonify({"error": "A database error occurred processing the batch."}),
             500,
         )
-    finally:
-        if conn:
-            conn.close()
+
+
+# --- Add Multiple Games Route (MODIFIED to trigger script) ---
+@app.route("/add_multiple_games", methods=["POST"])
+@app.route("/api/add_multiple_games", methods=["POST"])
+def add_multiple_games_route():
+    data = request.get_json()
+    games_to_add = data.get("games")
+    use_current_time_for_batch = data.get("use_current_time", False)
+
+    if not isinstance(games_to_add, list) or not games_to_add:
+        return (
+            jsonify({"error": "Request must include a non-empty list of games."}),
+            400,
+        )
+    return ingest_games(games_to_add, use_current_time_for_batch, "add_multiple_games")
+
+
+# --- Streamed Import of Historical Games ---
+# POST NDJSON (application/x-ndjson, one game object per line) or CSV
+# (text/csv, header row p1,p2,winner,season[,date_played]) as the request
+# body; the upload is parsed as it streams in, ingest.BATCH_SIZE games at a
+# time, by the write job.
+@app.route("/api/import_games", methods=["POST"])
+def import_games_route():
+    content_type = request.mimetype
+    stream = ingest.text_stream(request.stream)
+    if content_type in ("application/x-ndjson", "application/ndjson"):
+        games = ingest.parse_ndjson(stream)
+    elif content_type == "text/csv":
+        games = ingest.parse_csv(stream)
+    else:
+        return (
+            jsonify({"error": "Send application/x-ndjson or text/csv."}),
+            415,
+        )
+    use_current_time = request.args.get("use_current_time", type=int) == 1
+    return ingest_games(games, use_current_time, "import_games")
 
 
 # --- Delete (Hard Delete) a Game Route ---
-# This route calls recalculate_all_elos(), which will handle its own script trigger if you add it there.
-# Or, if deploy script should run specifically after delete, call trigger_deploy_script() here too.
+# The write job calls recalculate_elos_from(), which replays only the games after the deleted one.
 @app.route("/api/game/<int:game_id>", methods=["DELETE"])
 @app.route("/game/<int:game_id>", methods=["DELETE"])
 def delete_game_route(game_id):
-    conn = None
-    try:
-        conn = sqlite3.connect(db)
+    def delete_game(conn):
         cursor = conn.cursor()
-        cursor.execute("SELECT id FROM games WHERE id = ?", (game_id,))
+        cursor.execute(
+            "SELECT p1, p2, season, winner, archived FROM ("
+            + player_ids.GAMES_WITH_NAMES
+            + ") WHERE id = ?",
+            (game_id,),
+        )
         game = cursor.fetchone()
         if not game:
-            return jsonify({"error": "Game not found."}), 404
+            return False
 
+        removed = elo_engine.fingerprint_rows(cursor, [game_id])
         cursor.execute("DELETE FROM games WHERE id = ?", (game_id,))
-        conn.commit()
-        print(f"Game with ID {game_id} has been permanently deleted.")
+        replication.log_game_deleted(cursor, game_id)
+        elo_engine.adjust_fingerprint(cursor, removed=removed)
+        elo_engine.count_game(cursor, game[0], game[1], game[2], delta=-1)
+        player_stats.record_game(
+            cursor, game[0], game[1], game[3], game[2], game[4], delta=-1
+        )
+        head_to_head.refresh_pair(cursor, game[0], game[1], game[2])
+        elo_engine.refresh_season(conn, game[2], DEFAULT_ELO)
+        recalculate_elos_from(conn, game_id)
+        database.bump_data_version(conn)
+        return True
 
-        recalculate_all_elos()
-        # If you want to trigger deploy script specifically after a delete and recalc:
-        script_success, script_output = trigger_deploy_script()
-        if not script_success:
-            print(f"Warning: Deploy script failed after delete: {script_output}")
+    try:
+        if not writes.submit(delete_game):
+            return jsonify({"error": "Game not found."}), 404
+        print(f"Game with ID {game_id} has been permanently deleted.")
+        deploys.request("delete_game")
 
         return (
             jsonify(
@@ -564,17 +639,12 @@ def delete_game_route(game_id):
             200,
         )
     except sqlite3.Error as e:
-        if conn:
-            conn.rollback()
         print(f"Database error in delete_game_route: {e}")
         return jsonify({"error": "Database operation failed during delete."}), 500
-    finally:
-        if conn:
-            conn.close()
 
 
 # --- Update/Edit a Game Route ---
-# This route calls recalculate_all_elos().
+# The write job calls recalculate_elos_from().
 @app.route("/api/game/<int:game_id>", methods=["PUT"])
 @app.route("/game/<int:game_id>", methods=["PUT"])
 def update_game_route(game_id):
@@ -595,79 +665,96 @@ def update_game_route(game_id):
     if winner_name not in [p1_name, p2_name]:
         return jsonify({"error": "Winner must be one of the players"}), 400
 
-    conn = None
-    try:
-        conn = sqlite3.connect(db)
+    def update_game(conn):
         cursor = conn.cursor()
-        cursor.execute("SELECT id FROM games WHERE id = ?", (game_id,))
-        if not cursor.fetchone():
-            return jsonify({"error": "Game not found."}), 404
+        cursor.execute(
+            "SELECT p1, p2, season, winner, archived FROM ("
+            + player_ids.GAMES_WITH_NAMES
+            + ") WHERE id = ?",
+            (game_id,),
+        )
+        old_game = cursor.fetchone()
+        if not old_game:
+            return False
 
+        ids = player_ids.require_ids(cursor, (p1_name, p2_name))
+        removed = elo_engine.fingerprint_rows(cursor, [game_id])
         cursor.execute(
-            "UPDATE games SET p1 = ?, p2 = ?, winner = ?, season = ? WHERE id = ?",
-            (p1_name, p2_name, winner_name, season, game_id),
+            """UPDATE games SET p1_id = ?, p2_id = ?, winner_id = ?, season = ?,
+                p1_unmatched_id = NULL, p2_unmatched_id = NULL, winner_unmatched_id = NULL
+            WHERE id = ?""",
+            (ids[p1_name], ids[p2_name], ids[winner_name], season, game_id),
+        )
+        replication.log_game(cursor, game_id, "game_updated")
+        elo_engine.adjust_fingerprint(
+            cursor, removed=removed, added=elo_engine.fingerprint_rows(cursor, [game_id])
+        )
+        elo_engine.count_game(cursor, old_game[0], old_game[1], old_game[2], delta=-1)
+        elo_engine.count_game(cursor, p1_name, p2_name, season)
+        player_stats.record_game(
+            cursor, old_game[0], old_game[1], old_game[3], old_game[2], old_game[4], -1
         )
-        conn.commit()
+        player_stats.record_game(
+            cursor, p1_name, p2_name, winner_name, season, old_game[4]
+        )
+        head_to_head.refresh_pair(cursor, old_game[0], old_game[1], old_game[2])
+        head_to_head.refresh_pair(cursor, p1_name, p2_name, season)
+        for affected_season in {old_game[2], season}:
+            elo_engine.refresh_season(conn, affected_season, DEFAULT_ELO)
+        recalculate_elos_from(conn, game_id)
+        database.bump_data_version(conn)
+        return True
+
+    try:
+        if not writes.submit(update_game):
+            return jsonify({"error": "Game not found."}), 404
         print(f"Game with ID {game_id} has been updated.")
-        recalculate_all_elos()
-        # If you want to trigger deploy script specifically after an edit and recalc:
-        # script_success, script_output = trigger_deploy_script()
-        # if not script_success: print(f"Warning: Deploy script failed after edit: {script_output}")
+        deploys.request("update_game")
 
         return jsonify({"message": f"Game {game_id} updated, ELOs recalculated."}), 200
+    except player_ids.PlayerNotFound as e:
+        return jsonify({"error": str(e)}), 400
     except sqlite3.Error as e:
-        if conn:
-            conn.rollback()
         print(f"Database error in update_game_route: {e}")
         return jsonify({"error": "Database operation failed during update."}), 500
-    finally:
-        if conn:
-            conn.close()
+
+
+@app.route("/admin/metrics", methods=["GET"])
+def metrics_route():
+    # Prometheus text format; numbers are per process (per gunicorn worker).
+    return metrics.response()
+
+
+@app.route("/admin/cache_stats", methods=["GET"])
+def cache_stats_route():
+    caches = [get_data_cache.stats(), api_cache.stats(), snapshots.stats()]
+    return jsonify({"caches": caches}), 200
 
 
 # --- Tournament Endpoints (Placeholders) ---
 @app.route("/get_tournaments", methods=["GET"])
 @app.route("/api/get_tournaments", methods=["GET"])
 def get_tournaments():
-    conn = sqlite3.connect(db)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, active, winner FROM tournaments")
-    rows = cursor.fetchall()
-    conn.close()
-    tournaments = [
-        {"id": r[0], "name": r[1], "active": bool(r[2]), "winner": r[3]} for r in rows
-    ]
-    return jsonify({"tournaments": tournaments}), 200
+    snapshot = snapshots.get()
+    return response_cache.cached_json_response(
+        api_cache,
+        "tournaments",
+        snapshot.version,
+        lambda: {"tournaments": snapshot.tournament_list()},
+    )
 
 
 @app.route("/tournament/<int:tournament_id>", methods=["GET"])
 @app.route("/api/tournament/<int:tournament_id>", methods=["GET"])
 def get_tournament(tournament_id):
-    conn = sqlite3.connect(db)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT name, active, winner, finished FROM tournaments WHERE id = ?",
-        (tournament_id,),
-    )
-    tr = cursor.fetchone()
-    if not tr:
-        conn.close()
+    tournament = snapshots.get().tournament(tournament_id)
+    if not tournament:
         return jsonify({"error": "Tournament not found"}), 404
-    if not tr[1] and not tr[3]:
-        conn.close()
+    name, active, winner, finished, rounds = tournament
+    if not active and not finished:
         return jsonify({"message": "Tournament has not started yet"})
-    cursor.execute(
-        "SELECT player_one, player_two, winner, finished, round FROM tournament_games WHERE tournament_id = ? ORDER BY round ASC, id ASC",
-        (tournament_id,),
-    )
-    gd, rs = {}, cursor.fetchall()
-    for grd in gd:
-        r_num = grd[4]
-        rs.setdefault(r_num, []).append([grd[0], grd[1], grd[2], bool(grd[3])])
-    rsl = [rs[rn] for rn in sorted(rs.keys())]
-    conn.close()
     return (
-        jsonify({"name": tr[0], "active": bool(tr[1]), "winner": tr[2], "rounds": rsl}),
+        jsonify({"name": name, "active": bool(active), "winner": winner, "rounds": rounds}),
         200,
     )
 
@@ -680,15 +767,110 @@ def trigger_recalculate_elos():
     return jsonify({"message": "Full ELO recalculation initiated."}), 200
 
 
+# Admin Route to check the games-played counters against a fresh replay
+@app.route("/admin/check_game_counts", methods=["GET"])
+def check_game_counts_route():
+    conn = None
+    try:
+        conn = database.connect_readonly(db)
+        cursor = conn.cursor()
+        games = game_store.GameStore.load(cursor)
+        usernames = elo_engine.load_usernames(cursor)
+        _, game_counts = elo_engine.replay(games, usernames, DEFAULT_ELO)
+        mismatches = elo_engine.compare_game_counts(cursor, game_counts)
+        return (
+            jsonify(
+                {
+                    "consistent": not mismatches,
+                    "mismatches": {
+                        username: {"counter": counter, "replay": replayed}
+                        for username, (counter, replayed) in mismatches.items()
+                    },
+                }
+            ),
+            200,
+        )
+    except sqlite3.Error as e:
+        print(f"Database error in check_game_counts_route: {e}")
+        return jsonify({"error": "Database operation failed"}), 500
+    finally:
+        if conn:
+            database.release(conn)
+
+
+# Admin Route to compare rating parameters against the game history
+timed_rating_sweep = metrics.timed("rating_sweep")(rating_sweep.run)
+
+
+@app.route("/admin/rating_sweep", methods=["POST"])
+def rating_sweep_route():
+    data = request.get_json(silent=True) or {}
+    try:
+        values = {
+            name: rating_sweep.parse_values(data[name])
+            for name in rating_sweep.PARAMETERS
+            if data.get(name) is not None
+        }
+        season = int(data["season"]) if data.get("season") is not None else None
+        warmup = int(data.get("warmup", 0))
+        top = int(data.get("top", 20))
+        configs, games, results = timed_rating_sweep(db, values, season, warmup)
+    except (TypeError, ValueError, OverflowError) as e:
+        return jsonify({"error": str(e)}), 400
+    except sqlite3.Error as e:
+        print(f"Database error in rating_sweep_route: {e}")
+        return jsonify({"error": "Database operation failed"}), 500
+    current = next((r for r in results if r["current"]), None)
+    return (
+        jsonify(
+            {
+                "configs": configs,
+                "games": games,
+                "current": current,
+                "current_rank": results.index(current) + 1 if current else None,
+                "results": results[:top],
+            }
+        ),
+        200,
+    )
+
+
+# Admin Route for the single-writer queue's batching counters
+@app.route("/admin/write_status", methods=["GET"])
+def write_status_route():
+    return jsonify(writes.status()), 200
+
+
+# Admin Routes for the background deploy queue
+@app.route("/admin/deploy_status", methods=["GET"])
+def deploy_status_route():
+    return jsonify(deploys.status()), 200
+
+
+@app.route("/admin/deploy", methods=["POST"])
+def deploy_now_route():
+    # Skips the quiet period; still never overlaps a running deploy.
+    deploys.request("manual")
+    deploys.flush(timeout=0)
+    return jsonify(deploys.status()), 202
+
+
+# Admin Route to download a full JSON export, streamed in chunks
+@app.route("/admin/export", methods=["GET"])
+def export_route():
+    response = app.response_class(
+        stream_export(app.json.dumps), mimetype="application/json"
+    )
+    response.headers["Content-Disposition"] = "attachment; filename=league_export.json"
+    return response
+
+
 # Admin Route to VACUUM Database
 @app.route("/admin/vacuum_db", methods=["POST"])
 def vacuum_db_route():
     print("Admin request to VACUUM the database.")
-    conn = None
     try:
-        conn = sqlite3.connect(db)
-        conn.execute("VACUUM")
-        conn.commit()
+        writes.submit(lambda conn: conn.execute("VACUUM"), exclusive=True)
         message = "Database VACUUM operation completed successfully."
         print(message)
         return jsonify({"message": message}), 200
@@ -696,13 +878,13 @@ def vacuum_db_route():
         message = f"Database error during VACUUM: {e}"
         print(message)
         return jsonify({"error": message}), 500
-    finally:
-        if conn:
-            conn.close()
 
 
-# Global call to recalculate ELOs from user's original code.
-# This runs on every Flask dev server reload. Consider moving to an admin-triggered route.
-recalculate_all_elos()
+database.init(db)
+migrations.migrate(db)
+
+ensure_elos()
+snapshots.load()
 
-app.run(host="0.0.0.0", port=3000, debug=True)
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=3000, debug=True)
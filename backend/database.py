@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import threading
+
+import metrics
+
+# --- Shared Database Access ---
+# Each thread keeps one read-write and one read-only connection per database
+# file and reuses them across requests instead of connecting per request.
+# The database runs in WAL mode so readers never block on the writer (or on
+# an ELO replay), and the other pragmas trade a little durability on power
+# loss for far fewer fsyncs: with synchronous=NORMAL a crash can lose the
+# last commits but never corrupts the database. Foreign keys are enforced,
+# so a game cannot name a player id that does not exist.
+
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16 * 1024  # Page cache per connection
+MMAP_SIZE = 64 * 1024 * 1024
+
+_local = threading.local()
+
+
+def _apply_pragmas(conn):
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    metrics.instrument_connection(conn)
+
+
+def init(db_path):
+    """
+    Switches the database to WAL mode. The setting is stored in the file, so
+    this only needs to run once per startup, before any read-only connects.
+    """
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if mode.lower() != "wal":
+            print(f"Warning: could not enable WAL mode, journal_mode is {mode}")
+    finally:
+        conn.close()
+
+
+def _connections():
+    # Connections must not be shared with a forked child (e.g. a gunicorn
+    # worker forked after the app was imported).
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+    return _local.connections
+
+
+def connect(db_path):
+    """
+    Returns this thread's read-write connection to db_path.
+    Hand it back with release() instead of closing it.
+    """
+    connections = _connections()
+    key = (db_path, False)
+    conn = connections.get(key)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        _apply_pragmas(conn)
+        connections[key] = conn
+    return conn
+
+
+def connect_readonly(db_path):
+    """
+    Returns this thread's read-only connection to db_path. Writes through it
+    fail with sqlite3.OperationalError.
+    """
+    connections = _connections()
+    key = (db_path, True)
+    conn = connections.get(key)
+    if conn is None:
+        conn = open_readonly(db_path)
+        connections[key] = conn
+    return conn
+
+
+def open_readonly(db_path):
+    """
+    Opens a new, unpooled read-only connection. The caller closes it; used
+    for long-running reads such as streamed exports.
+    """
+    uri = "file:" + os.path.abspath(db_path) + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+    _apply_pragmas(conn)
+    return conn
+
+
+def release(conn):
+    """
+    Ends a request's use of a pooled connection. Anything left uncommitted
+    (an early return or an exception) is rolled back so the next request
+    starts clean and the write lock is not held.
+    """
+    if conn.in_transaction:
+        conn.rollback()
+
+
+# --- Data Version ---
+# A single counter bumped by every write path (games, players, replays) in the
+# same transaction as the write. Readers in any process compare it to decide
+# whether cached responses are still current.
+def data_version(conn):
+    row = conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def bump_data_version(conn):
+    conn.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+
+
+def players_version(conn):
+    """
+    Like data_version, but only moves when a player record changes.
+    """
+    row = conn.execute("SELECT players_version FROM data_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def bump_players_version(conn):
+    conn.execute(
+        "UPDATE data_version SET players_version = players_version + 1 WHERE id = 1"
+    )
+
+
+def checkpoint(db_path):
+    """
+    Copies everything in the WAL back into the main database file, so the
+    file alone is complete (deploy_db.sh ships only game_database.db).
+    """
+    conn = connect(db_path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def close_all():
+    """
+    Closes every connection this thread holds, e.g. before deleting a
+    temporary database.
+    """
+    connections = _connections()
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
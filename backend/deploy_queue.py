@@ -0,0 +1,139 @@
+import threading
+import time
+
+# --- Deploy Queue ---
+# Write routes call request() and return immediately. One background worker
+# waits until no request has arrived for quiet_period seconds (or
+# max_delay seconds have passed since the first pending one, so a steady
+# stream of writes cannot postpone the deploy forever), then runs the
+# deploy once for the whole burst. Requests that arrive while a deploy is
+# running are picked up by the next run, so two deploys never overlap.
+
+OUTPUT_LIMIT = 4000  # Characters of script output kept in status()
+
+
+class DeployQueue:
+    def __init__(self, run, quiet_period=10.0, max_delay=120.0):
+        """
+        run() performs one deploy and returns (success, output), like
+        admin_api.trigger_deploy_script().
+        """
+        self.run = run
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._worker = None
+        self._pending = 0
+        self._first_requested_at = None
+        self._last_requested_at = None
+        self._last_reason = ""
+        self._running = False
+        self._flush = False
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+
+    def request(self, reason=""):
+        with self._cond:
+            now = time.time()
+            self._pending += 1
+            if self._first_requested_at is None:
+                self._first_requested_at = now
+            self._last_requested_at = now
+            self._last_reason = reason
+            self._ensure_worker()
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Runs any pending deploy now instead of after the quiet period, and
+        waits until the queue is idle. Returns False on timeout.
+        """
+        with self._cond:
+            if self._pending:
+                self._flush = True
+                self._ensure_worker()
+                self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: not self._pending and not self._running, timeout
+            )
+
+    def status(self):
+        with self._cond:
+            if self._running:
+                state = "running"
+            elif self._pending:
+                state = "pending"
+            else:
+                state = "idle"
+            due_at = self._due_at() if self._pending else None
+            return {
+                "state": state,
+                "pending_requests": self._pending,
+                "first_requested_at": self._first_requested_at,
+                "last_requested_at": self._last_requested_at,
+                "due_at": due_at,
+                "quiet_period": self.quiet_period,
+                "max_delay": self.max_delay,
+                "runs": self.runs,
+                "failures": self.failures,
+                "last_run": self.last_run,
+            }
+
+    def _ensure_worker(self):
+        # Started lazily so importing the app (or the reloader's parent
+        # process) does not leave an idle thread behind.
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._work, name="deploy-queue", daemon=True
+            )
+            self._worker.start()
+
+    def _due_at(self):
+        return min(
+            self._last_requested_at + self.quiet_period,
+            self._first_requested_at + self.max_delay,
+        )
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                while not self._flush:
+                    remaining = self._due_at() - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                coalesced = self._pending
+                requested_at = self._first_requested_at
+                reason = self._last_reason
+                self._pending = 0
+                self._first_requested_at = None
+                self._last_requested_at = None
+                self._flush = False
+                self._running = True
+
+            started_at = time.time()
+            try:
+                success, output = self.run()
+            except Exception as e:
+                success, output = False, f"Deploy raised {e!r}"
+            finished_at = time.time()
+
+            with self._cond:
+                self._running = False
+                self.runs += 1
+                if not success:
+                    self.failures += 1
+                    print(f"Warning: Deployment script failed: {output}")
+                self.last_run = {
+                    "success": success,
+                    "requests_coalesced": coalesced,
+                    "last_reason": reason,
+                    "first_requested_at": requested_at,
+                    "started_at": started_at,
+                    "finished_at": finished_at,
+                    "duration": finished_at - started_at,
+                    "output": (output or "")[-OUTPUT_LIMIT:],
+                }
+                self._cond.notify_all()
@@ -0,0 +1,710 @@
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import database
+import game_store
+import head_to_head
+import player_ids
+import player_stats
+
+# --- Rating Engine ---
+# Replays the game history in memory (a game_store.GameStore, so the loop
+# works on interned player ids) and writes the final ratings back in a
+# single transaction. The rules mirror the original per-row replay exactly:
+# ratings are rounded after every game, K drops from 32 to 16 once a player
+# has 30 games behind them, and games with a missing player or an invalid
+# winner are skipped without counting towards anyone's K-factor.
+# The elo_checkpoints, rating_history and player_game_counts tables are
+# created by migrations.py.
+
+DEFAULT_ELO = 480
+K_NEW = 32
+K_ESTABLISHED = 16
+K_THRESHOLD = 30  # Games played before a player moves to K_ESTABLISHED
+
+# Every CHECKPOINT_INTERVAL replayed games the ratings and games-played counts
+# are saved to elo_checkpoints, keyed by the id of the last game included.
+# Checkpoints are stored per scope: a season number, or ALL_SEASONS.
+CHECKPOINT_INTERVAL = 100
+ALL_SEASONS = 0
+
+# Seconds a starting process waits for another one's replay to finish.
+REPLAY_LOCK_TIMEOUT = 300
+
+# A full replay also replays every season on its own into season_ratings (a
+# rating per player and season) and the seasons' rating history, so viewing
+# another season is a table read. Seasons are independent, so they run in
+# forked worker processes once the league has PARALLEL_MIN_GAMES games.
+SEASON_WORKERS = int(os.environ.get("SEASON_WORKERS", os.cpu_count() or 1))
+PARALLEL_MIN_GAMES = 20_000
+
+
+def expected(score_a, score_b):
+    return 1 / (1 + 10 ** ((score_b - score_a) / 400))
+
+
+def _scope(season):
+    return ALL_SEASONS if season is None else season
+
+
+def load_usernames(cursor):
+    cursor.execute("SELECT username FROM players")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def replay(
+    games,
+    usernames,
+    default_elo=DEFAULT_ELO,
+    ratings=None,
+    game_counts=None,
+    checkpoints=None,
+    checkpoint_interval=CHECKPOINT_INTERVAL,
+    history=None,
+    rows=None,
+):
+    """
+    Replays games against an in-memory rating table, optionally starting from
+    restored ratings/game_counts. games is a GameStore, of which only rows
+    (row indexes in replay order) are replayed when given, or a list of
+    (id, p1, p2, winner) tuples. If a checkpoints list is given, a
+    (game_id, ratings, game_counts) snapshot is appended to it every
+    checkpoint_interval games. If a history list is given, a
+    (game_id, username, elo_before, elo_after, k) row is appended to it for
+    each participant of every applied game.
+    Returns (ratings, game_counts) where ratings covers every known username.
+    """
+    if not isinstance(games, game_store.GameStore):
+        games = game_store.GameStore.from_games(games)
+    if ratings is None:
+        ratings = dict.fromkeys(usernames, default_elo)
+    if game_counts is None:
+        game_counts = {}
+    if rows is None:
+        rows = range(len(games))
+
+    # The loop works on lists indexed by interned name id; None marks a name
+    # that is not a player (elos) or has not been seen yet (counts).
+    names = games.names
+    elos = [ratings.get(name) for name in names]
+    counts = [game_counts.get(name) for name in names]
+    player_ids = [i for i, elo in enumerate(elos) if elo is not None]
+
+    def write_back(ratings, game_counts):
+        for i in player_ids:
+            ratings[names[i]] = elos[i]
+        for i, count in enumerate(counts):
+            if count is not None:
+                game_counts[names[i]] = count
+
+    game_ids, p1_ids, p2_ids, winners = games.ids, games.p1, games.p2, games.winner
+    k_new, k_established, k_threshold = K_NEW, K_ESTABLISHED, K_THRESHOLD
+    for position, row in enumerate(rows, 1):
+        p1, p2 = p1_ids[row], p2_ids[row]
+        if counts[p1] is None:
+            counts[p1] = 0
+        if counts[p2] is None:
+            counts[p2] = 0
+        p1_before, p2_before = elos[p1], elos[p2]
+        if p1_before is None or p2_before is None:
+            print(f"Warning: Missing player in game ({names[p1]} vs {names[p2]}). Skipping.")
+        elif winners[row] == game_store.WINNER_OTHER:
+            print(
+                f"Warning: Invalid winner '{games.winner_name(row)}' in game ({names[p1]} vs {names[p2]}). Skipping."
+            )
+        else:
+            k1 = k_established if counts[p1] >= k_threshold else k_new
+            k2 = k_established if counts[p2] >= k_threshold else k_new
+            exp_p1 = expected(p1_before, p2_before)
+            exp_p2 = expected(p2_before, p1_before)
+            p1_score = 1 if winners[row] == game_store.WINNER_P1 else 0
+            # Stored ratings are integers, so each game starts from rounded values.
+            elos[p1] = round(p1_before + k1 * (p1_score - exp_p1))
+            elos[p2] = round(p2_before + k2 * ((1 - p1_score) - exp_p2))
+            counts[p1] += 1
+            counts[p2] += 1
+            if history is not None:
+                game_id = game_ids[row]
+                history.append((game_id, names[p1], p1_before, elos[p1], k1))
+                history.append((game_id, names[p2], p2_before, elos[p2], k2))
+        if checkpoints is not None and position % checkpoint_interval == 0:
+            snapshot_ratings, snapshot_counts = dict(ratings), dict(game_counts)
+            write_back(snapshot_ratings, snapshot_counts)
+            checkpoints.append((game_ids[row], snapshot_ratings, snapshot_counts))
+
+    write_back(ratings, game_counts)
+    return ratings, game_counts
+
+
+def write_ratings(conn, ratings, default_elo=DEFAULT_ELO):
+    """
+    Resets every player to default_elo and writes ratings. Runs inside the
+    caller's transaction.
+    """
+    conn.execute("UPDATE players SET ELO = ?", (default_elo,))
+    conn.executemany(
+        "UPDATE players SET ELO = ? WHERE username = ?",
+        [(elo, name) for name, elo in ratings.items() if elo != default_elo],
+    )
+
+
+# --- Checkpoints ---
+def save_checkpoints(conn, season, checkpoints):
+    rows = []
+    for game_id, ratings, game_counts in checkpoints:
+        for username in ratings.keys() | game_counts.keys():
+            rows.append(
+                (
+                    _scope(season),
+                    game_id,
+                    username,
+                    ratings.get(username),
+                    game_counts.get(username, 0),
+                )
+            )
+    conn.executemany(
+        "INSERT OR REPLACE INTO elo_checkpoints (season, game_id, username, elo, games_played) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+
+
+def clear_checkpoints(conn, season=None, from_game_id=0):
+    """
+    Drops checkpoints at or after from_game_id. With season=None every scope
+    is cleared, since a change to any game can invalidate all of them.
+    """
+    if season is None:
+        conn.execute("DELETE FROM elo_checkpoints WHERE game_id >= ?", (from_game_id,))
+    else:
+        conn.execute(
+            "DELETE FROM elo_checkpoints WHERE season = ? AND game_id >= ?",
+            (season, from_game_id),
+        )
+
+
+def load_checkpoint(cursor, season, before_game_id):
+    """
+    Returns (game_id, elos, game_counts) for the latest checkpoint strictly
+    before before_game_id, or None when the replay must start from scratch.
+    """
+    cursor.execute(
+        "SELECT MAX(game_id) FROM elo_checkpoints WHERE season = ? AND game_id < ?",
+        (_scope(season), before_game_id),
+    )
+    row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    checkpoint_id = row[0]
+    cursor.execute(
+        "SELECT username, elo, games_played FROM elo_checkpoints WHERE season = ? AND game_id = ?",
+        (_scope(season), checkpoint_id),
+    )
+    elos, game_counts = {}, {}
+    for username, elo, games_played in cursor.fetchall():
+        if elo is not None:
+            elos[username] = elo
+        game_counts[username] = games_played
+    return checkpoint_id, elos, game_counts
+
+
+# --- Rating History ---
+def record_history(conn, rows, season=None):
+    """
+    Stores (game_id, username, elo_before, elo_after, k) rows for a scope.
+    """
+    conn.executemany(
+        "INSERT OR REPLACE INTO rating_history (season, game_id, username, elo_before, elo_after, k) VALUES (?, ?, ?, ?, ?, ?)",
+        [(_scope(season),) + tuple(row) for row in rows],
+    )
+
+
+def load_history(cursor, username, season=None, from_game_id=0, to_game_id=None):
+    """
+    Returns one player's (game_id, elo_before, elo_after, k, date_played) rows
+    in game order, limited to a game id range.
+    """
+    if to_game_id is None:
+        to_game_id = 2**63 - 1
+    cursor.execute(
+        """SELECT h.game_id, h.elo_before, h.elo_after, h.k, g.date_played
+        FROM rating_history h LEFT JOIN games g ON g.id = h.game_id
+        WHERE h.season = ? AND h.username = ? AND h.game_id BETWEEN ? AND ?
+        ORDER BY h.game_id ASC""",
+        (_scope(season), username, from_game_id, to_game_id),
+    )
+    return cursor.fetchall()
+
+
+# --- Games-Played Counters ---
+def count_game(cursor, p1_name, p2_name, season, delta=1):
+    """
+    Adjusts both players' counters for a game inserted (delta=1) or removed
+    (delta=-1). Runs inside the caller's transaction.
+    """
+    cursor.executemany(
+        """INSERT INTO player_game_counts (username, season, games_played)
+        VALUES (?, ?, ?)
+        ON CONFLICT (username, season)
+        DO UPDATE SET games_played = games_played + excluded.games_played""",
+        [(p1_name, season, delta), (p2_name, season, delta)],
+    )
+
+
+def count_games(cursor, games):
+    """
+    count_game() for a batch of (p1, p2, season) games, one row per
+    (player, season).
+    """
+    deltas = {}
+    for p1_name, p2_name, season in games:
+        for name in (p1_name, p2_name):
+            deltas[(name, season)] = deltas.get((name, season), 0) + 1
+    cursor.executemany(
+        """INSERT INTO player_game_counts (username, season, games_played)
+        VALUES (?, ?, ?)
+        ON CONFLICT (username, season)
+        DO UPDATE SET games_played = games_played + excluded.games_played""",
+        [(name, season, delta) for (name, season), delta in deltas.items()],
+    )
+
+
+def games_played(cursor, username, season=None):
+    """
+    Games on record for a player in one season, or across all seasons.
+    """
+    if season is None:
+        cursor.execute(
+            "SELECT SUM(games_played) FROM player_game_counts WHERE username = ?",
+            (username,),
+        )
+    else:
+        cursor.execute(
+            "SELECT games_played FROM player_game_counts WHERE username = ? AND season = ?",
+            (username, season),
+        )
+    row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+
+def rebuild_game_counts(conn):
+    conn.execute("DELETE FROM player_game_counts")
+    conn.execute(
+        f"""INSERT INTO player_game_counts (username, season, games_played)
+        SELECT {player_ids.name_of("t.player_id")}, t.season, t.games FROM (
+            SELECT player_id, season, COUNT(*) AS games FROM (
+                SELECT {player_ids.player_ref("p1")} AS player_id, season FROM games
+                UNION ALL
+                SELECT {player_ids.player_ref("p2")} AS player_id, season FROM games
+            )
+            GROUP BY player_id, season
+        ) t"""
+    )
+
+
+def compare_game_counts(cursor, game_counts, season=None):
+    """
+    Compares the counters with a replay's game_counts for the same scope.
+    Returns {username: (counter, replayed)} for every player that differs.
+    Games the replay skipped (missing player, invalid winner) show up here.
+    """
+    if season is None:
+        cursor.execute(
+            "SELECT username, SUM(games_played) FROM player_game_counts GROUP BY username"
+        )
+    else:
+        cursor.execute(
+            "SELECT username, games_played FROM player_game_counts WHERE season = ?",
+            (season,),
+        )
+    counters = {username: count for username, count in cursor.fetchall() if count}
+    replayed = {username: count for username, count in game_counts.items() if count}
+    return {
+        username: (counters.get(username, 0), replayed.get(username, 0))
+        for username in counters.keys() | replayed.keys()
+        if counters.get(username, 0) != replayed.get(username, 0)
+    }
+
+
+# --- Season Ratings ---
+def _replay_season(store, rows, usernames, default_elo):
+    history = []
+    ratings, game_counts = replay(store, usernames, default_elo, history=history, rows=rows)
+    return ratings, game_counts, history
+
+
+_season_input = None  # Set in each forked worker by _init_season_worker
+
+
+def _init_season_worker(store, rows_by_season, usernames, default_elo):
+    # Forked workers inherit these arguments without pickling them.
+    global _season_input
+    _season_input = (store, rows_by_season, usernames, default_elo)
+
+
+def _replay_inherited_season(season):
+    store, rows_by_season, usernames, default_elo = _season_input
+    return _replay_season(store, rows_by_season[season], usernames, default_elo)
+
+
+class SeasonReplays:
+    """
+    Replays every season of a GameStore independently. With enough games,
+    more than one season and a platform that can fork, the seasons start in
+    a process pool right away, so the caller can do other work before
+    collecting results(); otherwise results() replays them in this process.
+    Use as a context manager so the pool is always shut down.
+    """
+
+    def __init__(self, store, usernames, default_elo=DEFAULT_ELO, workers=None):
+        rows_by_season = store.rows_by_season()
+        self._input = (store, rows_by_season, usernames, default_elo)
+        self._seasons = sorted(rows_by_season)
+        self._pool = None
+        self._futures = None
+        workers = min(SEASON_WORKERS if workers is None else workers, len(self._seasons))
+        if (
+            workers > 1
+            and len(store) >= PARALLEL_MIN_GAMES
+            and "fork" in multiprocessing.get_all_start_methods()
+        ):
+            self._pool = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_season_worker,
+                initargs=self._input,
+            )
+            self._futures = [
+                self._pool.submit(_replay_inherited_season, season) for season in self._seasons
+            ]
+
+    def results(self):
+        """
+        Returns {season: (ratings, game_counts, history)}.
+        """
+        if self._futures is not None:
+            outcomes = [future.result() for future in self._futures]
+        else:
+            store, rows_by_season, usernames, default_elo = self._input
+            outcomes = [
+                _replay_season(store, rows_by_season[season], usernames, default_elo)
+                for season in self._seasons
+            ]
+        return dict(zip(self._seasons, outcomes))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+
+def _write_season(conn, season, ratings, game_counts):
+    conn.executemany(
+        """INSERT INTO season_ratings (season, username, elo, games_played)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (season, username)
+        DO UPDATE SET elo = excluded.elo, games_played = excluded.games_played""",
+        [
+            (season, username, ratings[username], count)
+            for username, count in game_counts.items()
+            if count and username in ratings
+        ],
+    )
+
+
+def write_season_ratings(conn, results):
+    """
+    Replaces season_ratings and every season's rating history with
+    SeasonReplays results. Players only get a row for seasons they played
+    in. Runs inside the caller's transaction.
+    """
+    conn.execute("DELETE FROM season_ratings")
+    conn.execute("DELETE FROM rating_history WHERE season != ?", (ALL_SEASONS,))
+    for season, (ratings, game_counts, history) in results.items():
+        _write_season(conn, season, ratings, game_counts)
+        record_history(conn, history, season)
+
+
+def refresh_season(conn, season, default_elo=DEFAULT_ELO):
+    """
+    Replays one season from the games table into season_ratings and its
+    rating history, after a game in it was edited or deleted. Runs inside
+    the caller's transaction.
+    """
+    cursor = conn.cursor()
+    ratings, game_counts, history = _replay_season(
+        game_store.GameStore.load(cursor, season), None, load_usernames(cursor), default_elo
+    )
+    conn.execute("DELETE FROM season_ratings WHERE season = ?", (season,))
+    conn.execute("DELETE FROM rating_history WHERE season = ?", (season,))
+    _write_season(conn, season, ratings, game_counts)
+    record_history(conn, history, season)
+
+
+def apply_season_games(cursor, games, default_elo=DEFAULT_ELO):
+    """
+    Applies newly inserted (id, p1, p2, winner, season) games, in order, to
+    season_ratings and the seasons' rating history. Each game must be newer
+    than every other game in its season and both players must exist. Runs
+    inside the caller's transaction.
+    """
+    by_season = {}
+    for game_id, p1_name, p2_name, winner_name, season in games:
+        by_season.setdefault(season, []).append((game_id, p1_name, p2_name, winner_name))
+    for season, season_games in by_season.items():
+        names = sorted({name for game in season_games for name in game[1:3]})
+        ratings = dict.fromkeys(names, default_elo)
+        game_counts = dict.fromkeys(names, 0)
+        placeholders = ", ".join("?" * len(names))
+        cursor.execute(
+            f"""SELECT username, elo, games_played FROM season_ratings
+            WHERE season = ? AND username IN ({placeholders})""",
+            [season, *names],
+        )
+        for username, elo, count in cursor.fetchall():
+            ratings[username], game_counts[username] = elo, count
+        history = []
+        replay(season_games, names, default_elo, ratings, game_counts, history=history)
+        _write_season(cursor, season, ratings, game_counts)
+        record_history(cursor, history, season)
+
+
+# --- Fingerprint ---
+# Identifies everything a full replay depends on: the scope, the default
+# rating, every game (the derived tables cover all seasons) and the player
+# list. The checksums are sums of per-row hashes, so a write that adds,
+# removes or changes games can move the stored fingerprint by those rows
+# alone (adjust_fingerprint) instead of leaving it stale until a replay.
+
+FINGERPRINT_GAMES = (
+    "SELECT id, p1_id, p2_id, winner_id, season, archived, date_played FROM games"
+)
+_SUM_MASK = (1 << 64) - 1
+
+
+def _row_hash(row):
+    digest = hashlib.blake2b(repr(tuple(row)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _format_fingerprint(parts):
+    return ";".join(f"{key}={value}" for key, value in parts.items())
+
+
+def fingerprint(cursor, season=None, default_elo=DEFAULT_ELO):
+    """
+    Computes the fingerprint of the current games and players for a replay
+    of this scope. Counts are kept readable in front of the checksums.
+    """
+    game_count = game_sum = 0
+    for row in cursor.execute(FINGERPRINT_GAMES):
+        game_count += 1
+        game_sum += _row_hash(row)
+    player_count = player_sum = 0
+    for row in cursor.execute("SELECT id, username FROM players"):
+        player_count += 1
+        player_sum += _row_hash(row)
+    return _format_fingerprint(
+        {
+            "scope": _scope(season),
+            "default": default_elo,
+            "games": game_count,
+            "games_sum": f"{game_sum & _SUM_MASK:016x}",
+            "players": player_count,
+            "players_sum": f"{player_sum & _SUM_MASK:016x}",
+        }
+    )
+
+
+def stored_fingerprint(cursor):
+    row = cursor.execute("SELECT fingerprint FROM rating_state WHERE id = 1").fetchone()
+    return row[0] if row else None
+
+
+def fingerprint_rows(cursor, game_ids):
+    """
+    The fingerprinted columns of the given games, for adjust_fingerprint().
+    """
+    game_ids = list(game_ids)
+    if not game_ids:
+        return []
+    placeholders = ", ".join("?" * len(game_ids))
+    return cursor.execute(
+        f"{FINGERPRINT_GAMES} WHERE id IN ({placeholders})", game_ids
+    ).fetchall()
+
+
+def adjust_fingerprint(cursor, removed=(), added=()):
+    """
+    Moves the stored fingerprint by game rows (see fingerprint_rows) a write
+    removed and added, for writes that leave ratings and every derived table
+    as a full replay would (add, import, edit and delete of games). Runs in
+    the write's transaction. A fingerprint that was stale before the write
+    stays stale, so the next startup still replays.
+    """
+    stored = stored_fingerprint(cursor)
+    if stored is None:
+        return
+    parts = dict(item.split("=", 1) for item in stored.split(";"))
+    if "games_sum" not in parts:
+        return  # Written by an older version; the next replay replaces it.
+    parts["games"] = int(parts["games"]) - len(removed) + len(added)
+    game_sum = int(parts["games_sum"], 16)
+    game_sum += sum(_row_hash(row) for row in added) - sum(_row_hash(row) for row in removed)
+    parts["games_sum"] = f"{game_sum & _SUM_MASK:016x}"
+    cursor.execute(
+        "UPDATE rating_state SET fingerprint = ? WHERE id = 1", (_format_fingerprint(parts),)
+    )
+
+
+# --- Entry Points ---
+
+
+def replay_all(conn, season=None, default_elo=DEFAULT_ELO):
+    """
+    The body of a full replay (see recalculate_all_elos). Runs inside the
+    caller's transaction and records the fingerprint of the data it
+    replayed. Returns (ratings, game_counts).
+    """
+    cursor = conn.cursor()
+    # Every game is loaded once; the scope and each season replay rows of it.
+    store = game_store.GameStore.load(cursor)
+    usernames = load_usernames(cursor)
+    with SeasonReplays(store, usernames, default_elo) as seasons:
+        # The scope's own replay runs here while the seasons are replayed.
+        # A season scope's history comes with the season results.
+        checkpoints = []
+        history = [] if season is None else None
+        rows = None
+        if season is not None:
+            rows = [row for row in range(len(store)) if store.season_of(row) == season]
+        ratings, game_counts = replay(
+            store,
+            usernames,
+            default_elo,
+            checkpoints=checkpoints,
+            history=history,
+            rows=rows,
+        )
+        season_results = seasons.results()
+    write_ratings(conn, ratings, default_elo)
+    database.bump_data_version(conn)
+    conn.execute("DELETE FROM elo_checkpoints WHERE season = ?", (_scope(season),))
+    save_checkpoints(conn, season, checkpoints)
+    if history is not None:
+        conn.execute("DELETE FROM rating_history WHERE season = ?", (ALL_SEASONS,))
+        record_history(conn, history, season)
+    write_season_ratings(conn, season_results)
+    rebuild_game_counts(conn)
+    player_stats.rebuild(conn)
+    head_to_head.rebuild(conn)
+    conn.execute(
+        "INSERT OR REPLACE INTO rating_state (id, fingerprint, computed_at) VALUES (1, ?, ?)",
+        (fingerprint(cursor, season, default_elo), int(time.time())),
+    )
+    return ratings, game_counts
+
+
+def recalculate_all_elos(db_path, season=None, default_elo=DEFAULT_ELO):
+    """
+    Loads games and players once, replays in memory and writes the result
+    together with fresh checkpoints, rating history, season ratings,
+    games-played counters, player stats and head-to-head records.
+    Returns (ratings, game_counts).
+    """
+    conn = database.connect(db_path)
+    try:
+        with conn:
+            return replay_all(conn, season, default_elo)
+    finally:
+        database.release(conn)
+
+
+def ensure_ratings(db_path, season=None, default_elo=DEFAULT_ELO):
+    """
+    Startup entry point: replays only if games or players changed since the
+    last full replay for this scope, i.e. the stored fingerprint differs.
+    The check and the replay run under one write lock, so when several
+    workers boot together exactly one replays and the others wait for it
+    and then find a matching fingerprint. Returns True if it replayed.
+    """
+    # Autocommit mode, so BEGIN IMMEDIATE below controls the transaction.
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=REPLAY_LOCK_TIMEOUT)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.cursor()
+            if stored_fingerprint(cursor) == fingerprint(cursor, season, default_elo):
+                conn.execute("ROLLBACK")
+                return False
+            replay_all(conn, season, default_elo)
+            conn.execute("COMMIT")
+            return True
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def replay_from(conn, game_id, season=None, default_elo=DEFAULT_ELO):
+    """
+    The body of recalculate_from(). Runs inside the caller's transaction.
+    Returns (ratings, game_counts).
+    """
+    cursor = conn.cursor()
+    checkpoint = load_checkpoint(cursor, season, game_id)
+    usernames = load_usernames(cursor)
+    ratings = dict.fromkeys(usernames, default_elo)
+    if checkpoint is None:
+        start_id, game_counts = 0, {}
+    else:
+        start_id, elos, game_counts = checkpoint
+        ratings.update((u, elo) for u, elo in elos.items() if u in ratings)
+
+    games = game_store.GameStore.load(cursor, season, after_id=start_id)
+    checkpoints, history = [], []
+    ratings, game_counts = replay(
+        games,
+        usernames,
+        default_elo,
+        ratings=ratings,
+        game_counts=game_counts,
+        checkpoints=checkpoints,
+        history=history,
+    )
+    write_ratings(conn, ratings, default_elo)
+    database.bump_data_version(conn)
+    # Other scopes may also hold checkpoints that include game_id.
+    clear_checkpoints(conn, from_game_id=game_id)
+    conn.execute(
+        "DELETE FROM elo_checkpoints WHERE season = ? AND game_id > ?",
+        (_scope(season), start_id),
+    )
+    save_checkpoints(conn, season, checkpoints)
+    conn.execute(
+        "DELETE FROM rating_history WHERE season = ? AND game_id > ?",
+        (_scope(season), start_id),
+    )
+    record_history(conn, history, season)
+    return ratings, game_counts
+
+
+def recalculate_from(db_path, game_id, season=None, default_elo=DEFAULT_ELO):
+    """
+    Recomputes ratings after a change to game_id (edit, delete or insert) by
+    restoring the nearest checkpoint before it and replaying only the suffix.
+    Falls back to a full replay when no checkpoint precedes the game.
+    Returns (ratings, game_counts).
+    """
+    conn = database.connect(db_path)
+    try:
+        with conn:
+            return replay_from(conn, game_id, season, default_elo)
+    finally:
+        database.release(conn)
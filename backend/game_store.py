@@ -0,0 +1,220 @@
+import array
+
+import player_ids
+
+# --- Game Store ---
+# Games as parallel typed columns instead of rows of Python strings.
+# Usernames are interned once into small integer ids (names[i] is the
+# username with id i), so a game costs a few dozen bytes of column space
+# instead of a row tuple with its own int and str objects, and the replay
+# and stats loops compare integers. Row i of every column is the i-th game
+# in id order.
+#
+# winner holds WINNER_P1 or WINNER_P2. NULL dates and seasons are NO_VALUE.
+# A value that does not fit its column (a winner who is neither player, a
+# non-integer date or season) is kept in a small side table and read back
+# as is.
+
+WINNER_P2, WINNER_P1, WINNER_OTHER = 0, 1, 2
+NO_VALUE = -(2**31)  # NULL, or a value kept in the side table
+INT32_MAX = 2**31 - 1
+INT64_MIN, INT64_MAX = -(2**63), 2**63 - 1
+CHUNK_ROWS = 5000  # Rows fetched from SQLite per fetchmany()
+
+
+class Player:
+    __slots__ = ("id", "username", "elo", "description")
+
+    def __init__(self, id, username, elo, description):
+        self.id = id
+        self.username = username
+        self.elo = elo
+        self.description = description
+
+
+class GameStore:
+    __slots__ = (
+        "names",
+        "name_ids",
+        "ids",
+        "p1",
+        "p2",
+        "winner",
+        "season",
+        "date",
+        "archived",
+        "_exceptions",
+    )
+
+    def __init__(self):
+        self.names = []
+        self.name_ids = {}
+        self.ids = array.array("q")
+        self.p1 = array.array("i")
+        self.p2 = array.array("i")
+        self.winner = array.array("b")
+        self.season = array.array("i")
+        self.date = array.array("q")
+        self.archived = array.array("b")
+        self._exceptions = {}  # (column, row) -> value that does not fit the column
+
+    def __len__(self):
+        return len(self.ids)
+
+    def intern(self, name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def append(self, game_id, p1_name, p2_name, winner_name, date_played=None, archived=0, season=0):
+        self.extend([(game_id, p1_name, p2_name, winner_name, date_played, archived, season)])
+
+    def extend(self, games):
+        """
+        Appends (id, p1, p2, winner, date_played, archived, season) rows.
+        """
+        # Bound once: this loop runs for every game loaded.
+        name_ids, intern = self.name_ids, self.intern
+        exceptions = self._exceptions
+        ids, p1s, p2s = self.ids.append, self.p1.append, self.p2.append
+        winners, seasons = self.winner.append, self.season.append
+        dates, archives = self.date.append, self.archived.append
+        row = len(self.ids)
+        for game_id, p1_name, p2_name, winner_name, date_played, archived, season in games:
+            ids(game_id)
+            p1 = name_ids.get(p1_name)
+            p1s(intern(p1_name) if p1 is None else p1)
+            p2 = name_ids.get(p2_name)
+            p2s(intern(p2_name) if p2 is None else p2)
+            if winner_name == p1_name:
+                winners(WINNER_P1)
+            elif winner_name == p2_name:
+                winners(WINNER_P2)
+            else:
+                winners(WINNER_OTHER)
+                exceptions[("winner", row)] = winner_name
+            if (
+                type(date_played) is int
+                and date_played != NO_VALUE
+                and INT64_MIN <= date_played <= INT64_MAX
+            ):
+                dates(date_played)
+            else:
+                dates(NO_VALUE)
+                if date_played is not None:
+                    exceptions[("date", row)] = date_played
+            if type(season) is int and NO_VALUE < season <= INT32_MAX:
+                seasons(season)
+            else:
+                seasons(NO_VALUE)
+                if season is not None:
+                    exceptions[("season", row)] = season
+            archives(1 if archived else 0)
+            row += 1
+
+    @classmethod
+    def from_games(cls, games):
+        """
+        Builds a store from (id, p1, p2, winner) tuples.
+        """
+        store = cls()
+        store.extend((game[0], game[1], game[2], game[3], None, 0, 0) for game in games)
+        return store
+
+    @classmethod
+    def load(cls, cursor, season=None, after_id=0, include_archived=True):
+        """
+        Reads games in id order, optionally for one season, only after a
+        given id, or without archived games. Player ids are turned into
+        names once, from one read of the players table.
+        """
+        names = player_ids.names_by_id(cursor)
+        conditions, params = ["id > ?"], [after_id]
+        if season is not None:
+            conditions.append("season = ?")
+            params.append(season)
+        if not include_archived:
+            conditions.append("archived = 0")
+        cursor.execute(
+            f"""SELECT id, {player_ids.player_ref("p1")}, {player_ids.player_ref("p2")},
+                {player_ids.player_ref("winner")}, date_played, archived, season FROM games
+            WHERE {' AND '.join(conditions)} ORDER BY id ASC""",
+            params,
+        )
+        store = cls()
+        name = names.get
+        while True:
+            rows = cursor.fetchmany(CHUNK_ROWS)
+            if not rows:
+                return store
+            store.extend(
+                (game_id, name(p1_id), name(p2_id), name(winner_id), date_played, archived, season)
+                for game_id, p1_id, p2_id, winner_id, date_played, archived, season in rows
+            )
+
+    # --- Reading rows back ---
+    def winner_name(self, row):
+        flag = self.winner[row]
+        if flag == WINNER_P1:
+            return self.names[self.p1[row]]
+        if flag == WINNER_P2:
+            return self.names[self.p2[row]]
+        return self._exceptions[("winner", row)]
+
+    def date_played(self, row):
+        value = self.date[row]
+        if value == NO_VALUE:
+            return self._exceptions.get(("date", row))
+        return value
+
+    def season_of(self, row):
+        value = self.season[row]
+        if value == NO_VALUE:
+            return self._exceptions.get(("season", row))
+        return value
+
+    def game(self, row):
+        """
+        Returns (id, p1, p2, winner, date_played, season) for row.
+        """
+        return (
+            self.ids[row],
+            self.names[self.p1[row]],
+            self.names[self.p2[row]],
+            self.winner_name(row),
+            self.date_played(row),
+            self.season_of(row),
+        )
+
+    def rows_by_season(self):
+        """
+        Returns {season: array of row indexes in id order}.
+        """
+        seasons = {}
+        for row, season in enumerate(self.season):
+            if season == NO_VALUE:
+                season = self.season_of(row)
+            rows = seasons.get(season)
+            if rows is None:
+                rows = seasons[season] = array.array("i")
+            rows.append(row)
+        return seasons
+
+    def nbytes(self):
+        """
+        Bytes held by the columns (not the interned names or side table).
+        """
+        return sum(
+            column.itemsize * len(column)
+            for column in (
+                self.ids,
+                self.p1,
+                self.p2,
+                self.winner,
+                self.season,
+                self.date,
+                self.archived,
+            )
+        )
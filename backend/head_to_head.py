@@ -0,0 +1,143 @@
+import player_ids
+
+# --- Head-to-Head ---
+# Sparse wins/losses per (player, opponent, season) over non-archived games,
+# stored once from each side so a player's row range answers their profile.
+# Inserts add to the pair; deletes and edits recompute only the pairs they
+# touch from games; a full ELO replay rebuilds the table. Games naming an
+# unmatched name have no player id on that side and are left out.
+
+PAIR_QUERY = """
+    SELECT p1_id AS player_id, p2_id AS opponent_id, season, winner_id = p1_id AS won,
+        date_played, id
+    FROM games WHERE archived = 0 AND winner_id IN (p1_id, p2_id)
+    UNION ALL
+    SELECT p2_id AS player_id, p1_id AS opponent_id, season, winner_id = p2_id AS won,
+        date_played, id
+    FROM games WHERE archived = 0 AND winner_id IN (p1_id, p2_id)
+"""
+
+# PAIR_QUERY summed per pair and season, with the players' names.
+PAIR_TOTALS = f"""
+    SELECT {player_ids.name_of("t.player_id")}, {player_ids.name_of("t.opponent_id")},
+        t.season, t.wins, t.losses, t.last_played, t.last_game_id
+    FROM (
+        SELECT player_id, opponent_id, season, SUM(won) AS wins, SUM(1 - won) AS losses,
+            MAX(date_played) AS last_played, MAX(id) AS last_game_id
+        FROM ({PAIR_QUERY})
+        {{where}}
+        GROUP BY player_id, opponent_id, season
+    ) t
+"""
+
+
+def record_game(
+    cursor, p1_name, p2_name, winner_name, season, date_played, game_id, archived=0
+):
+    """
+    Adds a newly inserted game to both sides of its pair.
+    """
+    if archived or winner_name not in (p1_name, p2_name):
+        return
+    p1_won = 1 if winner_name == p1_name else 0
+    cursor.executemany(
+        """INSERT INTO head_to_head
+            (player, opponent, season, wins, losses, last_played, last_game_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (player, season, opponent) DO UPDATE SET
+            wins = wins + excluded.wins,
+            losses = losses + excluded.losses,
+            last_played = COALESCE(MAX(last_played, excluded.last_played), last_played, excluded.last_played),
+            last_game_id = MAX(last_game_id, excluded.last_game_id)""",
+        [
+            (p1_name, p2_name, season, p1_won, 1 - p1_won, date_played, game_id),
+            (p2_name, p1_name, season, 1 - p1_won, p1_won, date_played, game_id),
+        ],
+    )
+
+
+def record_games(cursor, games):
+    """
+    record_game() for a batch of inserted (p1, p2, winner, season,
+    date_played, game_id, archived) games, one row per pair side.
+    """
+    totals = {}
+    for p1_name, p2_name, winner_name, season, date_played, game_id, archived in games:
+        if archived or winner_name not in (p1_name, p2_name):
+            continue
+        p1_won = 1 if winner_name == p1_name else 0
+        for player, opponent, won in (
+            (p1_name, p2_name, p1_won),
+            (p2_name, p1_name, 1 - p1_won),
+        ):
+            entry = totals.setdefault((player, opponent, season), [0, 0, None, 0])
+            entry[0] += won
+            entry[1] += 1 - won
+            if date_played is not None:
+                entry[2] = date_played if entry[2] is None else max(entry[2], date_played)
+            entry[3] = max(entry[3], game_id)
+    cursor.executemany(
+        """INSERT INTO head_to_head
+            (player, opponent, season, wins, losses, last_played, last_game_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (player, season, opponent) DO UPDATE SET
+            wins = wins + excluded.wins,
+            losses = losses + excluded.losses,
+            last_played = COALESCE(MAX(last_played, excluded.last_played), last_played, excluded.last_played),
+            last_game_id = MAX(last_game_id, excluded.last_game_id)""",
+        [
+            (player, opponent, season, wins, losses, last_played, last_game_id)
+            for (player, opponent, season), (
+                wins,
+                losses,
+                last_played,
+                last_game_id,
+            ) in totals.items()
+        ],
+    )
+
+
+def refresh_pair(cursor, player_a, player_b, season):
+    """
+    Recomputes one pair in one season from games, after a delete or edit.
+    Uses the per-player games indexes, so it only reads the pair's games.
+    """
+    cursor.execute(
+        "DELETE FROM head_to_head WHERE season = ? AND ((player = ? AND opponent = ?) OR (player = ? AND opponent = ?))",
+        (season, player_a, player_b, player_b, player_a),
+    )
+    ids = player_ids.ids_for(cursor, (player_a, player_b))
+    if len(ids) < 2:
+        return
+    id_a, id_b = ids[player_a], ids[player_b]
+    where = "WHERE season = ? AND ((player_id = ? AND opponent_id = ?) OR (player_id = ? AND opponent_id = ?))"
+    cursor.execute(
+        f"""INSERT INTO head_to_head
+            (player, opponent, season, wins, losses, last_played, last_game_id)
+        {PAIR_TOTALS.format(where=where)}""",
+        (season, id_a, id_b, id_b, id_a),
+    )
+
+
+def rebuild(conn):
+    conn.execute("DELETE FROM head_to_head")
+    if not player_ids.games_have_ids(conn):
+        return
+    conn.execute(
+        f"""INSERT INTO head_to_head
+            (player, opponent, season, wins, losses, last_played, last_game_id)
+        {PAIR_TOTALS.format(where="")}"""
+    )
+
+
+def row_to_dict(row):
+    player, opponent, wins, losses, last_played, last_game_id = row
+    return {
+        "player": player,
+        "opponent": opponent,
+        "wins": wins,
+        "losses": losses,
+        "games": wins + losses,
+        "last_played": last_played,
+        "last_game_id": last_game_id,
+    }
@@ -0,0 +1,231 @@
+import csv
+import io
+import itertools
+import json
+import time
+
+import elo_engine
+import head_to_head
+import player_ids
+import player_stats
+import replication
+
+# --- Bulk Game Ingestion ---
+# Validates a whole batch before writing anything, resolves every player's
+# rating and games played once, applies the admin app's incremental rating
+# update to each game in order in memory, and writes games, ratings,
+# history, season ratings, counters, stats, head-to-head and the change log
+# with one executemany per table, inside the caller's transaction.
+# ingest_batches() does this BATCH_SIZE games at a time, so a streamed
+# upload is never held in memory whole.
+
+CSV_FIELDS = ("p1", "p2", "winner", "season", "date_played")
+MAX_REPORTED_ERRORS = 50
+BATCH_SIZE = 1000
+
+
+class BatchError(ValueError):
+    """
+    Raised when a batch fails validation; errors lists (index, message)
+    for up to MAX_REPORTED_ERRORS games, with 1-based indexes.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        index, message = errors[0]
+        super().__init__(f"Game {index}: {message}")
+
+
+def parse_ndjson(stream):
+    """
+    Yields one game dict per non-empty line of a text stream.
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"_error": f"Line {line_number} is not valid JSON: {e}"}
+
+
+def parse_csv(stream):
+    """
+    Yields one game dict per CSV row. The header row names the columns
+    (p1, p2, winner, season and optionally date_played).
+    """
+    for row in csv.DictReader(stream):
+        yield {key.strip(): (value or "").strip() for key, value in row.items() if key}
+
+
+def text_stream(binary_stream, encoding="utf-8"):
+    return io.TextIOWrapper(binary_stream, encoding=encoding, newline="")
+
+
+def _date_played(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, str) and value.lstrip("-").isdigit():
+        return int(value)
+    return value
+
+
+def validate(cursor, games, use_current_time=False, start=1):
+    """
+    Checks every game and resolves players. Returns (rows, ratings, counts):
+    rows are (p1, p2, winner, season, date_played) tuples in order, ratings
+    and counts map each involved player to their current ELO and games
+    played. Raises BatchError listing the problems, numbering games from
+    start.
+    """
+    rows, errors = [], []
+    now = int(time.time())
+    for index, game_data in enumerate(games, start):
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            break
+        if not isinstance(game_data, dict):
+            errors.append((index, "Game must be an object."))
+            continue
+        if "_error" in game_data:
+            errors.append((index, game_data["_error"]))
+            continue
+        p1_name, p2_name = game_data.get("p1"), game_data.get("p2")
+        winner_name = game_data.get("winner")
+        try:
+            season = int(str(game_data.get("season")))
+        except ValueError:
+            errors.append((index, f"Invalid season: {game_data.get('season')!r}"))
+            continue
+        if season <= 0:
+            errors.append((index, "Season must be positive."))
+        elif not all([p1_name, p2_name, winner_name]):
+            errors.append((index, "Missing p1, p2 or winner."))
+        elif not all(isinstance(name, str) for name in (p1_name, p2_name, winner_name)):
+            errors.append((index, "p1, p2 and winner must be player names (strings)."))
+        elif p1_name == p2_name:
+            errors.append((index, "Players cannot be the same."))
+        elif winner_name not in [p1_name, p2_name]:
+            errors.append((index, "Winner must be one of the players."))
+        else:
+            date_played = (
+                now if use_current_time else _date_played(game_data.get("date_played"))
+            )
+            rows.append((p1_name, p2_name, winner_name, season, date_played))
+    if errors:
+        raise BatchError(errors)
+    if not rows:
+        raise BatchError([(0, "The batch contains no games.")])
+
+    names = sorted({name for row in rows for name in row[:2]})
+    placeholders = ", ".join("?" * len(names))
+    ratings = dict(
+        cursor.execute(
+            f"SELECT username, ELO FROM players WHERE username IN ({placeholders})",
+            names,
+        ).fetchall()
+    )
+    missing = [
+        (index, f"Player not found: {name}")
+        for index, row in enumerate(rows, start)
+        for name in row[:2]
+        if name not in ratings
+    ]
+    if missing:
+        raise BatchError(missing[:MAX_REPORTED_ERRORS])
+    counts = dict(
+        cursor.execute(
+            f"""SELECT username, SUM(games_played) FROM player_game_counts
+            WHERE username IN ({placeholders}) GROUP BY username""",
+            names,
+        ).fetchall()
+    )
+    return rows, ratings, {name: counts.get(name) or 0 for name in names}
+
+
+def ingest(cursor, rows, ratings, counts, default_elo=elo_engine.DEFAULT_ELO):
+    """
+    Inserts validated rows (see validate()) and updates everything derived
+    from them, exactly as adding the games one by one through add_game
+    would. default_elo is the rating a player starts each season with.
+    Returns the new game ids.
+    """
+    sequence = cursor.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'games'"
+    ).fetchone()
+    max_id = cursor.execute("SELECT MAX(id) FROM games").fetchone()[0]
+    next_id = max(sequence[0] if sequence else 0, max_id or 0) + 1
+
+    ratings, counts = dict(ratings), dict(counts)
+    games, history = [], []
+    for offset, (p1_name, p2_name, winner_name, season, date_played) in enumerate(rows):
+        game_id = next_id + offset
+        # add_game counts the new game before picking K, hence "> 30".
+        counts[p1_name] += 1
+        counts[p2_name] += 1
+        k1 = 16 if counts[p1_name] > 30 else 32
+        k2 = 16 if counts[p2_name] > 30 else 32
+        p1_before, p2_before = ratings[p1_name], ratings[p2_name]
+        exp_p1 = elo_engine.expected(p1_before, p2_before)
+        exp_p2 = elo_engine.expected(p2_before, p1_before)
+        p1_score = 1 if winner_name == p1_name else 0
+        p1_after = round(p1_before + k1 * (p1_score - exp_p1))
+        p2_after = round(p2_before + k2 * ((1 - p1_score) - exp_p2))
+        ratings[p1_name], ratings[p2_name] = p1_after, p2_after
+        games.append((game_id, date_played, p1_name, p2_name, 0, winner_name, 0, season))
+        history.append((game_id, p1_name, p1_before, p1_after, k1))
+        history.append((game_id, p2_name, p2_before, p2_after, k2))
+
+    touched = {name for game in games for name in game[2:4]}
+    ids = player_ids.ids_for(cursor, touched)
+    id_rows = [
+        (game_id, date_played, ids[p1_name], ids[p2_name], doubles, ids[winner_name], archived, season)
+        for game_id, date_played, p1_name, p2_name, doubles, winner_name, archived, season in games
+    ]
+    cursor.executemany(
+        "INSERT INTO games (id, date_played, p1_id, p2_id, doubles, winner_id, archived, season) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        id_rows,
+    )
+    cursor.executemany(
+        "UPDATE players SET ELO = ? WHERE id = ?",
+        [(ratings[name], ids[name]) for name in sorted(touched)],
+    )
+    elo_engine.record_history(cursor, history)
+    elo_engine.count_games(cursor, [(g[2], g[3], g[7]) for g in games])
+    elo_engine.apply_season_games(
+        cursor, [(g[0], g[2], g[3], g[5], g[7]) for g in games], default_elo
+    )
+    player_stats.record_games(cursor, [(g[2], g[3], g[5], g[7], g[6]) for g in games])
+    head_to_head.record_games(
+        cursor, [(g[2], g[3], g[5], g[7], g[1], g[0], g[6]) for g in games]
+    )
+    replication.log_games(
+        cursor, [dict(zip(replication.GAME_COLUMNS, row)) for row in id_rows]
+    )
+    return [game[0] for game in games]
+
+
+def ingest_batches(cursor, games, use_current_time=False, default_elo=elo_engine.DEFAULT_ELO):
+    """
+    Validates and ingests games (any iterable, e.g. parse_ndjson()'s) in
+    batches of BATCH_SIZE inside the caller's transaction. A BatchError in a
+    later batch leaves the earlier ones written, so the caller must roll
+    back. Returns the new game ids.
+    """
+    games = iter(games)
+    game_ids = []
+    while True:
+        batch = list(itertools.islice(games, BATCH_SIZE))
+        if not batch:
+            break
+        rows, ratings, counts = validate(
+            cursor, batch, use_current_time, start=len(game_ids) + 1
+        )
+        batch_ids = ingest(cursor, rows, ratings, counts, default_elo)
+        elo_engine.adjust_fingerprint(
+            cursor, added=elo_engine.fingerprint_rows(cursor, batch_ids)
+        )
+        game_ids += batch_ids
+    if not game_ids:
+        raise BatchError([(0, "The batch contains no games.")])
+    return game_ids
@@ -0,0 +1,73 @@
+import json
+
+import database
+
+# --- Streaming JSON ---
+# Writes a JSON object of arrays piece by piece while iterating database
+# cursors in chunks, so a response never holds the full row list or the
+# full serialized body in memory. Peak memory is bounded by CHUNK_ROWS and
+# CHUNK_BYTES instead of growing with the table. stream_object() over
+# iterators of rows already in memory (e.g. a read snapshot's) only saves
+# the serialized body.
+
+CHUNK_ROWS = 500  # Rows fetched from SQLite per fetchmany()
+CHUNK_BYTES = 64 * 1024  # Serialized output buffered before each yield
+
+
+def iter_rows(cursor, chunk_rows=CHUNK_ROWS):
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            return
+        yield from rows
+
+
+def stream_object(sections, dumps=json.dumps):
+    """
+    Yields str chunks of one JSON object. sections is a list of
+    (key, iterable) pairs; each iterable becomes an array of dumps(item).
+    """
+    buffer, size = ["{"], 1
+    for section_index, (key, items) in enumerate(sections):
+        prefix = "," if section_index else ""
+        buffer.append(f"{prefix}{json.dumps(key)}:[")
+        first = True
+        for item in items:
+            piece = dumps(item) if first else "," + dumps(item)
+            first = False
+            buffer.append(piece)
+            size += len(piece)
+            if size >= CHUNK_BYTES:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        buffer.append("]")
+    buffer.append("}")
+    yield "".join(buffer)
+
+
+def stream_query_sections(db_path, sections, dumps=json.dumps):
+    """
+    Streams a JSON object whose arrays come from SQL queries. sections is a
+    list of (key, query, params, row_to_item). All queries read through one
+    dedicated read-only connection, so the export is a consistent snapshot
+    and the pooled connections stay free while a slow client downloads.
+    """
+    conn = database.open_readonly(db_path)
+    try:
+
+        def items(query, params, row_to_item):
+            cursor = conn.execute(query, params)
+            for row in iter_rows(cursor):
+                yield row_to_item(row)
+
+        # Keep the WAL snapshot fixed across all sections.
+        conn.execute("BEGIN")
+        yield from stream_object(
+            [
+                (key, items(query, params, row_to_item))
+                for key, query, params, row_to_item in sections
+            ],
+            dumps,
+        )
+    finally:
+        conn.close()
@@ -1,18 +1,33 @@
-import re
 from flask import Flask, jsonify, request
 import json  # Kept as per user's original imports
 import sqlite3
 from flask_cors import CORS
-import time
+import database
+import elo_engine
+import json_stream
+import metrics
+import migrations
+import read_snapshot
+import response_cache
 
 app = Flask(__name__)
 CORS(app)
+get_data_cache = response_cache.VersionedResponseCache("get_data")
+# The other read routes, keyed by route and query; bounded, since players
+# and cursors come from the URL.
+api_cache = response_cache.VersionedResponseCache("api", max_entries=2048)
+metrics.instrument_app(app, "main")
+metrics.register_cache(get_data_cache)
+metrics.register_cache(api_cache)
 
 # --- Configuration ---
 K = 32  # User's original K-factor for ELO calculation
 db = "./game_database.db"  # User's original database path
 DEFAULT_ELO = 480
 CURRENT_SEASON = 2
+# GET routes read from this process's snapshot of db (see read_snapshot.py)
+snapshots = read_snapshot.SnapshotHolder(db)
+metrics.register_cache(snapshots)
 
 
 # --- User's Original ELO Helper Functions (UNCHANGED) ---
@@ -26,150 +41,45 @@ def update_elo(winner_elo, loser_elo):  # Kept as is
     return (winner_elo + K * (1 - exp_win), loser_elo + K * (0 - exp_lose))
 
 
-def get_k(username, cursor):
-    # Counts all games (archived or not) for K-factor, as per user's original.
-    # If K-factor should only consider active games, add "AND archived = 0" to the query
-    cursor.execute(
-        "SELECT COUNT(*) FROM games WHERE p1 = ? OR p2 = ?", (username, username)
-    )
-    count_row = cursor.fetchone()
-    count = count_row[0] if count_row else 0
-    return 16 if count > 30 else 32
-
-
-def recalculate_all_elos():
-    print("Recalculating all ELOs using locked K-factor logic...")
-    conn = None
+@metrics.timed("ensure_elos")
+def ensure_elos():
+    # Startup: skips the replay when the ratings on disk were computed from
+    # the current games and players (see elo_engine.ensure_ratings).
     try:
-        conn = sqlite3.connect(db)
-        cursor = conn.cursor()
-
-        # Reset all player ELOs to the default before recalculating
-        cursor.execute("UPDATE players SET ELO = ?", (DEFAULT_ELO,))
-
-        # Fetch all games in chronological order
-        cursor.execute("SELECT p1, p2, winner FROM games WHERE season = ? ORDER BY id ASC", (CURRENT_SEASON,))
-        all_games = cursor.fetchall()
-
-        if not all_games:
-            print("No games found. ELOs reset to default.")
-            conn.commit()
-            return
-
-        game_counts = {}  # Track number of games played per user so far
-
-        for p1_name, p2_name, winner_name in all_games:
-            # Initialize counts if new player
-            game_counts[p1_name] = game_counts.get(p1_name, 0)
-            game_counts[p2_name] = game_counts.get(p2_name, 0)
-
-            # Fetch current ELOs
-            cursor.execute("SELECT ELO FROM players WHERE username = ?", (p1_name,))
-            p1_row = cursor.fetchone()
-            cursor.execute("SELECT ELO FROM players WHERE username = ?", (p2_name,))
-            p2_row = cursor.fetchone()
-
-            if not p1_row or not p2_row:
-                print(
-                    f"Warning: Missing player in game ({p1_name} vs {p2_name}). Skipping."
-                )
-                continue
-
-            p1_elo = p1_row[0]
-            p2_elo = p2_row[0]
-
-            # Determine K-factor based on games played so far
-            k1 = 16 if game_counts[p1_name] >= 30 else 32
-            k2 = 16 if game_counts[p2_name] >= 30 else 32
-
-            exp_p1 = expected(p1_elo, p2_elo)
-            exp_p2 = expected(p2_elo, p1_elo)
-
-            if winner_name == p1_name:
-                p1_elo += k1 * (1 - exp_p1)
-                p2_elo += k2 * (0 - exp_p2)
-            elif winner_name == p2_name:
-                p1_elo += k1 * (0 - exp_p1)
-                p2_elo += k2 * (1 - exp_p2)
-            else:
-                print(
-                    f"Warning: Invalid winner '{winner_name}' in game ({p1_name} vs {p2_name}). Skipping."
-                )
-                continue
-
-            cursor.execute(
-                "UPDATE players SET ELO = ? WHERE username = ?",
-                (round(p1_elo), p1_name),
-            )
-            cursor.execute(
-                "UPDATE players SET ELO = ? WHERE username = ?",
-                (round(p2_elo), p2_name),
-            )
-
-            # Increment game counts after processing
-            game_counts[p1_name] += 1
-            game_counts[p2_name] += 1
-
-        conn.commit()
-        print("ELO recalculation complete.")
+        if elo_engine.ensure_ratings(db, default_elo=DEFAULT_ELO):
+            print("ELO recalculation complete.")
+        else:
+            print("Ratings are up to date; skipped the ELO replay.")
     except sqlite3.Error as e:
         print(f"SQLite error: {e}")
-        if conn:
-            conn.rollback()
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-    finally:
-        if conn:
-            conn.close()
 
 
 # --- User's Original Get Data Function ---
+# Non-archived games of CURRENT_SEASON with each player's rating for it,
+# served from the read snapshot (see read_snapshot.py).
 def get_data():
-    conn = sqlite3.connect(db)
-    cursor = conn.cursor()
-    # Fetch only non-archived games for general display
-    cursor.execute(
-        "SELECT id, p1, p2, winner, date_played, archived, season FROM games WHERE season = ? AND archived = 0 ORDER BY id ASC", (CURRENT_SEASON,)
+    return snapshots.get().data(CURRENT_SEASON, DEFAULT_ELO)
+
+
+def stream_get_data(dumps=json.dumps):
+    """
+    Same payload as get_data(), serialized in chunks (see json_stream). The
+    rows come from the in-memory snapshot, so this only avoids holding the
+    whole serialized body; memory still grows with the snapshot.
+    """
+    snapshot = snapshots.get()
+    return json_stream.stream_object(
+        [
+            ("games", snapshot.iter_games(CURRENT_SEASON)),
+            ("players", snapshot.iter_players(CURRENT_SEASON, DEFAULT_ELO)),
+        ],
+        dumps,
     )
-    all_games_rows = cursor.fetchall()
-    games_list = []
-
-    for row in all_games_rows:
-        id_val, p1_val, p2_val, winner_val, timestamp_val, archived_val, season_val = (
-            row
-        )
-        if not archived_val:
-            games_list.append(
-                {
-                    "id": id_val,
-                    "players": [p1_val, p2_val],
-                    "winner": winner_val,
-                    "date": timestamp_val,
-                    "season": season_val,
-                }
-            )
 
-    players_list = []
-    cursor.execute("SELECT username, ELO, description, achievements FROM players")
-    all_players_rows = cursor.fetchall()
-    for username_val, elo_val, desc_val, achieve_val in all_players_rows:
-        try:
-            achievements_parsed = json.loads(achieve_val)
-        except Exception:
-            achievements_parsed = []  # fallback if it's malformed
 
-        players_list.append(
-            {
-                "username": username_val,
-                "elo": elo_val,
-                "description": desc_val,
-                "achievements": achievements_parsed,
-            }
-        )
-
-    obj = {"players": players_list, "games": games_list}
-    conn.close()
-    return obj
+# --- Keyset-Paginated Games ---
+GAMES_PAGE_SIZE = 10
+GAMES_PAGE_MAX = 100
 
 
 # --- User's Original Global Scope Calls ---
@@ -183,15 +93,17 @@ def get_data():
 @app.route("/get_data", methods=["GET"])
 def get_data_route():
     try:
-        obj = get_data()
-        return jsonify(obj), 200
-    except sqlite3.Error as e:
-        print(f"Database error in get_data_route: {e}")
-        return (
-            jsonify(
-                {"error": "Failed to retrieve data from database", "details": str(e)}
-            ),
-            500,
+        # ?stream=1 skips the cache and writes the payload incrementally.
+        if request.args.get("stream", type=int):
+            return app.response_class(
+                stream_get_data(app.json.dumps), mimetype="application/json"
+            )
+        snapshot = snapshots.get()
+        return response_cache.cached_json_response(
+            get_data_cache,
+            CURRENT_SEASON,
+            snapshot.version,
+            lambda: snapshot.data(CURRENT_SEASON, DEFAULT_ELO),
         )
     except Exception as e:
         print(f"Unexpected error in get_data_route: {e}")
@@ -203,74 +115,170 @@ def get_data_route():
         )
 
 
+@app.route("/api/games", methods=["GET"])
+@app.route("/games", methods=["GET"])
+def get_games_route():
+    season = request.args.get("season", CURRENT_SEASON, type=int)
+    player = request.args.get("player") or None
+    winner = request.args.get("winner") or None
+    order = request.args.get("order", "desc")
+    cursor_id = request.args.get("cursor", None, type=int)
+    limit = request.args.get("limit", GAMES_PAGE_SIZE, type=int)
+    if order not in ("asc", "desc"):
+        return jsonify({"error": "Order must be 'asc' or 'desc'."}), 400
+    if limit < 1 or limit > GAMES_PAGE_MAX:
+        return jsonify({"error": f"Limit must be between 1 and {GAMES_PAGE_MAX}."}), 400
+    snapshot = snapshots.get()
+
+    def build():
+        games_list, next_cursor = snapshot.games_page(
+            season, player, winner, order, cursor_id, limit
+        )
+        return {"games": games_list, "next_cursor": next_cursor}
+
+    return response_cache.cached_json_response(
+        api_cache,
+        ("games", season, player, winner, order, cursor_id, limit),
+        snapshot.version,
+        build,
+    )
+
+
+# --- Leaderboard Endpoint ---
+@app.route("/leaderboard", methods=["GET"])
+@app.route("/api/leaderboard", methods=["GET"])
+def get_leaderboard_route():
+    season = request.args.get("season", CURRENT_SEASON, type=int)
+    snapshot = snapshots.get()
+    return response_cache.cached_json_response(
+        api_cache,
+        ("leaderboard", season),
+        snapshot.version,
+        lambda: {"season": season, "players": snapshot.leaderboard(season, DEFAULT_ELO)},
+    )
+
+
+# --- Head-to-Head Endpoints ---
+@app.route("/head_to_head/<username>", methods=["GET"])
+@app.route("/api/head_to_head/<username>", methods=["GET"])
+def get_head_to_head_route(username):
+    season = request.args.get("season", CURRENT_SEASON, type=int)
+    snapshot = snapshots.get()
+    return response_cache.cached_json_response(
+        api_cache,
+        ("head_to_head", username, season),
+        snapshot.version,
+        lambda: {
+            "username": username,
+            "season": season,
+            "opponents": snapshot.head_to_head_player(username, season),
+        },
+    )
+
+
+@app.route("/head_to_head", methods=["GET"])
+@app.route("/api/head_to_head", methods=["GET"])
+def get_head_to_head_matrix_route():
+    season = request.args.get("season", CURRENT_SEASON, type=int)
+    snapshot = snapshots.get()
+    return response_cache.cached_json_response(
+        api_cache,
+        ("head_to_head_matrix", season),
+        snapshot.version,
+        lambda: {"season": season, "pairs": snapshot.head_to_head_matrix(season)},
+    )
+
+
+# --- Rating History Endpoint ---
+@app.route("/rating_history/<username>", methods=["GET"])
+@app.route("/api/rating_history/<username>", methods=["GET"])
+def get_rating_history(username):
+    # Read from the database: per-game history of every player would make
+    # each worker's snapshot several times larger.
+    # Defaults to the current season; pass season=0 for the all-seasons replay.
+    season = request.args.get("season", CURRENT_SEASON, type=int)
+    from_game = request.args.get("from_game", 0, type=int)
+    to_game = request.args.get("to_game", None, type=int)
+    conn = database.connect_readonly(db)
+    try:
+        rows = elo_engine.load_history(
+            conn.cursor(),
+            username,
+            season=season or None,
+            from_game_id=from_game,
+            to_game_id=to_game,
+        )
+    except sqlite3.Error as e:
+        print(f"Database error in get_rating_history: {e}")
+        return jsonify({"error": "Failed to retrieve rating history"}), 500
+    finally:
+        database.release(conn)
+    history = [
+        {
+            "game_id": game_id,
+            "elo_before": elo_before,
+            "elo_after": elo_after,
+            "k": k,
+            "date": date_played,
+        }
+        for game_id, elo_before, elo_after, k, date_played in rows
+    ]
+    return jsonify({"username": username, "season": season, "history": history}), 200
+
+
+@app.route("/admin/metrics", methods=["GET"])
+def metrics_route():
+    # Prometheus text format; numbers are per process (per gunicorn worker).
+    return metrics.response()
+
+
+@app.route("/api/cache_stats", methods=["GET"])
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats_route():
+    return (
+        jsonify({"caches": [get_data_cache.stats(), api_cache.stats(), snapshots.stats()]}),
+        200,
+    )
+
+
 # --- Tournament Endpoints (Placeholders) ---
 @app.route("/get_tournaments", methods=["GET"])
 @app.route("/api/get_tournaments", methods=["GET"])
 def get_tournaments():
-    conn = sqlite3.connect(db)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, active, winner FROM tournaments")
-    rows = cursor.fetchall()
-    conn.close()
-    tournaments = [
-        {"id": r[0], "name": r[1], "active": bool(r[2]), "winner": r[3]} for r in rows
-    ]
-    return jsonify({"tournaments": tournaments}), 200
+    snapshot = snapshots.get()
+    return response_cache.cached_json_response(
+        api_cache,
+        "tournaments",
+        snapshot.version,
+        lambda: {"tournaments": snapshot.tournament_list()},
+    )
 
 
 @app.route("/tournament/<int:tournament_id>", methods=["GET"])
 @app.route("/api/tournament/<int:tournament_id>", methods=["GET"])
 def get_tournament(tournament_id):
-    conn = sqlite3.connect(db)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT name, active, winner, finished FROM tournaments WHERE id = ?",
-        (tournament_id,),
-    )
-    tournament_row = cursor.fetchone()
-    if not tournament_row:
-        conn.close()
+    tournament = snapshots.get().tournament(tournament_id)
+    if not tournament:
         return jsonify({"error": "Tournament not found"}), 404
-
-    if not tournament_row[1] and not tournament_row[3]:
-        conn.close()
+    name, active, winner, finished, rounds = tournament
+    if not active and not finished:
         return jsonify({"message": "Tournament has not started yet"})
-
-    cursor.execute(
-        "SELECT player_one, player_two, winner, finished, round FROM tournament_games WHERE tournament_id = ? ORDER BY round ASC, id ASC",
-        (tournament_id,),
-    )
-    games_data = cursor.fetchall()
-    rounds = {}
-    for game_row_data in games_data:
-        round_num = game_row_data[4]
-        rounds.setdefault(round_num, []).append(
-            [
-                game_row_data[0],
-                game_row_data[1],
-                game_row_data[2],
-                bool(game_row_data[3]),
-            ]
-        )
-    rounds_list = [rounds[rn] for rn in sorted(rounds.keys())]
-    conn.close()
     return (
         jsonify(
             {
-                "name": tournament_row[0],
-                "active": bool(tournament_row[1]),
-                "winner": tournament_row[2],
-                "rounds": rounds_list,
+                "name": name,
+                "active": bool(active),
+                "winner": winner,
+                "rounds": rounds,
             }
         ),
         200,
     )
 
 
-recalculate_all_elos()
+database.init(db)
+migrations.migrate(db)
+ensure_elos()
+snapshots.load()
 if __name__ == "__main__":
-    # The global call to recalculate_all_elos() from user's original code:
-    # This will run every time the Flask development server reloads.
-    # For a production environment, or if recalculation is slow,
-    # it's better to trigger this via an explicit admin action (like the route above).
     app.run(host="0.0.0.0", port=3000, debug=True)
@@ -0,0 +1,291 @@
+import functools
+import os
+import threading
+import time
+
+from flask import current_app, g, request
+
+# --- Metrics ---
+# In-process counters and histograms, rendered in the Prometheus text format
+# by /admin/metrics. Each process (e.g. each gunicorn worker) keeps its
+# own numbers. instrument_app() times every request and counts the SQLite
+# statements and rows it used; instrument_connection() hooks a connection
+# into those per-request counts, and add_counts() credits a request with
+# statements run for it on another thread. Requests slower than
+# SLOW_REQUEST_MS are logged when that environment variable is set.
+#
+# Rows are counted through the connection's row_factory, which costs about
+# 0.4 microseconds per row; set METRICS_COUNT_ROWS=0 to turn it off.
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+ROW_BUCKETS = (1, 10, 100, 1000, 10_000, 100_000, 1_000_000)
+
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))
+COUNT_ROWS = os.environ.get("METRICS_COUNT_ROWS", "1") != "0"
+
+_lock = threading.Lock()
+_metrics = {}  # name -> metric, in registration order
+_caches = []
+_local = threading.local()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, *labels):
+        with _lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * len(self.buckets) + [0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        for labels, entry in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, entry):
+                bucket_labels = _labels(self.label_names, labels, [("le", _number(bound))])
+                yield f"{self.name}_bucket{bucket_labels} {count}"
+            plain = _labels(self.label_names, labels)
+            yield f"{self.name}_sum{plain} {_number(entry[-2])}"
+            yield f"{self.name}_count{plain} {entry[-1]}"
+
+
+def _register(metric):
+    _metrics[metric.name] = metric
+    return metric
+
+
+REQUEST_LATENCY = _register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Request latency by route.",
+        ("app", "route", "method"),
+    )
+)
+REQUESTS = _register(
+    Counter(
+        "http_requests_total",
+        "Requests by route and status code.",
+        ("app", "route", "method", "status"),
+    )
+)
+REQUEST_STATEMENTS = _register(
+    Histogram(
+        "sqlite_statements_per_request",
+        "SQLite statements executed while handling a request.",
+        ("app", "route"),
+        STATEMENT_BUCKETS,
+    )
+)
+REQUEST_ROWS = _register(
+    Histogram(
+        "sqlite_rows_per_request",
+        "Rows SQLite returned while handling a request.",
+        ("app", "route"),
+        ROW_BUCKETS,
+    )
+)
+STATEMENTS = _register(
+    Counter("sqlite_statements_total", "SQLite statements executed by requests.")
+)
+ROWS = _register(Counter("sqlite_rows_total", "Rows SQLite returned to requests."))
+FUNCTION_LATENCY = _register(
+    Histogram(
+        "function_duration_seconds",
+        "Time spent in instrumented functions.",
+        ("function",),
+    )
+)
+FUNCTION_ERRORS = _register(
+    Counter(
+        "function_errors_total",
+        "Instrumented function calls that raised.",
+        ("function",),
+    )
+)
+
+
+# --- SQLite hooks ---
+def _count_statement(_sql):
+    _local.statements = getattr(_local, "statements", 0) + 1
+
+
+def _count_row(_cursor, row):
+    _local.rows = getattr(_local, "rows", 0) + 1
+    return row
+
+
+def instrument_connection(conn):
+    conn.set_trace_callback(_count_statement)
+    if COUNT_ROWS:
+        conn.row_factory = _count_row
+
+
+def take_counts():
+    """
+    Returns and resets this thread's (statements, rows) since the last call.
+    """
+    statements = getattr(_local, "statements", 0)
+    rows = getattr(_local, "rows", 0)
+    _local.statements = _local.rows = 0
+    return statements, rows
+
+
+def add_counts(statements, rows):
+    """
+    Adds statements and rows counted on another thread (e.g. the write
+    queue's writer) to this thread's request.
+    """
+    _local.statements = getattr(_local, "statements", 0) + statements
+    _local.rows = getattr(_local, "rows", 0) + rows
+
+
+# --- Functions ---
+def timed(name):
+    """
+    Decorator recording each call's duration in function_duration_seconds.
+    """
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                FUNCTION_ERRORS.inc(name)
+                raise
+            finally:
+                FUNCTION_LATENCY.observe(time.perf_counter() - start, name)
+
+        return wrapper
+
+    return decorate
+
+
+# --- Flask ---
+def instrument_app(app, app_name):
+    @app.before_request
+    def _start_request():
+        take_counts()  # Drop anything counted outside a request.
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _finish_request(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        statements, rows = take_counts()
+        STATEMENTS.inc(amount=statements)
+        ROWS.inc(amount=rows)
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.observe(elapsed, app_name, route, request.method)
+        REQUESTS.inc(app_name, route, request.method, str(response.status_code))
+        REQUEST_STATEMENTS.observe(statements, app_name, route)
+        REQUEST_ROWS.observe(rows, app_name, route)
+        if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+            print(
+                f"Slow request: {request.method} {request.full_path.rstrip('?')} "
+                f"{response.status_code} took {elapsed * 1000:.1f} ms, "
+                f"{statements} statements, {rows} rows"
+            )
+        return response
+
+
+def register_cache(cache):
+    """
+    Adds a cache with a stats() dict (hits, misses, not_modified and, for
+    response caches, compression and byte counts) to the cache metrics.
+    """
+    if cache not in _caches:
+        _caches.append(cache)
+
+
+def _cache_samples():
+    stats = [cache.stats() for cache in _caches]
+    for key, kind, help_text in (
+        ("hits", "counter", "Cache lookups served from the cache."),
+        ("misses", "counter", "Cache lookups that rebuilt the entry."),
+        ("not_modified", "counter", "Requests answered with 304 Not Modified."),
+        ("hit_rate", "gauge", "Share of cache lookups that were hits."),
+        ("compressions", "counter", "Bodies gzip-compressed (once per entry)."),
+        ("compress_seconds", "counter", "Time spent gzip-compressing bodies."),
+        ("compressed_hits", "counter", "Gzip bodies served without compressing again."),
+        ("bytes_sent", "counter", "Response body bytes sent from the cache."),
+        ("bytes_uncompressed", "counter", "Bytes the same responses would take uncompressed."),
+    ):
+        name = f"cache_{key}_total" if kind == "counter" else f"cache_{key}"
+        lines = [
+            f"{name}{_labels(('cache',), (s['name'],))} {_number(s[key])}"
+            for s in stats
+            if key in s
+        ]
+        if lines:
+            yield f"# HELP {name} {help_text}"
+            yield f"# TYPE {name} {kind}"
+            yield from lines
+
+
+def render():
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        for metric in _metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+    lines.extend(_cache_samples())
+    return "\n".join(lines) + "\n"
+
+
+def response():
+    return current_app.response_class(
+        render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
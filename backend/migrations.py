@@ -0,0 +1,498 @@
+"""
+Versioned schema migrations for game_database.db.
+
+Both Flask apps call migrate() at startup. Each migration runs once, inside
+its own transaction, and is recorded in schema_version. Running migrate()
+again (or from several gunicorn workers at once) is a no-op once the
+database is up to date.
+
+Usage (from backend/):
+    python migrations.py [path/to/game_database.db] [--check]
+"""
+
+import sqlite3
+import sys
+import time
+
+import achievements
+import head_to_head
+import player_ids
+import player_stats
+
+# --- Player Id Helpers (migration 11) ---
+def _player_id(column):
+    return f"(SELECT id FROM players WHERE username = {column})"
+
+
+def _unmatched_id(column):
+    # Set only for names without a players row; unmatched_names holds no
+    # name that is also a player.
+    return f"(SELECT id FROM unmatched_names WHERE username = {column})"
+
+
+def _keep_games_sequence(conn):
+    # Dropping games drops its AUTOINCREMENT counter; carry it over to the
+    # rebuilt table so ids of deleted games are never reused.
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'games'").fetchone()
+    conn.execute(
+        "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'games_new'",
+        (row[0] if row else 0,),
+    )
+
+
+# --- Migrations ---
+# (version, description, steps). A step is an SQL string or a callable that
+# receives the connection. Never edit a migration that has shipped; add a
+# new one instead.
+MIGRATIONS = [
+    (
+        1,
+        "rating engine tables",
+        [
+            """CREATE TABLE IF NOT EXISTS elo_checkpoints (
+                season INTEGER NOT NULL,
+                game_id INTEGER NOT NULL,
+                username TEXT NOT NULL,
+                elo INTEGER,
+                games_played INTEGER NOT NULL,
+                PRIMARY KEY (season, game_id, username)
+            )""",
+            # The primary key doubles as the index for trajectory range queries.
+            """CREATE TABLE IF NOT EXISTS rating_history (
+                season INTEGER NOT NULL,
+                username TEXT NOT NULL,
+                game_id INTEGER NOT NULL,
+                elo_before INTEGER NOT NULL,
+                elo_after INTEGER NOT NULL,
+                k INTEGER NOT NULL,
+                PRIMARY KEY (season, username, game_id)
+            )""",
+            """CREATE TABLE IF NOT EXISTS player_game_counts (
+                username TEXT NOT NULL,
+                season INTEGER NOT NULL,
+                games_played INTEGER NOT NULL,
+                PRIMARY KEY (username, season)
+            )""",
+        ],
+    ),
+    (
+        2,
+        "indexes for the hot read and rating queries",
+        [
+            # get_data() in main.py: one season's non-archived games by id.
+            "CREATE INDEX IF NOT EXISTS idx_games_season_archived_id ON games (season, archived, id)",
+            # get_data() in admin_api.py: every non-archived game by id.
+            "CREATE INDEX IF NOT EXISTS idx_games_archived_id ON games (archived, id)",
+            # Per-player lookups (legacy get_k, counters rebuild, filters).
+            "CREATE INDEX IF NOT EXISTS idx_games_p1 ON games (p1, season)",
+            "CREATE INDEX IF NOT EXISTS idx_games_p2 ON games (p2, season)",
+            "CREATE INDEX IF NOT EXISTS idx_games_winner ON games (winner, season)",
+            # Every ELO lookup and update filters on username.
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_players_username ON players (username)",
+            # get_tournament(): one tournament's games by round.
+            "CREATE INDEX IF NOT EXISTS idx_tournament_games_tournament ON tournament_games (tournament_id, round, id)",
+        ],
+    ),
+    (
+        3,
+        "per-player indexes for keyset-paginated game pages",
+        [
+            # Superset of the migration 2 per-player indexes, so those go.
+            "DROP INDEX IF EXISTS idx_games_p1",
+            "DROP INDEX IF EXISTS idx_games_p2",
+            "DROP INDEX IF EXISTS idx_games_winner",
+            "CREATE INDEX IF NOT EXISTS idx_games_p1_page ON games (p1, season, archived, id)",
+            "CREATE INDEX IF NOT EXISTS idx_games_p2_page ON games (p2, season, archived, id)",
+            "CREATE INDEX IF NOT EXISTS idx_games_winner_page ON games (winner, season, archived, id)",
+        ],
+    ),
+    (
+        4,
+        "global data version counter",
+        [
+            """CREATE TABLE IF NOT EXISTS data_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )""",
+            "INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)",
+        ],
+    ),
+    (
+        5,
+        "per-player season stats for the leaderboard",
+        [
+            """CREATE TABLE IF NOT EXISTS player_stats (
+                username TEXT NOT NULL,
+                season INTEGER NOT NULL,
+                wins INTEGER NOT NULL,
+                losses INTEGER NOT NULL,
+                PRIMARY KEY (username, season)
+            )""",
+            player_stats.rebuild,
+        ],
+    ),
+    (
+        6,
+        "sparse head-to-head table",
+        [
+            """CREATE TABLE IF NOT EXISTS head_to_head (
+                player TEXT NOT NULL,
+                opponent TEXT NOT NULL,
+                season INTEGER NOT NULL,
+                wins INTEGER NOT NULL,
+                losses INTEGER NOT NULL,
+                last_played INTEGER,
+                last_game_id INTEGER NOT NULL,
+                PRIMARY KEY (player, season, opponent)
+            )""",
+            # League-wide matrix for one season.
+            "CREATE INDEX IF NOT EXISTS idx_head_to_head_season ON head_to_head (season, player, opponent)",
+            head_to_head.rebuild,
+        ],
+    ),
+    (
+        7,
+        "normalized achievements",
+        [
+            """CREATE TABLE IF NOT EXISTS achievements (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                description TEXT NOT NULL,
+                icon_url TEXT NOT NULL,
+                UNIQUE (name, description, icon_url)
+            )""",
+            """CREATE TABLE IF NOT EXISTS player_achievements (
+                username TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                achievement_id INTEGER NOT NULL REFERENCES achievements (id),
+                PRIMARY KEY (username, position)
+            )""",
+            # Bumped whenever a player record changes; see achievements.BadgeCache.
+            "ALTER TABLE data_version ADD COLUMN players_version INTEGER NOT NULL DEFAULT 0",
+            achievements.import_legacy,
+        ],
+    ),
+    (
+        8,
+        "change log for replication",
+        [
+            # AUTOINCREMENT keeps sequence numbers increasing after pruning.
+            """CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at INTEGER NOT NULL
+            )""",
+        ],
+    ),
+    (
+        9,
+        "fingerprint of the last full rating replay",
+        [
+            """CREATE TABLE IF NOT EXISTS rating_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                fingerprint TEXT NOT NULL,
+                computed_at INTEGER NOT NULL
+            )""",
+        ],
+    ),
+    (
+        10,
+        "per-season ratings",
+        [
+            """CREATE TABLE IF NOT EXISTS season_ratings (
+                season INTEGER NOT NULL,
+                username TEXT NOT NULL,
+                elo INTEGER NOT NULL,
+                games_played INTEGER NOT NULL,
+                PRIMARY KEY (season, username)
+            )""",
+            # The next startup replays every season to fill the table.
+            "DELETE FROM rating_state",
+        ],
+    ),
+    (
+        11,
+        "integer player ids in games and tournaments",
+        [
+            # Names the username columns hold that have no players row (typos,
+            # players since removed). Their games and brackets refer to them
+            # through the *_unmatched_id columns instead, so no player is
+            # invented and every foreign key holds.
+            """CREATE TABLE IF NOT EXISTS unmatched_names (
+                id INTEGER PRIMARY KEY,
+                username TEXT NOT NULL UNIQUE
+            )""",
+            """INSERT OR IGNORE INTO unmatched_names (username)
+            SELECT name FROM (
+                SELECT p1 AS name FROM games
+                UNION SELECT p2 FROM games
+                UNION SELECT winner FROM games
+                UNION SELECT player_one FROM tournament_games
+                UNION SELECT player_two FROM tournament_games
+                UNION SELECT winner FROM tournament_games
+                UNION SELECT winner FROM tournaments
+            )
+            WHERE name IS NOT NULL AND name NOT IN (SELECT username FROM players)
+            ORDER BY name""",
+            # Rebuilt rather than altered: SQLite cannot add NOT NULL or
+            # foreign key columns filled from a query.
+            """CREATE TABLE games_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date_played INT,
+                p1_id INTEGER REFERENCES players (id),
+                p2_id INTEGER REFERENCES players (id),
+                doubles NUM NOT NULL,
+                winner_id INTEGER REFERENCES players (id),
+                archived INT NOT NULL,
+                season INT NOT NULL DEFAULT '',
+                p1_unmatched_id INTEGER REFERENCES unmatched_names (id),
+                p2_unmatched_id INTEGER REFERENCES unmatched_names (id),
+                winner_unmatched_id INTEGER REFERENCES unmatched_names (id),
+                CHECK ((p1_id IS NULL) <> (p1_unmatched_id IS NULL)),
+                CHECK ((p2_id IS NULL) <> (p2_unmatched_id IS NULL)),
+                CHECK ((winner_id IS NULL) <> (winner_unmatched_id IS NULL))
+            )""",
+            f"""INSERT INTO games_new
+                (id, date_played, p1_id, p2_id, doubles, winner_id, archived, season,
+                p1_unmatched_id, p2_unmatched_id, winner_unmatched_id)
+            SELECT id, date_played, {_player_id('p1')}, {_player_id('p2')}, doubles,
+                {_player_id('winner')}, archived, season, {_unmatched_id('p1')},
+                {_unmatched_id('p2')}, {_unmatched_id('winner')}
+            FROM games ORDER BY id""",
+            _keep_games_sequence,
+            "DROP TABLE games",
+            "ALTER TABLE games_new RENAME TO games",
+            "CREATE INDEX IF NOT EXISTS idx_games_season_archived_id ON games (season, archived, id)",
+            "CREATE INDEX IF NOT EXISTS idx_games_archived_id ON games (archived, id)",
+            "CREATE INDEX IF NOT EXISTS idx_games_p1_page ON games (p1_id, season, archived, id)",
+            "CREATE INDEX IF NOT EXISTS idx_games_p2_page ON games (p2_id, season, archived, id)",
+            "CREATE INDEX IF NOT EXISTS idx_games_winner_page ON games (winner_id, season, archived, id)",
+            """CREATE TABLE tournament_games_new (
+                id INTEGER PRIMARY KEY,
+                player_one_id INTEGER REFERENCES players (id),
+                player_two_id INTEGER REFERENCES players (id),
+                winner_id INTEGER REFERENCES players (id),
+                tournament_id INT,
+                finished INT,
+                round INT,
+                player_one_unmatched_id INTEGER REFERENCES unmatched_names (id),
+                player_two_unmatched_id INTEGER REFERENCES unmatched_names (id),
+                winner_unmatched_id INTEGER REFERENCES unmatched_names (id),
+                CHECK (player_one_id IS NULL OR player_one_unmatched_id IS NULL),
+                CHECK (player_two_id IS NULL OR player_two_unmatched_id IS NULL),
+                CHECK (winner_id IS NULL OR winner_unmatched_id IS NULL)
+            )""",
+            f"""INSERT INTO tournament_games_new
+                (id, player_one_id, player_two_id, winner_id, tournament_id, finished, round,
+                player_one_unmatched_id, player_two_unmatched_id, winner_unmatched_id)
+            SELECT id, {_player_id('player_one')}, {_player_id('player_two')},
+                {_player_id('winner')}, tournament_id, finished, round,
+                {_unmatched_id('player_one')}, {_unmatched_id('player_two')},
+                {_unmatched_id('winner')}
+            FROM tournament_games""",
+            "DROP TABLE tournament_games",
+            "ALTER TABLE tournament_games_new RENAME TO tournament_games",
+            "CREATE INDEX IF NOT EXISTS idx_tournament_games_tournament ON tournament_games (tournament_id, round, id)",
+            """CREATE TABLE tournaments_new (
+                id INTEGER PRIMARY KEY,
+                active INTEGER NOT NULL,
+                name TEXT,
+                winner_id INTEGER REFERENCES players (id),
+                finished INTEGER,
+                winner_unmatched_id INTEGER REFERENCES unmatched_names (id),
+                CHECK (winner_id IS NULL OR winner_unmatched_id IS NULL)
+            )""",
+            f"""INSERT INTO tournaments_new (id, active, name, winner_id, finished, winner_unmatched_id)
+            SELECT id, active, name, {_player_id('winner')}, finished, {_unmatched_id('winner')}
+            FROM tournaments""",
+            "DROP TABLE tournaments",
+            "ALTER TABLE tournaments_new RENAME TO tournaments",
+            # Migrations 5 and 6 find games without id columns on databases
+            # older than this one and leave these tables empty.
+            player_stats.rebuild,
+            head_to_head.rebuild,
+        ],
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at INTEGER NOT NULL
+        )"""
+    )
+
+
+def current_version(conn):
+    _ensure_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+
+def migrate(db_path):
+    """
+    Applies every pending migration. Returns the list of versions applied.
+    """
+    # Autocommit mode, so BEGIN IMMEDIATE below controls the transactions.
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    applied = []
+    try:
+        _ensure_version_table(conn)
+        for version, description, steps in MIGRATIONS:
+            # Take the write lock before re-checking the version, so workers
+            # starting together apply each migration exactly once.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if version <= current_version(conn):
+                    conn.execute("ROLLBACK")
+                    continue
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, int(time.time())),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"Applied migration {version}: {description}")
+            applied.append(version)
+        return applied
+    finally:
+        conn.close()
+
+
+# --- Query Plan Checks ---
+# (description, query, params, index the plan must use). Run with --check
+# after changing a hot query or an index.
+_GAME_PLAYERS = ", ".join(player_ids.player_ref(c) for c in ("p1", "p2", "winner"))
+_TOURNAMENT_PLAYERS = ", ".join(
+    player_ids.player_ref(c) for c in ("player_one", "player_two", "winner")
+)
+QUERY_PLAN_EXPECTATIONS = [
+    (
+        "main get_data games",
+        f"SELECT id, {_GAME_PLAYERS}, date_played, archived, season FROM games WHERE season = ? AND archived = 0 ORDER BY id ASC",
+        (2,),
+        "idx_games_season_archived_id",
+    ),
+    (
+        "admin get_data games",
+        f"SELECT id, {_GAME_PLAYERS}, date_played, archived, season FROM games WHERE archived = 0 ORDER BY id ASC",
+        (),
+        "idx_games_archived_id",
+    ),
+    (
+        "games page",
+        "SELECT id, p1_id, p2_id, winner_id, date_played, season FROM games WHERE season = ? AND archived = 0 AND id < ? ORDER BY id DESC LIMIT ?",
+        (2, 500, 11),
+        "idx_games_season_archived_id",
+    ),
+    (
+        "player games page",
+        "SELECT id, p1_id, p2_id, winner_id, date_played, season FROM games WHERE p1_id = ? AND season = ? AND archived = 0 AND id > ? ORDER BY id ASC LIMIT ?",
+        (1, 2, 0, 11),
+        "idx_games_p1_page",
+    ),
+    (
+        "player ELO lookup",
+        "SELECT ELO FROM players WHERE username = ?",
+        ("Oli",),
+        "idx_players_username",
+    ),
+    (
+        "player ids for names",
+        "SELECT username, id FROM players WHERE username IN (?, ?)",
+        ("Oli", "Jack"),
+        "idx_players_username",
+    ),
+    (
+        "player ELO update",
+        "UPDATE players SET ELO = ? WHERE username = ?",
+        (480, "Oli"),
+        "idx_players_username",
+    ),
+    (
+        "legacy get_k count",
+        "SELECT COUNT(*) FROM games WHERE p1_id = ? OR p2_id = ?",
+        (1, 1),
+        "idx_games_p2_page",
+    ),
+    (
+        "games-played counter",
+        "SELECT SUM(games_played) FROM player_game_counts WHERE username = ?",
+        ("Oli",),
+        "sqlite_autoindex_player_game_counts_1",
+    ),
+    (
+        "rating history range",
+        "SELECT game_id, elo_before, elo_after, k FROM rating_history WHERE season = ? AND username = ? AND game_id BETWEEN ? AND ?",
+        (0, "Oli", 0, 1000),
+        "sqlite_autoindex_rating_history_1",
+    ),
+    (
+        "head-to-head pair refresh",
+        "SELECT id FROM (" + head_to_head.PAIR_QUERY + ") WHERE season = ? AND player_id = ? AND opponent_id = ?",
+        (2, 1, 2),
+        "idx_games_p2_page",
+    ),
+    (
+        "head-to-head matrix",
+        "SELECT player, opponent, wins, losses FROM head_to_head WHERE season = ? ORDER BY player, opponent",
+        (2,),
+        "idx_head_to_head_season",
+    ),
+    (
+        "tournament games",
+        f"SELECT {_TOURNAMENT_PLAYERS}, finished, round FROM tournament_games WHERE tournament_id = ? ORDER BY round ASC, id ASC",
+        (1,),
+        "idx_tournament_games_tournament",
+    ),
+]
+
+
+def query_plan(conn, query, params=()):
+    rows = conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def check_query_plans(conn):
+    """
+    Returns (description, plan) for every expectation whose plan does not use
+    the expected index, or scans a table.
+    """
+    failures = []
+    for description, query, params, index_name in QUERY_PLAN_EXPECTATIONS:
+        plan = query_plan(conn, query, params)
+        uses_index = any(index_name in step for step in plan)
+        scans = any(step.startswith("SCAN") and "INDEX" not in step for step in plan)
+        if not uses_index or scans:
+            failures.append((description, plan))
+    return failures
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    path = args[0] if args else "./game_database.db"
+    migrate(path)
+    check_conn = sqlite3.connect(path)
+    print(f"Schema version: {current_version(check_conn)}")
+    if "--check" in sys.argv:
+        failures = check_query_plans(check_conn)
+        for description, plan in failures:
+            print(f"FAIL ({description}): {plan}")
+        if not failures:
+            print(f"OK ({len(QUERY_PLAN_EXPECTATIONS)} query plans use their indexes)")
+        check_conn.close()
+        sys.exit(1 if failures else 0)
+    check_conn.close()
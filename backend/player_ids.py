@@ -0,0 +1,106 @@
+# --- Player Ids ---
+# games, tournament_games and tournaments refer to players by players.id.
+# Usernames only exist at the edges: requests, imports and the replication
+# log name players, and responses show names. Names are resolved to ids once
+# per request or batch here, and ids back to names once per load, so no
+# query compares username text to find a game.
+#
+# Names that had no players row when migration 11 ran are kept in
+# unmatched_names. Old games and brackets refer to them through a
+# *_unmatched_id column next to each player id column, so they keep showing
+# those names without adding them as players. Readers combine the two into
+# one signed id (player_ref()): the players id, or -unmatched_names.id.
+# The derived tables (rating_history, player_stats, head_to_head, ...) are
+# still keyed by username; they are rebuilt from games by a replay.
+
+
+class PlayerNotFound(Exception):
+    """
+    Raised when a game names a player that is not in the players table.
+    """
+
+    def __init__(self, name):
+        super().__init__(f"Player not found: {name}")
+        self.name = name
+
+
+def ids_for(cursor, names):
+    """
+    Returns {username: id} for the names that exist.
+    """
+    names = sorted(set(names))
+    if not names:
+        return {}
+    placeholders = ", ".join("?" * len(names))
+    cursor.execute(
+        f"SELECT username, id FROM players WHERE username IN ({placeholders})", names
+    )
+    return dict(cursor.fetchall())
+
+
+def require_ids(cursor, names):
+    """
+    ids_for(), raising PlayerNotFound for the first name that does not exist.
+    """
+    ids = ids_for(cursor, names)
+    for name in names:
+        if name not in ids:
+            raise PlayerNotFound(name)
+    return ids
+
+
+def names_by_id(cursor):
+    """
+    Returns {signed id: username} for every player and unmatched name.
+    """
+    cursor.execute(
+        "SELECT id, username FROM players "
+        "UNION ALL SELECT -id, username FROM unmatched_names"
+    )
+    return dict(cursor.fetchall())
+
+
+def player_ref(column):
+    """
+    SQL expression for the signed id a player reference holds, given the
+    column without its suffix: "g.p1" reads g.p1_id and g.p1_unmatched_id.
+    """
+    return f"COALESCE({column}_id, -{column}_unmatched_id)"
+
+
+def name_of(id_sql):
+    """
+    SQL expression for the name a signed id refers to. Both lookups are on
+    a primary key.
+    """
+    return f"""COALESCE(
+        (SELECT username FROM players WHERE id = {id_sql}),
+        (SELECT username FROM unmatched_names WHERE id = -{id_sql})
+    )"""
+
+
+def player_name(column):
+    """
+    name_of() the reference in a column pair, e.g. "g.p1".
+    """
+    return name_of(player_ref(column))
+
+
+def games_have_ids(conn):
+    """
+    Whether games has the id columns yet. Migrations before 11 run rebuilds
+    against the older, username-keyed games table.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(games)")}
+    return "p1_id" in columns
+
+
+# Games with their player names, for the few readers that need every column
+# by name (exports, checks).
+GAMES_WITH_NAMES = f"""
+    SELECT g.id AS id, g.date_played AS date_played, {player_name("g.p1")} AS p1,
+        {player_name("g.p2")} AS p2, g.doubles AS doubles,
+        {player_name("g.winner")} AS winner, g.archived AS archived,
+        g.season AS season
+    FROM games g
+"""
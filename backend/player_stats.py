@@ -0,0 +1,86 @@
+import player_ids
+
+# --- Player Stats ---
+# Wins and losses per (player, season) over non-archived games, the same
+# games get_data() shows. They are adjusted in the same transaction as each
+# game insert, delete and edit, and rebuilt from scratch on a full ELO
+# replay. Win rate, games played and rank are derived when read.
+
+
+def record_game(
+    cursor, p1_name, p2_name, winner_name, season, archived=0, delta=1
+):
+    """
+    Counts a game inserted (delta=1) or removed (delta=-1). Archived games
+    and games with an invalid winner do not count.
+    """
+    if archived or winner_name not in (p1_name, p2_name):
+        return
+    loser_name = p2_name if winner_name == p1_name else p1_name
+    cursor.executemany(
+        """INSERT INTO player_stats (username, season, wins, losses)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (username, season) DO UPDATE SET
+            wins = wins + excluded.wins,
+            losses = losses + excluded.losses""",
+        [(winner_name, season, delta, 0), (loser_name, season, 0, delta)],
+    )
+
+
+def record_games(cursor, games):
+    """
+    record_game() for a batch of inserted (p1, p2, winner, season, archived)
+    games, one row per (player, season).
+    """
+    totals = {}
+    for p1_name, p2_name, winner_name, season, archived in games:
+        if archived or winner_name not in (p1_name, p2_name):
+            continue
+        loser_name = p2_name if winner_name == p1_name else p1_name
+        totals.setdefault((winner_name, season), [0, 0])[0] += 1
+        totals.setdefault((loser_name, season), [0, 0])[1] += 1
+    cursor.executemany(
+        """INSERT INTO player_stats (username, season, wins, losses)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (username, season) DO UPDATE SET
+            wins = wins + excluded.wins,
+            losses = losses + excluded.losses""",
+        [(name, season, w, l) for (name, season), (w, l) in totals.items()],
+    )
+
+
+def rebuild(conn):
+    conn.execute("DELETE FROM player_stats")
+    if not player_ids.games_have_ids(conn):
+        return
+    # Games naming unmatched names count for them too, as record_game() does.
+    p1, p2, winner = (player_ids.player_ref(c) for c in ("p1", "p2", "winner"))
+    conn.execute(
+        f"""INSERT INTO player_stats (username, season, wins, losses)
+        SELECT {player_ids.name_of("t.player_id")}, t.season, t.wins, t.losses FROM (
+            SELECT player_id, season, SUM(won) AS wins, SUM(1 - won) AS losses FROM (
+                SELECT {p1} AS player_id, season, {winner} = {p1} AS won FROM games
+                WHERE archived = 0 AND {winner} IN ({p1}, {p2})
+                UNION ALL
+                SELECT {p2} AS player_id, season, {winner} = {p2} AS won FROM games
+                WHERE archived = 0 AND {winner} IN ({p1}, {p2})
+            )
+            GROUP BY player_id, season
+        ) t"""
+    )
+
+
+def leaderboard_entry(username, elo, description, badges, wins, losses, rank):
+    games_played = wins + losses
+    return {
+        "username": username,
+        "elo": elo,
+        "description": description,
+        "achievements": badges,
+        "wins": wins,
+        "losses": losses,
+        # Same rounding as the frontend's Math.round percentage.
+        "winRate": int(wins * 100 / games_played + 0.5) if games_played else 0,
+        "gamesPlayed": games_played,
+        "rank": rank,
+    }
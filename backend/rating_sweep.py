@@ -0,0 +1,340 @@
+"""
+Rating-parameter sweep for the ELO engine.
+
+Replays the game history once for many rating configurations at the same
+time and scores how well each one predicted the games: before every game,
+expected() gives the winner's predicted chance, and the sweep reports the
+mean log-loss, the Brier score and the share of games the favourite won.
+
+A configuration sets default_elo, k_new, k_established, k_threshold (games
+played before a player moves to k_established) and scale (the 400 in
+expected()). Ratings are held in a players x configurations NumPy array, so
+each game is a handful of vector operations whatever the number of
+configurations. The replay follows elo_engine.replay() exactly, including
+rounding after every game, so the engine's own constants reproduce the
+stored ratings.
+
+Values are given as a comma-separated list or an inclusive START:STOP:STEP
+range; every combination is tried, plus the engine's current constants.
+
+Usage (from backend/):
+    python rating_sweep.py DB [--k-new 16:48:4] [--k-established 8,16,24]
+        [--k-threshold 10:60:10] [--default-elo 480] [--scale 400]
+        [--season N] [--warmup N] [--top N] [--json]
+"""
+
+import itertools
+import json
+import math
+import sys
+
+import numpy as np
+
+import database
+import elo_engine
+import game_store
+
+PARAMETERS = ("default_elo", "k_new", "k_established", "k_threshold", "scale")
+MAX_CONFIGS = 20_000
+MAX_CELLS = 20_000_000  # players x configurations held in memory
+SCORE_BLOCK = 1024  # Games whose predictions are scored together
+EPSILON = 1e-15  # Keeps log-loss finite for a certain prediction that failed
+
+
+def current_config():
+    return {
+        "default_elo": elo_engine.DEFAULT_ELO,
+        "k_new": elo_engine.K_NEW,
+        "k_established": elo_engine.K_ESTABLISHED,
+        "k_threshold": elo_engine.K_THRESHOLD,
+        "scale": 400,
+    }
+
+
+def _number(text):
+    value = float(text)
+    if not math.isfinite(value):
+        raise ValueError(f"Invalid number {text!r}; values must be finite.")
+    return int(value) if value.is_integer() else value
+
+
+def parse_values(spec):
+    """
+    Turns "16,24,32", "16:48:4" (inclusive) or a list into a list of numbers.
+    Raises ValueError for anything else, including non-finite numbers and
+    more than MAX_CONFIGS values (checked before a range is expanded).
+    """
+    if isinstance(spec, (int, float)):
+        return [_number(str(spec))]
+    if isinstance(spec, list):
+        if len(spec) > MAX_CONFIGS:
+            raise ValueError(f"{len(spec)} values given; the limit is {MAX_CONFIGS}.")
+        return [_number(str(value)) for value in spec]
+    spec = str(spec).strip()
+    if ":" in spec:
+        parts = [_number(part) for part in spec.split(":")]
+        if len(parts) != 3 or parts[2] <= 0 or parts[1] < parts[0]:
+            raise ValueError(f"Invalid range {spec!r}; expected START:STOP:STEP.")
+        start, stop, step = parts
+        try:
+            span = (stop - start) / step + 1e-9
+        except OverflowError:
+            span = math.inf
+        if not span < MAX_CONFIGS:
+            raise ValueError(f"Range {spec!r} has more than {MAX_CONFIGS} values.")
+        count = int(span) + 1
+        return [_number(str(start + i * step)) for i in range(count)]
+    return [_number(part) for part in spec.split(",") if part.strip()]
+
+
+def grid(values, include_current=True):
+    """
+    Returns one config dict per combination of values ({parameter: [...]});
+    parameters that are not given keep the engine's current value.
+    """
+    current = current_config()
+    unknown = set(values) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    lists = [values.get(name) or [current[name]] for name in PARAMETERS]
+    total = 1
+    for options in lists:
+        total *= len(options)
+    if total > MAX_CONFIGS:
+        raise ValueError(f"{total} configurations requested; the limit is {MAX_CONFIGS}.")
+    configs = [dict(zip(PARAMETERS, combination)) for combination in itertools.product(*lists)]
+    if include_current and current not in configs:
+        configs.append(current)
+    for config in configs:
+        if config["scale"] <= 0 or config["k_threshold"] < 0:
+            raise ValueError(f"Invalid configuration: {config}")
+    return configs
+
+
+class History:
+    """
+    The games a replay applies, as lists: winner and loser indexes into
+    names and the games each had played before. Games that
+    elo_engine.replay() skips are left out. games is a GameStore or a list
+    of (id, p1, p2, winner) tuples.
+    """
+
+    def __init__(self, games, usernames):
+        if not isinstance(games, game_store.GameStore):
+            games = game_store.GameStore.from_games(games)
+        self.names = sorted(usernames)
+        index = {name: i for i, name in enumerate(self.names)}
+        # Row in names for each of the store's interned ids, None for non-players.
+        rows = [index.get(name) for name in games.names]
+        counts = [0] * len(games.names)
+        winners, losers, winner_games, loser_games = [], [], [], []
+        for p1, p2, flag in zip(games.p1, games.p2, games.winner):
+            if rows[p1] is None or rows[p2] is None or flag == game_store.WINNER_OTHER:
+                continue
+            winner, loser = (p1, p2) if flag == game_store.WINNER_P1 else (p2, p1)
+            winners.append(rows[winner])
+            losers.append(rows[loser])
+            winner_games.append(counts[winner])
+            loser_games.append(counts[loser])
+            counts[p1] += 1
+            counts[p2] += 1
+        self.winners = winners
+        self.losers = losers
+        self.winner_games = winner_games
+        self.loser_games = loser_games
+
+    def __len__(self):
+        return len(self.winners)
+
+
+def load_history(cursor, season=None):
+    return History(
+        game_store.GameStore.load(cursor, season), elo_engine.load_usernames(cursor)
+    )
+
+
+def replay(history, configs, warmup=0):
+    """
+    Replays history for every config. Returns (ratings, scores): ratings is
+    a players x configs array of final ratings (rows follow history.names);
+    scores holds per-config arrays of summed log_loss, brier and correct
+    over the games after the first warmup ones, plus the games count.
+    """
+    n_configs = len(configs)
+    if len(history.names) * n_configs > MAX_CELLS:
+        raise ValueError(
+            f"{len(history.names)} players x {n_configs} configurations is too large; "
+            f"reduce the grid below {MAX_CELLS // max(len(history.names), 1)} configurations."
+        )
+
+    def column(name):
+        return np.array([config[name] for config in configs], dtype=np.float64)
+
+    default_elo, k_new, k_established = (
+        column("default_elo"),
+        column("k_new"),
+        column("k_established"),
+    )
+    thresholds, scale = column("k_threshold"), column("scale")
+
+    # k_by_games[n] is each config's K for a player with n games behind
+    # them; past the highest threshold every config uses k_established.
+    top = int(np.ceil(thresholds.max())) if n_configs else 0
+    k_by_games = np.where(
+        np.arange(top + 1)[:, None] >= thresholds[None, :], k_established, k_new
+    )
+
+    ratings = np.tile(default_elo, (len(history.names), 1))
+    scores = {
+        "log_loss": np.zeros(n_configs),
+        "brier": np.zeros(n_configs),
+        "correct": np.zeros(n_configs),
+        "games": max(len(history) - warmup, 0),
+    }
+    block = np.empty((SCORE_BLOCK, n_configs))
+    filled = 0
+    exponent = np.empty(n_configs)
+    winner_expected = np.empty(n_configs)
+    loser_expected = np.empty(n_configs)
+
+    for position in range(len(history)):
+        w, l = history.winners[position], history.losers[position]
+        winner_rating, loser_rating = ratings[w], ratings[l]
+        # Same operations as elo_engine.expected(); negating the exponent is
+        # exact, so both players' values match the engine's bit for bit.
+        np.subtract(loser_rating, winner_rating, out=exponent)
+        np.divide(exponent, scale, out=exponent)
+        np.power(10.0, exponent, out=winner_expected)
+        np.negative(exponent, out=exponent)
+        np.power(10.0, exponent, out=loser_expected)
+        winner_expected += 1
+        np.reciprocal(winner_expected, out=winner_expected)
+        loser_expected += 1
+        np.reciprocal(loser_expected, out=loser_expected)
+
+        if position >= warmup:
+            block[filled] = winner_expected
+            filled += 1
+            if filled == SCORE_BLOCK:
+                _score(block, scores)
+                filled = 0
+
+        k_winner = k_by_games[min(history.winner_games[position], top)]
+        k_loser = k_by_games[min(history.loser_games[position], top)]
+        ratings[w] = np.rint(winner_rating + k_winner * (1 - winner_expected))
+        ratings[l] = np.rint(loser_rating + k_loser * (0 - loser_expected))
+
+    _score(block[:filled], scores)
+    return ratings, scores
+
+
+def _score(predictions, scores):
+    # predictions holds the winner's predicted chance per game and config.
+    scores["log_loss"] -= np.log(np.maximum(predictions, EPSILON)).sum(axis=0)
+    scores["brier"] += ((1 - predictions) ** 2).sum(axis=0)
+    scores["correct"] += (predictions > 0.5).sum(axis=0) + 0.5 * (predictions == 0.5).sum(axis=0)
+
+
+def sweep(history, configs, warmup=0):
+    """
+    Returns one result per config, best (lowest log-loss) first: the config's
+    parameters plus games, log_loss, brier, accuracy and current (whether
+    it is the engine's configuration).
+    """
+    _, scores = replay(history, configs, warmup)
+    games = scores["games"]
+    current = current_config()
+    results = []
+    for i, config in enumerate(configs):
+        results.append(
+            {
+                **config,
+                "games": games,
+                "log_loss": float(scores["log_loss"][i] / games) if games else None,
+                "brier": float(scores["brier"][i] / games) if games else None,
+                "accuracy": float(scores["correct"][i] / games) if games else None,
+                "current": config == current,
+            }
+        )
+    results.sort(key=lambda r: (r["log_loss"] is None, r["log_loss"] or 0))
+    return results
+
+
+def run(db_path, values, season=None, warmup=0):
+    """
+    Sweeps the grid built from values over db_path's games. Returns
+    (configs swept, games scored, results).
+    """
+    configs = grid(values)
+    conn = database.open_readonly(db_path)
+    try:
+        history = load_history(conn.cursor(), season)
+    finally:
+        conn.close()
+    results = sweep(history, configs, warmup)
+    return len(configs), len(history), results
+
+
+def _option(args, name, default=None, cast=str):
+    if name in args:
+        i = args.index(name)
+        value = args[i + 1]
+        del args[i : i + 2]
+        return cast(value)
+    return default
+
+
+def _format(result):
+    flag = "*" if result["current"] else " "
+    return (
+        f"{flag} {result['default_elo']:>8} {result['k_new']:>6} {result['k_established']:>6} "
+        f"{result['k_threshold']:>6} {result['scale']:>6} {result['log_loss']:>9.5f} "
+        f"{result['brier']:>8.5f} {result['accuracy']:>8.4f}"
+    )
+
+
+def main(argv):
+    args = list(argv)
+    as_json = "--json" in args
+    if as_json:
+        args.remove("--json")
+    try:
+        values = {}
+        for name in PARAMETERS:
+            spec = _option(args, "--" + name.replace("_", "-"))
+            if spec is not None:
+                values[name] = parse_values(spec)
+        season = _option(args, "--season", None, int)
+        warmup = _option(args, "--warmup", 0, int)
+        top = _option(args, "--top", 20, int)
+        if len(args) != 1:
+            print(__doc__)
+            return 2
+        configs, games, results = run(args[0], values, season, warmup)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        database.close_all()
+
+    if as_json:
+        print(json.dumps({"configs": configs, "games": games, "results": results}, indent=2))
+        return 0
+    print(f"{configs} configurations, {games} games ({max(games - warmup, 0)} scored)")
+    if not results or results[0]["log_loss"] is None:
+        return 0
+    print(
+        f"  {'elo':>8} {'k_new':>6} {'k_est':>6} {'thresh':>6} {'scale':>6} "
+        f"{'log_loss':>9} {'brier':>8} {'accuracy':>8}"
+    )
+    for result in results[:top]:
+        print(_format(result))
+    for rank, result in enumerate(results, 1):
+        if result["current"] and rank > top:
+            print(f"  ... current configuration ranks {rank}:")
+            print(_format(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
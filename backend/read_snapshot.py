@@ -0,0 +1,373 @@
+import array
+import bisect
+import os
+import sqlite3
+import threading
+import time
+
+import achievements
+import database
+import game_store
+import head_to_head
+import player_ids
+import player_stats
+
+# --- Read Snapshot ---
+# Each process serves its GET routes from one immutable Snapshot: players
+# with their badges, non-archived games (a game_store.GameStore, with
+# per-season and per-player row indexes), season ratings, player stats,
+# head-to-head records and tournaments, all read in a single transaction and
+# tagged with the data_version they were read at. Routes take the current
+# reference and never open a database connection.
+#
+# Nothing in a Snapshot is modified after it is built. A change produces a
+# whole new Snapshot, swapped in with one assignment; requests still holding
+# the old one finish with it. A poller thread reads data_version every
+# POLL_INTERVAL seconds, so writes from other processes (the admin app,
+# other gunicorn workers, scripts) show up within one interval plus a
+# rebuild. Writes made in this process call changed(), and the next get()
+# waits for the rebuild, so a client reads its own writes.
+
+POLL_INTERVAL = float(os.environ.get("SNAPSHOT_POLL_INTERVAL", "0.25"))
+LOCAL_WRITE_WAIT = 30  # Longest a read waits for a rebuild after a local write
+
+
+class Snapshot:
+    """
+    Everything the read routes return, as of one data_version. Game lists
+    are arrays of rows of the games store, in id order.
+    """
+
+    def __init__(self, cursor):
+        self.version = database.data_version(cursor.connection)
+        cursor.execute("SELECT id, username, ELO, description FROM players ORDER BY id")
+        self.players = [game_store.Player(*row) for row in cursor.fetchall()]
+        # Reloaded only when players_version moves, not for every game.
+        self.badges = achievements.cache.get(cursor.connection)
+
+        store = self.games = game_store.GameStore.load(cursor, include_archived=False)
+        self.season_rows = store.rows_by_season()
+        # Rows each name appears in as a player or as the winner, per season,
+        # keyed by (season, interned name id).
+        self.rows_by_name = {}
+        p1s, p2s, winners = store.p1, store.p2, store.winner
+        for season, rows in self.season_rows.items():
+            by_name = {}
+            for row in rows:
+                p1, p2 = p1s[row], p2s[row]
+                by_name.setdefault(p1, []).append(row)
+                if p2 != p1:
+                    by_name.setdefault(p2, []).append(row)
+                if winners[row] == game_store.WINNER_OTHER:
+                    other = store.intern(store.winner_name(row))
+                    if other not in (p1, p2):
+                        by_name.setdefault(other, []).append(row)
+            for name_id, name_rows in by_name.items():
+                self.rows_by_name[(season, name_id)] = array.array("i", name_rows)
+
+        self.season_ratings = {}
+        cursor.execute("SELECT season, username, elo FROM season_ratings")
+        for season, username, elo in cursor.fetchall():
+            self.season_ratings.setdefault(season, {})[username] = elo
+
+        self.stats = {}
+        cursor.execute("SELECT season, username, wins, losses FROM player_stats")
+        for season, username, wins, losses in cursor.fetchall():
+            self.stats.setdefault(season, {})[username] = (wins, losses)
+
+        self.head_to_head = {}
+        self.head_to_head_by_player = {}
+        cursor.execute(
+            """SELECT season, player, opponent, wins, losses, last_played, last_game_id
+            FROM head_to_head ORDER BY season, player, opponent"""
+        )
+        for season, *row in cursor.fetchall():
+            record = head_to_head.row_to_dict(row)
+            self.head_to_head.setdefault(season, []).append(record)
+            self.head_to_head_by_player.setdefault((season, row[0]), []).append(record)
+
+        names = player_ids.names_by_id(cursor)
+        cursor.execute(
+            f"""SELECT id, name, active, {player_ids.player_ref("winner")}, finished
+            FROM tournaments ORDER BY id"""
+        )
+        self.tournaments = {
+            tournament_id: (name, active, names.get(winner_id), finished)
+            for tournament_id, name, active, winner_id, finished in cursor.fetchall()
+        }
+        self.tournament_rounds = {}
+        cursor.execute(
+            f"""SELECT tournament_id, round, {player_ids.player_ref("player_one")},
+                {player_ids.player_ref("player_two")}, {player_ids.player_ref("winner")}, finished
+            FROM tournament_games ORDER BY tournament_id, round, id"""
+        )
+        for tournament_id, round_num, player_one, player_two, winner, finished in cursor.fetchall():
+            rounds = self.tournament_rounds.setdefault(tournament_id, {})
+            rounds.setdefault(round_num, []).append(
+                [names.get(player_one), names.get(player_two), names.get(winner), bool(finished)]
+            )
+
+    # --- get_data ---
+    def data(self, season=None, default_elo=None):
+        """
+        The get_data() payload. With a season, its games and each player's
+        rating for it (default_elo if they have not played); without one,
+        every season's games and the all-seasons rating.
+        """
+        return {
+            "players": list(self.iter_players(season, default_elo)),
+            "games": list(self.iter_games(season)),
+        }
+
+    def iter_games(self, season=None, rows=None):
+        """
+        Yields the games of season (every season if None), or of the given
+        rows, as get_data() dicts.
+        """
+        store = self.games
+        if rows is None:
+            rows = range(len(store)) if season is None else self.season_rows.get(season, ())
+        # Read straight from the columns rather than through store.game():
+        # this runs for every game get_data() serializes.
+        names, ids, p1s, p2s = store.names, store.ids, store.p1, store.p2
+        winners, dates, seasons = store.winner, store.date, store.season
+        for row in rows:
+            p1_name, p2_name = names[p1s[row]], names[p2s[row]]
+            flag = winners[row]
+            if flag == game_store.WINNER_P1:
+                winner_name = p1_name
+            elif flag == game_store.WINNER_P2:
+                winner_name = p2_name
+            else:
+                winner_name = store.winner_name(row)
+            date_played = dates[row]
+            if date_played == game_store.NO_VALUE:
+                date_played = store.date_played(row)
+            season_val = seasons[row]
+            if season_val == game_store.NO_VALUE:
+                season_val = store.season_of(row)
+            yield {
+                "id": ids[row],
+                "players": [p1_name, p2_name],
+                "winner": winner_name,
+                "date": date_played,
+                "season": season_val,
+            }
+
+    def iter_players(self, season=None, default_elo=None):
+        ratings = self.season_ratings.get(season, {}) if season is not None else None
+        for player in self.players:
+            username = player.username
+            yield {
+                "username": username,
+                "elo": player.elo if ratings is None else ratings.get(username, default_elo),
+                "description": player.description,
+                "achievements": self.badges.get(username, []),
+            }
+
+    # --- Games pages ---
+    def games_page(self, season, player=None, winner=None, order="desc", cursor_id=None, limit=10):
+        """
+        Returns (games, next_cursor) like the keyset-paginated /api/games:
+        cursor_id is the last id of the previous page. A filter narrows the
+        scan to the games of that name, and the cursor is found by bisection.
+        """
+        store = self.games
+        name = winner or player
+        if name:
+            name_id = store.name_ids.get(name)
+            rows = self.rows_by_name.get((season, name_id), ())
+        else:
+            rows = self.season_rows.get(season, ())
+        player_id = store.name_ids.get(player) if player else None
+
+        game_id = store.ids.__getitem__
+        if order == "desc":
+            end = len(rows) if cursor_id is None else bisect.bisect_left(rows, cursor_id, key=game_id)
+            candidates = (rows[i] for i in range(end - 1, -1, -1))
+        else:
+            start = 0 if cursor_id is None else bisect.bisect_right(rows, cursor_id, key=game_id)
+            candidates = (rows[i] for i in range(start, len(rows)))
+
+        page = []
+        for row in candidates:
+            if player and player_id not in (store.p1[row], store.p2[row]):
+                continue
+            if winner and store.winner_name(row) != winner:
+                continue
+            # One extra game tells whether another page exists.
+            if len(page) == limit:
+                return list(self.iter_games(rows=page)), store.ids[page[-1]]
+            page.append(row)
+        return list(self.iter_games(rows=page)), None
+
+    # --- Leaderboard and head-to-head ---
+    def leaderboard(self, season, default_elo):
+        """
+        Every player with their season stats (player_stats.leaderboard_entry),
+        ranked by season rating with ties in players table order.
+        """
+        ratings = self.season_ratings.get(season, {})
+        stats = self.stats.get(season, {})
+        ranked = sorted(
+            self.players, key=lambda p: (-ratings.get(p.username, default_elo), p.id)
+        )
+        return [
+            player_stats.leaderboard_entry(
+                player.username,
+                ratings.get(player.username, default_elo),
+                player.description,
+                self.badges.get(player.username, []),
+                *stats.get(player.username, (0, 0)),
+                rank,
+            )
+            for rank, player in enumerate(ranked, 1)
+        ]
+
+    def head_to_head_player(self, username, season):
+        return self.head_to_head_by_player.get((season, username), [])
+
+    def head_to_head_matrix(self, season):
+        return self.head_to_head.get(season, [])
+
+    # --- Tournaments ---
+    def tournament_list(self):
+        return [
+            {"id": tournament_id, "name": name, "active": bool(active), "winner": winner}
+            for tournament_id, (name, active, winner, _) in self.tournaments.items()
+        ]
+
+    def tournament(self, tournament_id):
+        """
+        Returns (name, active, winner, finished, rounds) or None. rounds
+        lists each round's [player_one, player_two, winner, finished] games.
+        """
+        row = self.tournaments.get(tournament_id)
+        if row is None:
+            return None
+        rounds = self.tournament_rounds.get(tournament_id, {})
+        return (*row, [rounds[r] for r in sorted(rounds)])
+
+
+def build(db_path):
+    """
+    Reads a new Snapshot through one dedicated connection, inside one read
+    transaction so every part matches its data_version.
+    """
+    conn = database.open_readonly(db_path)
+    try:
+        conn.execute("BEGIN")
+        return Snapshot(conn.cursor())
+    finally:
+        conn.close()
+
+
+class SnapshotHolder:
+    """
+    The current Snapshot of db_path for this process, kept up to date by a
+    poller thread.
+    """
+
+    def __init__(self, db_path, poll_interval=POLL_INTERVAL):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self._snapshot = None
+        self._cond = threading.Condition()
+        self._build_lock = threading.Lock()
+        self._poller = None
+        self._changes = 0  # Local writes reported through changed()
+        self._seen = 0  # Local writes the current snapshot includes
+        self.reads = 0
+        self.builds = 0
+        self.build_errors = 0
+        self.last_build_seconds = 0.0
+
+    def load(self):
+        """
+        Builds and installs a snapshot now; used at startup, before any
+        worker is forked.
+        """
+        with self._cond:
+            target = self._changes
+        self._rebuild(force=True)
+        with self._cond:
+            self._seen = max(self._seen, target)
+            self._cond.notify_all()
+        return self._snapshot
+
+    def get(self):
+        self._ensure_poller()
+        self.reads += 1
+        if self._seen != self._changes:
+            with self._cond:
+                target = self._changes
+                self._cond.wait_for(lambda: self._seen >= target, LOCAL_WRITE_WAIT)
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.load()
+        return snapshot
+
+    def changed(self):
+        """
+        Reports a committed write from this process. Returns at once; the
+        next get() waits for a snapshot that includes it.
+        """
+        with self._cond:
+            self._changes += 1
+            self._ensure_poller()
+            self._cond.notify_all()
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "name": "read_snapshot",
+            "hits": self.reads,
+            "misses": self.builds,
+            "build_errors": self.build_errors,
+            "version": snapshot.version if snapshot else None,
+            "games": len(snapshot.games) if snapshot else 0,
+            "game_column_bytes": snapshot.games.nbytes() if snapshot else 0,
+            "last_build_seconds": self.last_build_seconds,
+        }
+
+    # --- Poller thread ---
+    def _ensure_poller(self):
+        # Started lazily, so a gunicorn worker forked after import gets its own.
+        if self._poller is None or not self._poller.is_alive():
+            with self._cond:
+                if self._poller is None or not self._poller.is_alive():
+                    self._poller = threading.Thread(
+                        target=self._poll, name="read-snapshot", daemon=True
+                    )
+                    self._poller.start()
+
+    def _poll(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._seen != self._changes, self.poll_interval)
+                target = self._changes
+            self._rebuild(force=False)
+            with self._cond:
+                self._seen = max(self._seen, target)
+                self._cond.notify_all()
+
+    def _rebuild(self, force):
+        with self._build_lock:
+            try:
+                if not force and self._snapshot is not None:
+                    conn = database.connect_readonly(self.db_path)
+                    try:
+                        if database.data_version(conn) == self._snapshot.version:
+                            return
+                    finally:
+                        database.release(conn)
+                start = time.perf_counter()
+                snapshot = build(self.db_path)
+                self.last_build_seconds = time.perf_counter() - start
+                self.builds += 1
+                if self._snapshot is None or snapshot.version >= self._snapshot.version:
+                    self._snapshot = snapshot
+            except sqlite3.Error as e:
+                # Keep serving the previous snapshot; the next poll retries.
+                self.build_errors += 1
+                print(f"Read snapshot rebuild failed: {e}")
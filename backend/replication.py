@@ -0,0 +1,354 @@
+"""
+Change-log replication for game_database.db.
+
+Every admin write appends to change_log in the same transaction, so the log
+holds the league's row-level history with gapless, increasing sequence
+numbers. A replica applies the entries after its own position instead of
+receiving the whole database file. Ratings and the other derived tables
+are recomputed on the replica after applying. Snapshots are compacted
+copies of the primary at a known sequence number. They bootstrap new
+replicas, or replicas that fell behind a pruned log.
+
+A database's position is the highest sequence number it has seen (kept by
+AUTOINCREMENT in sqlite_sequence, so it survives pruning). Replicas store
+the entries they apply in their own change_log, so positions line up.
+
+Usage (from backend/):
+    python replication.py position DB
+    python replication.py export PRIMARY [--since SEQ] > changes.ndjson
+    python replication.py apply REPLICA [changes.ndjson | -] [--season N]
+    python replication.py snapshot PRIMARY SNAPSHOT_DIR [--keep N] [--prune]
+"""
+
+import glob
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import achievements
+import database
+import elo_engine
+import migrations
+import player_ids
+
+GAME_COLUMNS = ("id", "date_played", "p1_id", "p2_id", "doubles", "winner_id", "archived", "season")
+# Game entries logged before games moved to player ids name the players.
+LEGACY_NAME_COLUMNS = {"p1": "p1_id", "p2": "p2_id", "winner": "winner_id"}
+PLAYER_COLUMNS = ("id", "username", "description", "ELO", "achievements")
+
+SNAPSHOT_EVERY = 500  # Log entries between automatic snapshots
+SNAPSHOT_KEEP = 3  # Snapshot files kept in the snapshot directory
+
+
+class ReplicationError(Exception):
+    pass
+
+
+# --- Writing the log (primary) ---
+def log_change(cursor, kind, payload):
+    cursor.execute(
+        "INSERT INTO change_log (kind, payload, created_at) VALUES (?, ?, ?)",
+        (kind, json.dumps(payload, separators=(",", ":")), int(time.time())),
+    )
+
+
+def _row(cursor, table, columns, row_id):
+    row = cursor.execute(
+        f"SELECT {', '.join(columns)} FROM {table} WHERE id = ?", (row_id,)
+    ).fetchone()
+    return dict(zip(columns, row)) if row else None
+
+
+def log_game(cursor, game_id, kind="game_inserted"):
+    """
+    Logs the current row of a game after it was inserted or edited.
+    """
+    log_change(cursor, kind, _row(cursor, "games", GAME_COLUMNS, game_id))
+
+
+def log_games(cursor, rows):
+    """
+    Logs a batch of inserted games, given as dicts keyed by GAME_COLUMNS.
+    """
+    created_at = int(time.time())
+    cursor.executemany(
+        "INSERT INTO change_log (kind, payload, created_at) VALUES (?, ?, ?)",
+        [
+            ("game_inserted", json.dumps(row, separators=(",", ":")), created_at)
+            for row in rows
+        ],
+    )
+
+
+def log_game_deleted(cursor, game_id):
+    log_change(cursor, "game_deleted", {"id": game_id})
+
+
+def log_player(cursor, player_id):
+    log_change(
+        cursor, "player_added", _row(cursor, "players", PLAYER_COLUMNS, player_id)
+    )
+
+
+# --- Reading the log ---
+def position(conn):
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'change_log'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def iter_changes(conn, since=0):
+    """
+    Yields (seq, kind, payload, created_at) for entries after since.
+    Raises ReplicationError if entries after since were already pruned.
+    """
+    oldest = conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+    if since < position(conn) and (oldest is None or oldest > since + 1):
+        raise ReplicationError(
+            f"Entries after {since} were pruned; restore a snapshot first."
+        )
+    cursor = conn.execute(
+        "SELECT seq, kind, payload, created_at FROM change_log WHERE seq > ? ORDER BY seq",
+        (since,),
+    )
+    for seq, kind, payload, created_at in cursor:
+        yield seq, kind, json.loads(payload), created_at
+
+
+def export(db_path, since=0, out=sys.stdout):
+    conn = database.open_readonly(db_path)
+    try:
+        for seq, kind, payload, created_at in iter_changes(conn, since):
+            out.write(
+                json.dumps(
+                    {"seq": seq, "kind": kind, "payload": payload, "created_at": created_at},
+                    separators=(",", ":"),
+                )
+                + "\n"
+            )
+    finally:
+        conn.close()
+
+
+# --- Applying the log (replica) ---
+def _upsert(cursor, table, columns, values):
+    cursor.execute(
+        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [values[c] for c in columns],
+    )
+
+
+def _game_with_ids(cursor, payload):
+    if "p1_id" in payload:
+        return payload
+    ids = player_ids.require_ids(cursor, [payload[name] for name in LEGACY_NAME_COLUMNS])
+    game = dict(payload)
+    for name_column, id_column in LEGACY_NAME_COLUMNS.items():
+        game[id_column] = ids[game.pop(name_column)]
+    return game
+
+
+def _apply_one(cursor, kind, payload):
+    if kind in ("game_inserted", "game_updated"):
+        _upsert(cursor, "games", GAME_COLUMNS, _game_with_ids(cursor, payload))
+    elif kind == "game_deleted":
+        cursor.execute("DELETE FROM games WHERE id = ?", (payload["id"],))
+    elif kind == "player_added":
+        _upsert(cursor, "players", PLAYER_COLUMNS, payload)
+        try:
+            badges = achievements.parse(payload["achievements"])
+        except ValueError:
+            badges = []
+        achievements.set_player(cursor, payload["username"], badges)
+    else:
+        raise ReplicationError(f"Unknown change kind {kind!r}")
+
+
+def apply(replica_path, entries, season=None, default_elo=elo_engine.DEFAULT_ELO):
+    """
+    Applies entries (dicts with seq, kind, payload, created_at) after the
+    replica's position in one transaction, then recomputes ratings and the
+    derived tables. Entries the replica already has are skipped, so
+    applying the same export twice is harmless. Returns (position, applied).
+    """
+    conn = database.connect(replica_path)
+    applied = 0
+    players_changed = False
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        current = position(conn)
+        cursor = conn.cursor()
+        for entry in entries:
+            seq = entry["seq"]
+            if seq <= current:
+                continue
+            if seq != current + 1:
+                raise ReplicationError(
+                    f"Replica is at {current} but the next entry is {seq}; "
+                    "export from the replica's position or restore a snapshot."
+                )
+            _apply_one(cursor, entry["kind"], entry["payload"])
+            cursor.execute(
+                "INSERT INTO change_log (seq, kind, payload, created_at) VALUES (?, ?, ?, ?)",
+                (
+                    seq,
+                    entry["kind"],
+                    json.dumps(entry["payload"], separators=(",", ":")),
+                    entry["created_at"],
+                ),
+            )
+            players_changed = players_changed or entry["kind"] == "player_added"
+            current = seq
+            applied += 1
+        if players_changed:
+            database.bump_players_version(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        database.release(conn)
+
+    if applied:
+        # Inserted and deleted games shift every later rating, so replay.
+        elo_engine.recalculate_all_elos(replica_path, season, default_elo)
+    return current, applied
+
+
+def read_entries(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+# --- Snapshots ---
+def snapshot_path(snapshot_dir, seq):
+    return os.path.join(snapshot_dir, f"snapshot_{seq:010d}.db")
+
+
+def list_snapshots(snapshot_dir):
+    """
+    Returns [(seq, path)] oldest first.
+    """
+    found = []
+    for path in glob.glob(os.path.join(snapshot_dir, "snapshot_*.db")):
+        name = os.path.basename(path)
+        found.append((int(name[len("snapshot_"):-len(".db")]), path))
+    return sorted(found)
+
+
+def snapshot(db_path, snapshot_dir, keep=SNAPSHOT_KEEP, prune=False):
+    """
+    Writes a compacted copy of db_path (VACUUM INTO) named after its
+    position, keeps the newest keep snapshots and, with prune, drops log
+    entries the oldest kept snapshot already contains. Returns the path.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tmp_path = os.path.join(snapshot_dir, "snapshot.tmp")
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = database.connect(db_path)
+    try:
+        conn.execute("VACUUM INTO ?", (tmp_path,))
+    finally:
+        database.release(conn)
+
+    # The position is read from the copy itself, so it matches its contents.
+    copy = sqlite3.connect(tmp_path)
+    try:
+        seq = position(copy)
+    finally:
+        copy.close()
+    path = snapshot_path(snapshot_dir, seq)
+    os.replace(tmp_path, path)
+
+    snapshots = list_snapshots(snapshot_dir)
+    for _, old_path in snapshots[:-keep]:
+        os.remove(old_path)
+    if prune:
+        oldest_kept = list_snapshots(snapshot_dir)[0][0]
+        conn = database.connect(db_path)
+        try:
+            with conn:
+                conn.execute("DELETE FROM change_log WHERE seq <= ?", (oldest_kept,))
+        finally:
+            database.release(conn)
+    return path
+
+
+def maybe_snapshot(db_path, snapshot_dir, every=SNAPSHOT_EVERY, keep=SNAPSHOT_KEEP):
+    """
+    Takes a snapshot once every entries have been logged since the newest
+    one. Returns the new snapshot's path, or None.
+    """
+    snapshots = list_snapshots(snapshot_dir) if os.path.isdir(snapshot_dir) else []
+    last_seq = snapshots[-1][0] if snapshots else 0
+    conn = database.connect_readonly(db_path)
+    try:
+        current = position(conn)
+    finally:
+        database.release(conn)
+    if current - last_seq < every:
+        return None
+    return snapshot(db_path, snapshot_dir, keep=keep, prune=True)
+
+
+def _option(args, name, default=None, cast=str):
+    if name in args:
+        i = args.index(name)
+        value = args[i + 1]
+        del args[i : i + 2]
+        return cast(value)
+    return default
+
+
+def main(argv):
+    args = list(argv)
+    if not args:
+        print(__doc__)
+        return 2
+    command = args.pop(0)
+    try:
+        if command == "position":
+            conn = database.open_readonly(args[0])
+            try:
+                print(position(conn))
+            finally:
+                conn.close()
+        elif command == "export":
+            since = _option(args, "--since", 0, int)
+            export(args[0], since)
+        elif command == "apply":
+            season = _option(args, "--season", None, int)
+            replica = args[0]
+            migrations.migrate(replica)
+            source = args[1] if len(args) > 1 else "-"
+            if source == "-":
+                current, applied = apply(replica, read_entries(sys.stdin), season)
+            else:
+                with open(source) as f:
+                    current, applied = apply(replica, read_entries(f), season)
+            print(f"Applied {applied} changes; replica is at {current}.")
+        elif command == "snapshot":
+            keep = _option(args, "--keep", SNAPSHOT_KEEP, int)
+            prune = "--prune" in args
+            if prune:
+                args.remove("--prune")
+            print(snapshot(args[0], args[1], keep=keep, prune=prune))
+        else:
+            print(__doc__)
+            return 2
+    except ReplicationError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        database.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,166 @@
+import gzip
+import hashlib
+import re
+import threading
+import time
+
+from flask import current_app, request
+
+
+# --- Versioned Response Cache ---
+# Holds the serialized body of a read endpoint for the current data version
+# (see database.data_version). Data only changes a few times a day, so most
+# requests are served from here, and clients that already hold the current
+# version get a 304 via ETag/If-None-Match.
+#
+# Clients that send Accept-Encoding: gzip get the body gzip-compressed. The
+# compressed body is made the first time a client asks for it and kept with
+# the entry, so each payload is compressed once per data version rather
+# than once per request.
+
+GZIP_LEVEL = 6  # zlib's default: nearly all of level 9's savings, far less CPU
+GZIP_MIN_BYTES = 1024  # Smaller bodies are sent as is; gzip would barely shrink them
+
+_SAFE_KEY = re.compile(r"[\w.-]+")
+
+
+def _key_tag(key):
+    # ETags are quoted strings; keys with other characters (or tuples) are
+    # replaced by a short digest.
+    text = str(key)
+    if _SAFE_KEY.fullmatch(text):
+        return text
+    return hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+
+
+class VersionedResponseCache:
+    def __init__(self, name, max_entries=None):
+        self.name = name
+        self.max_entries = max_entries  # None: one entry per key, unbounded
+        self._entries = {}  # key -> [version, body, gzip body or None]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.compressions = 0
+        self.compress_seconds = 0.0
+        self.compressed_hits = 0  # gzip bodies served without compressing
+        self.bytes_sent = 0
+        self.bytes_uncompressed = 0  # What the same responses would have sent as is
+
+    def etag(self, key, version, encoding=None):
+        tag = f"{self.name}-{_key_tag(key)}-v{version}"
+        return f"{tag}-{encoding}" if encoding else tag
+
+    def get(self, key, version, build, encoding=None):
+        """
+        Returns (etag, body, encoding) for key at version, calling build()
+        to produce the serialized body (bytes) on a miss. Entries for older
+        versions are replaced, so the cache holds at most one body, and one
+        compressed body, per key. With encoding="gzip" the compressed body
+        is returned, unless the body is below GZIP_MIN_BYTES; the returned
+        encoding is the one actually used.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+
+        if entry is None:
+            entry = [version, build(), None]
+            self._store(key, entry)
+        body = entry[1]
+        if encoding != "gzip" or len(body) < GZIP_MIN_BYTES:
+            self._count_sent(len(body), len(body))
+            return self.etag(key, version), body, None
+
+        compressed = entry[2]
+        if compressed is None:
+            start = time.perf_counter()
+            # mtime=0 keeps the bytes identical for every worker.
+            compressed = gzip.compress(body, GZIP_LEVEL, mtime=0)
+            elapsed = time.perf_counter() - start
+            entry[2] = compressed
+            with self._lock:
+                self.compressions += 1
+                self.compress_seconds += elapsed
+        else:
+            with self._lock:
+                self.compressed_hits += 1
+        self._count_sent(len(compressed), len(body))
+        return self.etag(key, version, "gzip"), compressed, "gzip"
+
+    def _store(self, key, entry):
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current[0] > entry[0]:
+                return
+            # Re-inserted at the end, so eviction drops the longest-unbuilt key.
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            if self.max_entries is not None and len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def _count_sent(self, sent, uncompressed):
+        with self._lock:
+            self.bytes_sent += sent
+            self.bytes_uncompressed += uncompressed
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "compressions": self.compressions,
+                "compress_seconds": self.compress_seconds,
+                "compressed_hits": self.compressed_hits,
+                "bytes_sent": self.bytes_sent,
+                "bytes_uncompressed": self.bytes_uncompressed,
+            }
+
+
+def accepts_gzip():
+    # accept_encodings honours q-values, including gzip;q=0 and "*".
+    return request.accept_encodings["gzip"] > 0
+
+
+def cached_json_response(cache, key, version, build):
+    """
+    Serves build()'s JSON-serializable result through cache for the given
+    data version, gzip-compressed when the client accepts it, answering a
+    matching If-None-Match with 304. build() must return the data as of
+    version (e.g. from a read_snapshot.Snapshot).
+    """
+    for encoding in (None, "gzip"):
+        etag = cache.etag(key, version, encoding)
+        if request.if_none_match.contains(etag):
+            cache.record_not_modified()
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            response.vary.add("Accept-Encoding")
+            return response
+
+    etag, body, encoding = cache.get(
+        key,
+        version,
+        lambda: current_app.json.dumps(build()).encode(),
+        "gzip" if accepts_gzip() else None,
+    )
+    response = current_app.response_class(body, mimetype="application/json")
+    if encoding:
+        response.content_encoding = encoding
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,103 @@
+"""
+Measures what the game store saves on synthetic leagues of growing size:
+Python memory per game of the games loaded as SQLite row tuples versus a
+game_store.GameStore, and the time of a full replay from each.
+
+Memory is what tracemalloc sees allocated by the load and still held
+afterwards, divided by the number of games; times are taken without
+tracemalloc. Leagues come from synthetic_league.generate() in a temporary
+directory.
+
+Usage (from backend/):
+    python scripts/bench_game_store.py [games ...]
+"""
+
+import gc
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import elo_engine  # noqa: E402
+import game_store  # noqa: E402
+import player_ids  # noqa: E402
+import synthetic_league  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+# The games as name rows, the form they had before the store.
+ROWS_QUERY = (
+    "SELECT id, p1, p2, winner, date_played, archived, season FROM ("
+    + player_ids.GAMES_WITH_NAMES
+    + ") ORDER BY id"
+)
+
+
+def held_bytes(load):
+    """
+    Returns (result, bytes still allocated after load() returned, seconds).
+    The load is timed again without tracemalloc, which slows allocations.
+    """
+    elapsed = timed(load)
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held, elapsed
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(
+        f"{'games':>9} {'form':>6} {'B/game':>8} {'load s':>8} {'replay s':>9}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for games in sizes:
+            path = os.path.join(tmp, f"league_{games}.db")
+            synthetic_league.generate(path, players=200, games=games, seed=0)
+            conn = sqlite3.connect(path)
+            cursor = conn.cursor()
+            usernames = elo_engine.load_usernames(cursor)
+
+            rows, rows_bytes, rows_load = held_bytes(
+                lambda: cursor.execute(ROWS_QUERY).fetchall()
+            )
+            replay_rows = [(r[0], r[1], r[2], r[3]) for r in rows]
+            rows_replay = timed(lambda: elo_engine.replay(replay_rows, usernames))
+            del rows, replay_rows
+
+            store, store_bytes, store_load = held_bytes(
+                lambda: game_store.GameStore.load(cursor)
+            )
+            store_replay = timed(lambda: elo_engine.replay(store, usernames))
+            conn.close()
+
+            for form, held, load, replay in (
+                ("rows", rows_bytes, rows_load, rows_replay),
+                ("store", store_bytes, store_load, store_replay),
+            ):
+                print(
+                    f"{games:>9} {form:>6} {held / games:>8.1f} {load:>8.3f} {replay:>9.3f}"
+                )
+            print(
+                f"{games:>9} {'':>6} columns {store.nbytes() / games:.1f} B/game, "
+                f"{len(store.names)} interned names, "
+                f"{rows_bytes / store_bytes:.1f}x less memory"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Measures what the precompressed gzip bodies of the response cache save on
+synthetic leagues of growing size, for /api/get_data and the other cached
+read routes of main.py: bytes on the wire with and without
+Accept-Encoding: gzip, the one-off cost of compressing a body for a data
+version, and the CPU per request of serving the cached gzip body against
+compressing the body on every request (as a compressing proxy or
+middleware would).
+
+Request times are the minimum over REPEAT rounds of REQUESTS requests
+through the Flask test client, so a noisy machine does not decide the
+comparison. "saved/version" is the compression CPU that REQUESTS
+requests for one data version no longer spend.
+
+Usage (from backend/):
+    python scripts/bench_gzip.py [games ...]
+"""
+
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import response_cache  # noqa: E402
+import synthetic_league  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+ROUTES = ["/api/get_data", "/api/leaderboard", "/api/head_to_head", "/api/games?limit=100"]
+REQUESTS = 200
+REPEAT = 5
+GZIP = {"Accept-Encoding": "gzip, deflate, br"}
+
+
+def per_request(fn):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            fn()
+        elapsed = (time.perf_counter() - start) / REQUESTS
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # main.py replays ratings for ./game_database.db on import.
+        os.chdir(tmp)
+        synthetic_league.generate("game_database.db", players=20, games=10)
+        import database
+        import main as app_module
+
+        client = app_module.app.test_client()
+        print(
+            f"{'games':>8} {'route':<22} {'identity B':>11} {'gzip B':>9} {'ratio':>6} "
+            f"{'compress ms':>11} {'cached us':>10} {'per-req us':>10} {'saved/version ms':>16}"
+        )
+        for games in sizes:
+            path = os.path.join(tmp, f"league_{games}.db")
+            synthetic_league.generate(path, games=games)
+            app_module.db = app_module.snapshots.db_path = path
+            app_module.snapshots.load()
+            # Fresh caches: each league starts again at data version 1.
+            app_module.get_data_cache = response_cache.VersionedResponseCache("get_data")
+            app_module.api_cache = response_cache.VersionedResponseCache("api")
+
+            for route in ROUTES:
+                identity = client.get(route)
+                compressed = client.get(route, headers=GZIP)
+                assert gzip.decompress(compressed.data) == identity.data, route
+                body = identity.data
+                # One compression, as the cache does once per data version.
+                start = time.perf_counter()
+                gzip.compress(body, response_cache.GZIP_LEVEL, mtime=0)
+                compress = time.perf_counter() - start
+
+                cached = per_request(lambda: client.get(route, headers=GZIP))
+
+                def compress_per_request():
+                    response = client.get(route)
+                    gzip.compress(response.data, response_cache.GZIP_LEVEL, mtime=0)
+
+                uncached = per_request(compress_per_request)
+                saved = REQUESTS * (uncached - cached) - compress
+                print(
+                    f"{games:>8} {route:<22} {len(body):>11} {len(compressed.data):>9} "
+                    f"{len(body) / len(compressed.data):>6.1f} {compress * 1000:>11.2f} "
+                    f"{cached * 1e6:>10.1f} {uncached * 1e6:>10.1f} {saved * 1000:>16.1f}"
+                )
+
+            compressions = sum(
+                cache.stats()["compressions"]
+                for cache in (app_module.get_data_cache, app_module.api_cache)
+            )
+            print(f"{games:>8} {compressions} compressions for {len(ROUTES)} routes")
+        database.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares peak Python memory and time of building the /api/get_data body in
+one piece (get_data() + json.dumps) against the streamed mode
+(stream_get_data()), on synthetic leagues of growing size.
+
+Leagues come from synthetic_league.generate() in a temporary directory,
+so the real data is never touched.
+
+Usage (from backend/):
+    python scripts/bench_streaming.py [games ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import synthetic_league  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # main.py replays ratings for ./game_database.db on import.
+        os.chdir(tmp)
+        synthetic_league.generate("game_database.db", players=20, games=10)
+        import database
+        import main as app_module
+
+        print(f"{'games':>8} {'mode':>8} {'bytes':>12} {'seconds':>8} {'peak MiB':>9}")
+        for games in sizes:
+            path = os.path.join(tmp, f"league_{games}.db")
+            synthetic_league.generate(path, games=games)
+            app_module.db = app_module.snapshots.db_path = path
+            app_module.snapshots.load()
+            dumps = app_module.app.json.dumps
+
+            def buffered():
+                return len(dumps(app_module.get_data()))
+
+            def streamed():
+                return sum(len(chunk) for chunk in app_module.stream_get_data(dumps))
+
+            for mode, fn in (("buffered", buffered), ("streamed", streamed)):
+                size, elapsed, peak = measure(fn)
+                print(
+                    f"{games:>8} {mode:>8} {size:>12} {elapsed:>8.3f} {peak / 2**20:>9.2f}"
+                )
+        database.close_all()
+
+
+if __name__ == "__main__":
+    main()
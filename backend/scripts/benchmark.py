@@ -0,0 +1,204 @@
+"""
+Times the backend hot paths on synthetic leagues of growing size and
+records the results as JSON, so two commits can be compared.
+
+Benchmarks, per league size:
+    recalculate_all_elos  full replay of every season (elo_engine)
+    ensure_ratings        startup check when nothing changed
+    snapshot_build        main's read snapshot rebuilt from the database
+    get_data              main.get_data() serialized with app.json
+    get_data_stream       main.stream_get_data() consumed fully
+    add_multiple_games    POST of BATCH games to the admin app
+
+Leagues come from synthetic_league.generate() and are cached in the work
+directory; each size runs on a fresh copy, as add_multiple_games writes.
+
+Usage (from backend/):
+    python scripts/benchmark.py [--sizes 1000,10000,100000,1000000]
+        [--repeat N] [--players N] [--seed N] [--work-dir DIR]
+        [--out results.json] [--compare baseline.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPTS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, SCRIPTS_DIR)
+
+import synthetic_league  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+BATCH = 100
+SEASON = 2
+
+
+def league_path(work_dir, games, players, seed):
+    path = os.path.join(work_dir, f"league_g{games}_p{players}_s{seed}.db")
+    if not os.path.exists(path):
+        print(f"Generating {games} games...", file=sys.stderr)
+        synthetic_league.generate(path, players=players, games=games, seed=seed)
+        import database
+
+        database.checkpoint(path)
+        database.close_all()
+    return path
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "max": max(samples),
+        "samples": samples,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, players, seed, work_dir):
+    # The apps open ./game_database.db when imported; give them a small
+    # league there, then point their db at each benchmark copy.
+    app_dir = os.path.join(work_dir, "app")
+    os.makedirs(app_dir, exist_ok=True)
+    shutil.copy(
+        league_path(work_dir, 100, 20, seed), os.path.join(app_dir, "game_database.db")
+    )
+    os.environ["DEPLOY_SCRIPT"] = "/bin/true"
+    os.environ["DEPLOY_QUIET_PERIOD"] = os.environ["DEPLOY_MAX_DELAY"] = "1e9"
+    os.chdir(app_dir)
+    import admin_api
+    import database
+    import elo_engine
+    import main as main_api
+
+    admin_client = admin_api.app.test_client()
+    dumps = main_api.app.json.dumps
+    results = []
+    for games in sizes:
+        # A new name per size: the admin writer thread keeps its connection.
+        path = os.path.join(app_dir, f"bench_{games}.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        database.close_all()
+        shutil.copy(league_path(work_dir, games, players, seed), path)
+        main_api.db = admin_api.db = admin_api.writes.db_path = path
+        main_api.snapshots.db_path = admin_api.snapshots.db_path = path
+        main_api.snapshots.load()
+        names = [f"player{i:05d}" for i in range(min(players, 10))]
+        batch = {
+            "games": [
+                {
+                    "p1": names[i % len(names)],
+                    "p2": names[(i + 1) % len(names)],
+                    "winner": names[i % len(names)],
+                    "season": SEASON,
+                }
+                for i in range(BATCH)
+            ]
+        }
+
+        def add_multiple_games():
+            response = admin_client.post("/api/add_multiple_games", json=batch)
+            assert response.status_code == 201, response.json
+
+        benchmarks = [
+            ("recalculate_all_elos", lambda: elo_engine.recalculate_all_elos(path)),
+            ("ensure_ratings", lambda: elo_engine.ensure_ratings(path)),
+            ("snapshot_build", main_api.snapshots.load),
+            ("get_data", lambda: dumps(main_api.get_data())),
+            ("get_data_stream", lambda: sum(map(len, main_api.stream_get_data(dumps)))),
+            ("add_multiple_games", add_multiple_games),
+        ]
+        for name, fn in benchmarks:
+            timing = timed(fn, repeat)
+            results.append({"benchmark": name, "games": games, **timing})
+            print(
+                f"{name:>22} {games:>9} games  median {timing['median'] * 1000:10.2f} ms",
+                file=sys.stderr,
+            )
+    database.close_all()
+    return results
+
+
+def compare(baseline, results):
+    base = {(r["benchmark"], r["games"]): r["median"] for r in baseline["results"]}
+    print(f"{'benchmark':>22} {'games':>9} {'base ms':>10} {'this ms':>10} {'ratio':>7}")
+    for r in results:
+        before = base.get((r["benchmark"], r["games"]))
+        if before is None:
+            continue
+        print(
+            f"{r['benchmark']:>22} {r['games']:>9} {before * 1000:>10.2f} "
+            f"{r['median'] * 1000:>10.2f} {r['median'] / before:>7.2f}"
+        )
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the backend hot paths.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="Keeps generated leagues between runs.")
+    parser.add_argument("--out", help="Write results JSON here.")
+    parser.add_argument("--compare", help="Results JSON of a baseline run.")
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    out = os.path.abspath(args.out) if args.out else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = os.path.abspath(args.work_dir) if args.work_dir else tmp
+        # The apps log to stdout; keep stdout for the comparison table.
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run(sizes, args.repeat, args.players, args.seed, work_dir)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "players": args.players,
+        "seed": args.seed,
+        "results": results,
+    }
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {out}", file=sys.stderr)
+    if baseline_path:
+        with open(baseline_path) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
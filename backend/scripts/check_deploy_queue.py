@@ -0,0 +1,122 @@
+"""
+Exercises the admin app's background deploy queue against deploy_stub.sh on
+a copy of the database: a burst of game writes must return without waiting
+for the deploy, coalesce into a single run after the quiet period, and
+writes that land during a run must produce exactly one follow-up run.
+
+Usage (from backend/):
+    python scripts/check_deploy_queue.py [path/to/game_database.db]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPTS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_DB = os.path.join(BACKEND_DIR, "game_database.db")
+QUIET_PERIOD = 0.5
+STUB_SLEEP = 1.0
+BURST = 5
+SEASON = 2
+
+
+def read_log(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [line.split()[0] for line in f]
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB
+    failures = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(db_path, os.path.join(tmp, "game_database.db"))
+        log_path = os.path.join(tmp, "deploy.log")
+        os.environ["DEPLOY_SCRIPT"] = os.path.join(SCRIPTS_DIR, "deploy_stub.sh")
+        os.environ["DEPLOY_QUIET_PERIOD"] = str(QUIET_PERIOD)
+        os.environ["DEPLOY_STUB_SLEEP"] = str(STUB_SLEEP)
+        os.environ["DEPLOY_STUB_LOG"] = log_path
+        os.chdir(tmp)
+
+        import admin_api
+        import database
+
+        client = admin_api.app.test_client()
+        players = [
+            row[0]
+            for row in database.connect(admin_api.db).execute(
+                "SELECT username FROM players ORDER BY id LIMIT 2"
+            )
+        ]
+
+        def add_game():
+            response = client.post(
+                "/api/add_game",
+                json={
+                    "p1": players[0],
+                    "p2": players[1],
+                    "winner": players[0],
+                    "season": SEASON,
+                },
+            )
+            if response.status_code != 201:
+                failures.append(f"add_game returned {response.status_code}")
+
+        # 1. A burst returns quickly and coalesces into one run.
+        start = time.perf_counter()
+        for _ in range(BURST):
+            add_game()
+        elapsed = time.perf_counter() - start
+        print(f"{BURST} writes took {elapsed:.3f}s")
+        if elapsed >= STUB_SLEEP:
+            failures.append("writes waited for the deploy script")
+        status = client.get("/admin/deploy_status").json
+        if status["state"] != "pending" or status["pending_requests"] != BURST:
+            failures.append(f"expected {BURST} pending requests, got {status}")
+
+        admin_api.deploys.flush(timeout=30)
+        status = client.get("/admin/deploy_status").json
+        if status["runs"] != 1 or status["last_run"]["requests_coalesced"] != BURST:
+            failures.append(f"burst did not coalesce into one run: {status}")
+
+        # 2. Writes during a run are deployed by exactly one follow-up run.
+        add_game()
+        deadline = time.time() + 10
+        while client.get("/admin/deploy_status").json["state"] != "running":
+            if time.time() > deadline:
+                failures.append("second deploy never started")
+                break
+            time.sleep(0.05)
+        for _ in range(BURST):
+            add_game()
+        admin_api.deploys.flush(timeout=30)
+        status = client.get("/admin/deploy_status").json
+        if status["runs"] != 3:
+            failures.append(f"expected 3 runs in total, got {status['runs']}")
+        if status["failures"]:
+            failures.append(f"deploy failures: {status['last_run']}")
+
+        log = read_log(log_path)
+        print(f"Deploy log: {log}")
+        if "overlap" in log or log != ["start", "end"] * 3:
+            failures.append("deploys overlapped or did not run to completion")
+        if status["last_run"]:
+            print(f"Last run: {status['last_run']['duration']:.2f}s")
+        database.close_all()
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK (deploy queue)")
+
+
+if __name__ == "__main__":
+    main()
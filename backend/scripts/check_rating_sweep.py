@@ -0,0 +1,182 @@
+"""
+Checks rating_sweep against the per-game engine: for a few configurations,
+the vectorized replay must end with exactly the ratings elo_engine.replay()
+produces with the same constants, and its log-loss and Brier score must
+match a plain Python scoring of the same predictions. Runs on the given
+database (all seasons and each season) and on a synthetic league. Also
+checks that parse_values() accepts ranges and lists, and that it rejects
+oversized ranges before expanding them, as well as infinite and NaN values.
+
+Usage (from backend/):
+    python scripts/check_rating_sweep.py [path/to/game_database.db]
+"""
+
+import math
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPTS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, SCRIPTS_DIR)
+
+import elo_engine  # noqa: E402
+import migrations  # noqa: E402
+import player_ids  # noqa: E402
+import rating_sweep  # noqa: E402
+import synthetic_league  # noqa: E402
+
+DEFAULT_DB = os.path.join(BACKEND_DIR, "game_database.db")
+CONFIGS = [
+    rating_sweep.current_config(),
+    {"default_elo": 1000, "k_new": 40, "k_established": 20, "k_threshold": 10, "scale": 400},
+    {"default_elo": 480, "k_new": 24, "k_established": 24, "k_threshold": 0, "scale": 400},
+    {"default_elo": 1500, "k_new": 20, "k_established": 10, "k_threshold": 50, "scale": 400},
+]
+
+
+def load_games(cursor, season=None):
+    """
+    Returns (id, p1, p2, winner) tuples in replay order, optionally for one
+    season.
+    """
+    names = player_ids.names_by_id(cursor)
+    if season is None:
+        cursor.execute("SELECT id, p1_id, p2_id, winner_id FROM games ORDER BY id ASC")
+    else:
+        cursor.execute(
+            "SELECT id, p1_id, p2_id, winner_id FROM games WHERE season = ? ORDER BY id ASC",
+            (season,),
+        )
+    return [
+        (game_id, names.get(p1_id), names.get(p2_id), names.get(winner_id))
+        for game_id, p1_id, p2_id, winner_id in cursor.fetchall()
+    ]
+
+
+def engine_replay(games, usernames, config):
+    """
+    Runs elo_engine.replay() with the config's constants and scores the
+    predictions it makes along the way.
+    """
+    saved = elo_engine.K_NEW, elo_engine.K_ESTABLISHED, elo_engine.K_THRESHOLD
+    elo_engine.K_NEW = config["k_new"]
+    elo_engine.K_ESTABLISHED = config["k_established"]
+    elo_engine.K_THRESHOLD = config["k_threshold"]
+    try:
+        history = []
+        ratings, _ = elo_engine.replay(
+            games, usernames, config["default_elo"], history=history
+        )
+    finally:
+        elo_engine.K_NEW, elo_engine.K_ESTABLISHED, elo_engine.K_THRESHOLD = saved
+    winners = {game[0]: game[3] for game in games}
+    log_loss = brier = 0.0
+    for i in range(0, len(history), 2):
+        game_id, p1_name, p1_before, _, _ = history[i]
+        _, p2_name, p2_before, _, _ = history[i + 1]
+        p1_expected = elo_engine.expected(p1_before, p2_before)
+        winner_expected = p1_expected if winners[game_id] == p1_name else 1 - p1_expected
+        log_loss -= math.log(winner_expected)
+        brier += (1 - winner_expected) ** 2
+    scored = len(history) // 2
+    return ratings, log_loss / scored, brier / scored
+
+
+def check(label, cursor, season, failures):
+    games = load_games(cursor, season)
+    usernames = elo_engine.load_usernames(cursor)
+    history = rating_sweep.History(games, usernames)
+    if not len(history):
+        return
+    start = time.perf_counter()
+    final, scores = rating_sweep.replay(history, CONFIGS)
+    elapsed = time.perf_counter() - start
+    for i, config in enumerate(CONFIGS):
+        expected_ratings, log_loss, brier = engine_replay(games, usernames, config)
+        swept = {name: int(final[row, i]) for row, name in enumerate(history.names)}
+        if swept != expected_ratings:
+            wrong = [name for name in swept if swept[name] != expected_ratings[name]]
+            failures.append(f"{label}: ratings differ for {config} ({len(wrong)} players)")
+        for name, value, reference in (
+            ("log_loss", scores["log_loss"][i] / scores["games"], log_loss),
+            ("brier", scores["brier"][i] / scores["games"], brier),
+        ):
+            if not math.isclose(value, reference, rel_tol=1e-9):
+                failures.append(f"{label}: {name} {value} != {reference} for {config}")
+    print(f"{label}: {len(history)} games x {len(CONFIGS)} configs in {elapsed * 1000:.1f} ms")
+
+
+def check_parse_values(failures):
+    for spec, expected in (
+        ("16:48:8", [16, 24, 32, 40, 48]),
+        ("0.5:1.5:0.5", [0.5, 1, 1.5]),
+        ("16, 24", [16, 24]),
+        ([480, "500"], [480, 500]),
+        (f"0:{rating_sweep.MAX_CONFIGS - 1}:1", list(range(rating_sweep.MAX_CONFIGS))),
+    ):
+        try:
+            values = rating_sweep.parse_values(spec)
+        except ValueError as e:
+            failures.append(f"parse_values({spec!r}) raised {e}")
+            continue
+        if values != expected:
+            failures.append(f"parse_values({spec!r}) = {values[:10]}")
+    for spec in (
+        "0:20000000:1",
+        f"0:{rating_sweep.MAX_CONFIGS}:1",
+        "-1e308:1e308:1e-308",
+        "0:inf:1",
+        "inf",
+        "nan",
+        "16,nan",
+        [16, float("inf")],
+        float("nan"),
+    ):
+        start = time.perf_counter()
+        try:
+            rating_sweep.parse_values(spec)
+            failures.append(f"parse_values({spec!r}) was accepted")
+        except ValueError:
+            pass
+        except Exception as e:
+            failures.append(f"parse_values({spec!r}) raised {type(e).__name__}: {e}")
+        if time.perf_counter() - start > 0.1:
+            failures.append(f"parse_values({spec!r}) took too long to reject")
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB
+    failures = []
+    check_parse_values(failures)
+    with tempfile.TemporaryDirectory() as tmp:
+        # A migrated copy, so the checks read the current schema.
+        copy = shutil.copy(db_path, os.path.join(tmp, "game_database.db"))
+        migrations.migrate(copy)
+        league = synthetic_league.generate(
+            os.path.join(tmp, "league.db"), players=100, games=20_000, seed=1
+        )
+        for label, path in (("database", copy), ("synthetic", league)):
+            conn = sqlite3.connect(path)
+            try:
+                cursor = conn.cursor()
+                check(f"{label} all seasons", cursor, None, failures)
+                seasons = [row[0] for row in cursor.execute("SELECT DISTINCT season FROM games")]
+                for season in seasons:
+                    check(f"{label} season {season}", cursor, season, failures)
+            finally:
+                conn.close()
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK (rating sweep)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Checks the read snapshot on a copy of the database: every GET route served
+from it must return what the SQL the routes used before returns, no GET
+route may open a database connection, a write through the admin app must be
+visible to its next read, and a write from another connection (as another
+process would make) must reach the main app within a few poll intervals.
+
+Also checks that gzip responses from the response cache decode to the same
+body as uncompressed ones.
+
+Usage (from backend/):
+    python scripts/check_read_snapshot.py [path/to/game_database.db]
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPTS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+import player_ids  # noqa: E402
+
+DEFAULT_DB = os.path.join(BACKEND_DIR, "game_database.db")
+PAGE_LIMIT = 7
+
+
+def sql_games(conn, season=None):
+    query = f"SELECT id, p1, p2, winner, date_played, season FROM ({player_ids.GAMES_WITH_NAMES}) WHERE archived = 0"
+    params = ()
+    if season is not None:
+        query += " AND season = ?"
+        params = (season,)
+    return [
+        {"id": g[0], "players": [g[1], g[2]], "winner": g[3], "date": g[4], "season": g[5]}
+        for g in conn.execute(query + " ORDER BY id", params)
+    ]
+
+
+def sql_players(conn, badges, season=None, default_elo=None):
+    if season is None:
+        rows = conn.execute("SELECT username, ELO, description FROM players ORDER BY id")
+    else:
+        rows = conn.execute(
+            """SELECT p.username, COALESCE(r.elo, ?), p.description FROM players p
+            LEFT JOIN season_ratings r ON r.season = ? AND r.username = p.username
+            ORDER BY p.id""",
+            (default_elo, season),
+        )
+    return [
+        {"username": u, "elo": e, "description": d, "achievements": badges.get(u, [])}
+        for u, e, d in rows
+    ]
+
+
+def sql_leaderboard(conn, badges, season, default_elo):
+    import player_stats
+
+    rows = conn.execute(
+        """SELECT p.username, COALESCE(r.elo, ?) AS elo, p.description,
+            COALESCE(s.wins, 0), COALESCE(s.losses, 0),
+            ROW_NUMBER() OVER (ORDER BY COALESCE(r.elo, ?) DESC, p.id ASC) AS rank
+        FROM players p
+        LEFT JOIN season_ratings r ON r.season = ? AND r.username = p.username
+        LEFT JOIN player_stats s ON s.username = p.username AND s.season = ?
+        ORDER BY rank""",
+        (default_elo, default_elo, season, season),
+    )
+    return [
+        player_stats.leaderboard_entry(u, e, d, badges.get(u, []), w, l, rank)
+        for u, e, d, w, l, rank in rows
+    ]
+
+
+def sql_head_to_head(conn, season, username=None):
+    import head_to_head
+
+    query = """SELECT player, opponent, wins, losses, last_played, last_game_id
+        FROM head_to_head WHERE season = ?"""
+    params = (season,)
+    if username is not None:
+        query += " AND player = ?"
+        params += (username,)
+    rows = conn.execute(query + " ORDER BY player, opponent", params)
+    return [head_to_head.row_to_dict(row) for row in rows]
+
+
+def sql_page(conn, season, player, winner, order, cursor_id):
+    games = sql_games(conn, season)
+    if order == "desc":
+        games.reverse()
+    games = [
+        g
+        for g in games
+        if (cursor_id is None or (g["id"] < cursor_id if order == "desc" else g["id"] > cursor_id))
+        and (not player or player in g["players"])
+        and (not winner or g["winner"] == winner)
+    ]
+    page = games[:PAGE_LIMIT]
+    return page, page[-1]["id"] if len(games) > PAGE_LIMIT else None
+
+
+def sql_tournament(conn, tournament_id):
+    row = conn.execute(
+        f"""SELECT t.name, t.active, {player_ids.player_name("t.winner")}, t.finished
+        FROM tournaments t WHERE t.id = ?""",
+        (tournament_id,),
+    ).fetchone()
+    if not row:
+        return 404, {"error": "Tournament not found"}
+    if not row[1] and not row[3]:
+        return 200, {"message": "Tournament has not started yet"}
+    rounds = {}
+    for p1, p2, winner, finished, round_num in conn.execute(
+        f"""SELECT {player_ids.player_name("g.player_one")},
+            {player_ids.player_name("g.player_two")},
+            {player_ids.player_name("g.winner")}, g.finished, g.round
+        FROM tournament_games g
+        WHERE g.tournament_id = ? ORDER BY g.round ASC, g.id ASC""",
+        (tournament_id,),
+    ):
+        rounds.setdefault(round_num, []).append([p1, p2, winner, bool(finished)])
+    return 200, {
+        "name": row[0],
+        "active": bool(row[1]),
+        "winner": row[2],
+        "rounds": [rounds[r] for r in sorted(rounds)],
+    }
+
+
+def expect(failures, label, actual, expected):
+    if actual != expected:
+        failures.append(f"{label}: snapshot response differs from SQL")
+
+
+def check_routes(main, admin_api, path, failures):
+    import achievements
+
+    client, admin_client = main.app.test_client(), admin_api.app.test_client()
+    conn = sqlite3.connect(path)
+    badges = achievements.load_all(conn.cursor())
+    season = main.CURRENT_SEASON
+
+    expect(
+        failures,
+        "main get_data",
+        client.get("/api/get_data").get_json(),
+        {
+            "players": sql_players(conn, badges, season, main.DEFAULT_ELO),
+            "games": sql_games(conn, season),
+        },
+    )
+    expect(
+        failures,
+        "main get_data stream",
+        client.get("/api/get_data?stream=1").get_json(),
+        client.get("/api/get_data").get_json(),
+    )
+    expect(
+        failures,
+        "admin get_data",
+        admin_client.get("/api/get_data").get_json(),
+        {"players": sql_players(conn, badges), "games": sql_games(conn)},
+    )
+
+    seasons = [row[0] for row in conn.execute("SELECT DISTINCT season FROM games")]
+    names = [row[0] for row in conn.execute("SELECT username FROM players ORDER BY id LIMIT 3")]
+    for s in seasons:
+        for player, winner in [(None, None)] + [(n, None) for n in names] + [
+            (None, names[0]),
+            (names[0], names[1]),
+        ]:
+            for order in ("asc", "desc"):
+                cursor_id, pages = None, 0
+                while pages < 5:
+                    query = {"season": s, "order": order, "limit": PAGE_LIMIT}
+                    query.update({"player": player or "", "winner": winner or ""})
+                    if cursor_id is not None:
+                        query["cursor"] = cursor_id
+                    body = client.get("/api/games", query_string=query).get_json()
+                    games, next_cursor = sql_page(conn, s, player, winner, order, cursor_id)
+                    label = f"games season={s} player={player} winner={winner} {order}"
+                    expect(failures, label, (body["games"], body["next_cursor"]), (games, next_cursor))
+                    if next_cursor is None:
+                        break
+                    cursor_id, pages = next_cursor, pages + 1
+
+        expect(
+            failures,
+            f"leaderboard season {s}",
+            client.get(f"/api/leaderboard?season={s}").get_json()["players"],
+            sql_leaderboard(conn, badges, s, main.DEFAULT_ELO),
+        )
+        expect(
+            failures,
+            f"head_to_head matrix season {s}",
+            client.get(f"/api/head_to_head?season={s}").get_json()["pairs"],
+            sql_head_to_head(conn, s),
+        )
+        for name in names:
+            expect(
+                failures,
+                f"head_to_head {name} season {s}",
+                client.get(f"/api/head_to_head/{name}?season={s}").get_json()["opponents"],
+                sql_head_to_head(conn, s, name),
+            )
+
+    tournaments = [
+        {"id": r[0], "name": r[1], "active": bool(r[2]), "winner": r[3]}
+        for r in conn.execute(
+            f"""SELECT t.id, t.name, t.active, {player_ids.player_name("t.winner")}
+            FROM tournaments t ORDER BY t.id"""
+        )
+    ]
+    for app_client, app_name in ((client, "main"), (admin_client, "admin")):
+        expect(
+            failures,
+            f"{app_name} get_tournaments",
+            app_client.get("/api/get_tournaments").get_json()["tournaments"],
+            tournaments,
+        )
+        for tournament_id in [t["id"] for t in tournaments] + [10**9]:
+            response = app_client.get(f"/api/tournament/{tournament_id}")
+            expect(
+                failures,
+                f"{app_name} tournament {tournament_id}",
+                (response.status_code, response.get_json()),
+                sql_tournament(conn, tournament_id),
+            )
+    conn.close()
+    print(f"Compared routes over {len(seasons)} seasons and {len(tournaments)} tournaments")
+
+
+def check_no_connections(main, admin_api, failures):
+    """
+    Fails if a GET route opens a connection on the request's thread.
+    """
+    import database
+
+    opened = []
+    originals = {}
+    for name in ("connect", "connect_readonly", "open_readonly"):
+        originals[name] = getattr(database, name)
+
+        def wrapper(*args, _name=name, **kwargs):
+            if threading.current_thread() is threading.main_thread():
+                opened.append(_name)
+            return originals[_name](*args, **kwargs)
+
+        setattr(database, name, wrapper)
+    try:
+        for app, urls in (
+            (
+                main.app,
+                [
+                    "/api/get_data",
+                    "/api/get_data?stream=1",
+                    "/api/games",
+                    "/api/leaderboard",
+                    "/api/head_to_head",
+                    "/api/get_tournaments",
+                ],
+            ),
+            (admin_api.app, ["/api/get_data", "/api/get_tournaments"]),
+        ):
+            client = app.test_client()
+            for url in urls:
+                opened.clear()
+                client.get(url).get_data()
+                if opened:
+                    failures.append(f"GET {url} opened a connection ({', '.join(opened)})")
+    finally:
+        for name, fn in originals.items():
+            setattr(database, name, fn)
+
+
+def check_gzip(main, admin_api, failures):
+    """
+    A client sending Accept-Encoding: gzip must get the same JSON,
+    compressed when the body is large enough, and the same bytes again.
+    """
+    import gzip
+
+    for app, urls in (
+        (main.app, ["/api/get_data", "/api/games", "/api/leaderboard", "/api/head_to_head"]),
+        (admin_api.app, ["/api/get_data"]),
+    ):
+        client = app.test_client()
+        for url in urls:
+            identity = client.get(url)
+            first = client.get(url, headers={"Accept-Encoding": "gzip"})
+            again = client.get(url, headers={"Accept-Encoding": "gzip"})
+            body = first.data
+            if first.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            elif len(identity.data) >= 1024:
+                failures.append(f"GET {url} with Accept-Encoding: gzip was not compressed")
+            if body != identity.data or again.data != first.data:
+                failures.append(f"GET {url} gzip body differs from the identity body")
+            if "Accept-Encoding" not in first.headers.get("Vary", ""):
+                failures.append(f"GET {url} does not send Vary: Accept-Encoding")
+
+
+def check_writes(main, admin_api, path, failures):
+    admin_client, client = admin_api.app.test_client(), main.app.test_client()
+    conn = sqlite3.connect(path)
+    p1, p2 = [row[0] for row in conn.execute("SELECT username FROM players ORDER BY id LIMIT 2")]
+    conn.close()
+
+    # Read-your-writes in the writing process.
+    response = admin_client.post(
+        "/api/add_game", json={"p1": p1, "p2": p2, "winner": p1, "season": main.CURRENT_SEASON}
+    )
+    if response.status_code != 201:
+        failures.append(f"add_game returned {response.status_code}")
+        return
+    conn = sqlite3.connect(path)
+    newest = conn.execute("SELECT MAX(id) FROM games").fetchone()[0]
+    conn.close()
+    games = admin_client.get("/api/get_data").get_json()["games"]
+    if not games or games[-1]["id"] != newest:
+        failures.append("admin get_data right after add_game does not show the new game")
+
+    # A write from another connection reaches the main app's poller.
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            "UPDATE players SET description = 'changed elsewhere' WHERE username = ?", (p1,)
+        )
+        conn.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+    conn.close()
+    start = time.monotonic()
+    deadline = start + 20 * main.snapshots.poll_interval + 5
+    while time.monotonic() < deadline:
+        players = client.get("/api/get_data").get_json()["players"]
+        if any(p["username"] == p1 and p["description"] == "changed elsewhere" for p in players):
+            print(f"External write visible after {time.monotonic() - start:.2f} s")
+            break
+        time.sleep(0.02)
+    else:
+        failures.append("a write from another connection never reached the snapshot")
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(db_path, os.path.join(tmp, "game_database.db"))
+        os.environ["DEPLOY_SCRIPT"] = "/bin/true"
+        os.environ["DEPLOY_QUIET_PERIOD"] = os.environ["DEPLOY_MAX_DELAY"] = "1e9"
+        os.chdir(tmp)
+        path = os.path.join(tmp, "game_database.db")
+
+        import admin_api
+        import main as main_api
+
+        check_routes(main_api, admin_api, path, failures)
+        check_no_connections(main_api, admin_api, failures)
+        check_gzip(main_api, admin_api, failures)
+        check_writes(main_api, admin_api, path, failures)
+        stats = main_api.snapshots.stats()
+        print(
+            f"Snapshot of {stats['games']} games built in "
+            f"{stats['last_build_seconds'] * 1000:.1f} ms"
+        )
+
+    if failures:
+        for failure in failures[:20]:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK (read snapshot)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Replicates between two local database files: writes go through the admin
+app on a primary copy, and a replica copy catches up through exported
+change-log entries. Checks that both end with identical games, players,
+badges and ratings, that a repeated apply is a no-op, and that a replica
+bootstrapped from a pruned snapshot catches up from the log.
+
+Usage (from backend/):
+    python scripts/check_replication.py [path/to/game_database.db]
+"""
+
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPTS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_DB = os.path.join(BACKEND_DIR, "game_database.db")
+SEASON = 2
+
+TABLES = {
+    "games": "SELECT id, date_played, p1_id, p2_id, doubles, winner_id, archived, season FROM games ORDER BY id",
+    "players": "SELECT id, username, description, ELO FROM players ORDER BY id",
+    "badges": """SELECT pa.username, pa.position, a.name, a.description, a.icon_url
+        FROM player_achievements pa JOIN achievements a ON a.id = pa.achievement_id
+        ORDER BY pa.username, pa.position""",
+    # Decrements leave zeroed rows on the primary that a rebuild omits.
+    "player_stats": "SELECT * FROM player_stats WHERE wins + losses > 0 ORDER BY username, season",
+    # Maintained game by game on the primary, replayed in full on replicas.
+    "season_ratings": "SELECT * FROM season_ratings ORDER BY season, username",
+}
+
+
+def differences(primary_path, replica_path):
+    primary, replica = sqlite3.connect(primary_path), sqlite3.connect(replica_path)
+    try:
+        return [
+            name
+            for name, query in TABLES.items()
+            if primary.execute(query).fetchall() != replica.execute(query).fetchall()
+        ]
+    finally:
+        primary.close()
+        replica.close()
+
+
+def ship(replication, primary_path, replica_path):
+    replica = sqlite3.connect(replica_path)
+    since = replication.position(replica)
+    replica.close()
+    buffer = io.StringIO()
+    replication.export(primary_path, since, buffer)
+    buffer.seek(0)
+    return replication.apply(replica_path, replication.read_entries(buffer))
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB
+    failures = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(db_path, os.path.join(tmp, "game_database.db"))
+        os.environ["DEPLOY_SCRIPT"] = "/bin/true"
+        os.chdir(tmp)
+
+        import admin_api
+        import database
+        import migrations
+        import replication
+
+        primary_path = os.path.join(tmp, "game_database.db")
+        replica_path = os.path.join(tmp, "replica.db")
+        database.checkpoint(primary_path)
+        shutil.copy(primary_path, replica_path)
+        migrations.migrate(replica_path)
+
+        client = admin_api.app.test_client()
+        conn = sqlite3.connect(primary_path)
+        p1, p2, p3 = [
+            row[0] for row in conn.execute("SELECT username FROM players ORDER BY id LIMIT 3")
+        ]
+        conn.close()
+
+        responses = [
+            client.post(
+                "/api/add_player",
+                json={
+                    "username": "Replica Test",
+                    "achievements": '[{"name": "Centurion", "description": "Played 100 games in one season", "icon_url": "x"}]',
+                },
+            ),
+            client.post(
+                "/api/add_game",
+                json={"p1": p1, "p2": "Replica Test", "winner": p1, "season": SEASON},
+            ),
+            client.post(
+                "/api/add_multiple_games",
+                json={
+                    "games": [
+                        {"p1": p2, "p2": p3, "winner": p3, "season": SEASON},
+                        {"p1": p1, "p2": p3, "winner": p1, "season": SEASON},
+                    ]
+                },
+            ),
+        ]
+        game_ids = [
+            row[0]
+            for row in sqlite3.connect(primary_path).execute(
+                "SELECT id FROM games ORDER BY id DESC LIMIT 3"
+            )
+        ]
+        responses.append(
+            client.put(
+                f"/api/game/{game_ids[1]}",
+                json={"p1": p2, "p2": p3, "winner": p2, "season": SEASON},
+            )
+        )
+        responses.append(client.delete(f"/api/game/{game_ids[2]}"))
+        for response in responses:
+            if response.status_code >= 300:
+                failures.append(f"{response.request.path}: {response.status_code}")
+
+        position, applied = ship(replication, primary_path, replica_path)
+        print(f"Applied {applied} changes; replica at {position}")
+        if applied != 6:
+            failures.append(f"expected 6 changes, applied {applied}")
+        diff = differences(primary_path, replica_path)
+        if diff:
+            failures.append(f"replica differs after apply: {diff}")
+
+        position, applied = ship(replication, primary_path, replica_path)
+        if applied:
+            failures.append(f"repeated apply changed {applied} entries")
+
+        # Snapshot with pruning, then a new replica bootstraps from it.
+        snapshot_dir = os.path.join(tmp, "snapshots")
+        snapshot = replication.snapshot(primary_path, snapshot_dir, keep=1, prune=True)
+        client.post(
+            "/api/add_game",
+            json={"p1": p2, "p2": p1, "winner": p2, "season": SEASON},
+        )
+        try:
+            fresh = os.path.join(tmp, "fresh.db")
+            shutil.copy(db_path, fresh)
+            migrations.migrate(fresh)
+            ship(replication, primary_path, fresh)
+            failures.append("export from a pruned position did not fail")
+        except replication.ReplicationError as e:
+            print(f"Pruned export refused: {e}")
+
+        bootstrapped = os.path.join(tmp, "bootstrapped.db")
+        shutil.copy(snapshot, bootstrapped)
+        position, applied = ship(replication, primary_path, bootstrapped)
+        print(f"Snapshot replica caught up with {applied} change(s) to {position}")
+        diff = differences(primary_path, bootstrapped)
+        if diff:
+            failures.append(f"snapshot replica differs: {diff}")
+        database.close_all()
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK (replication)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Submits games concurrently to the admin app on a copy of the database and
+checks the single-writer queue: every game is stored, and every player's
+rating and games-played counter equal a sequential replay of the new games
+in commit order, so no read-modify-write lost an update. Runs with many
+threads in one process and with several forked processes (as gunicorn
+workers), compares the throughput of group commit against one commit per
+game, and checks that the statements jobs run on the writer thread are
+counted in the metrics of the requests that submitted them and that the
+writes keep the rating fingerprint current.
+
+Usage (from backend/):
+    python scripts/check_write_queue.py [path/to/game_database.db]
+"""
+
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPTS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_DB = os.path.join(BACKEND_DIR, "game_database.db")
+SEASON = 2
+THREADS = 16
+GAMES_PER_THREAD = 25
+PROCESSES = 4
+ROUNDS = 3
+PLAYERS = 4  # Few players, so concurrent games keep touching the same rows
+
+
+def snapshot(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        max_id = conn.execute("SELECT MAX(id) FROM games").fetchone()[0] or 0
+        ratings = dict(conn.execute("SELECT username, ELO FROM players"))
+        counts = dict(
+            conn.execute(
+                "SELECT username, SUM(games_played) FROM player_game_counts GROUP BY username"
+            )
+        )
+        return max_id, ratings, counts
+    finally:
+        conn.close()
+
+
+def expected_state(db_path, before):
+    """
+    Applies the games added since before, in id (commit) order, with
+    admin_api's incremental rule.
+    """
+    import elo_engine
+    import player_ids
+
+    max_id, ratings, counts = before
+    ratings, counts = dict(ratings), dict(counts)
+    conn = sqlite3.connect(db_path)
+    games = conn.execute(
+        f"SELECT p1, p2, winner FROM ({player_ids.GAMES_WITH_NAMES}) WHERE id > ? ORDER BY id",
+        (max_id,),
+    ).fetchall()
+    conn.close()
+    for p1_name, p2_name, winner_name in games:
+        counts[p1_name] = counts.get(p1_name, 0) + 1
+        counts[p2_name] = counts.get(p2_name, 0) + 1
+        k1 = 16 if counts[p1_name] > 30 else 32
+        k2 = 16 if counts[p2_name] > 30 else 32
+        p1_before, p2_before = ratings[p1_name], ratings[p2_name]
+        p1_score = 1 if winner_name == p1_name else 0
+        ratings[p1_name] = round(
+            p1_before + k1 * (p1_score - elo_engine.expected(p1_before, p2_before))
+        )
+        ratings[p2_name] = round(
+            p2_before + k2 * ((1 - p1_score) - elo_engine.expected(p2_before, p1_before))
+        )
+    return len(games), ratings, counts
+
+
+def submit_games(client, players, offset, count, errors):
+    for i in range(count):
+        p1 = players[(offset + i) % len(players)]
+        p2 = players[(offset + i + 1) % len(players)]
+        response = client.post(
+            "/api/add_game",
+            json={"p1": p1, "p2": p2, "winner": p1 if i % 3 else p2, "season": SEASON},
+        )
+        if response.status_code != 201:
+            errors.append(f"{response.status_code} {response.get_json()}")
+
+
+def run_threads(admin_api, players, threads, per_thread):
+    errors = []
+    workers = [
+        threading.Thread(
+            target=submit_games,
+            args=(admin_api.app.test_client(), players, t, per_thread, errors),
+        )
+        for t in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start, errors
+
+
+def process_main(players, threads, per_thread, results):
+    import admin_api
+
+    elapsed, errors = run_threads(admin_api, players, threads, per_thread)
+    results.put((elapsed, errors, admin_api.writes.status()["largest_batch"]))
+
+
+def verify(label, db_path, before, submitted, failures):
+    added, ratings, counts = expected_state(db_path, before)
+    _, actual_ratings, actual_counts = snapshot(db_path)
+    if added != submitted:
+        failures.append(f"{label}: {submitted} games submitted, {added} stored")
+    lost = [name for name in ratings if ratings[name] != actual_ratings.get(name)]
+    if lost:
+        failures.append(f"{label}: ratings differ from a sequential replay for {lost}")
+    if counts != {name: c for name, c in actual_counts.items() if name in counts}:
+        failures.append(f"{label}: games-played counters differ")
+    import elo_engine
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        if elo_engine.stored_fingerprint(cursor) != elo_engine.fingerprint(cursor):
+            failures.append(f"{label}: rating fingerprint is stale, startup would replay")
+    finally:
+        conn.close()
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB
+    failures = []
+    submitted = THREADS * GAMES_PER_THREAD
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(db_path, os.path.join(tmp, "game_database.db"))
+        os.environ["DEPLOY_SCRIPT"] = "/bin/true"
+        os.environ["DEPLOY_QUIET_PERIOD"] = os.environ["DEPLOY_MAX_DELAY"] = "1e9"
+        os.chdir(tmp)
+
+        import admin_api
+        import write_queue
+
+        path = os.path.join(tmp, "game_database.db")
+        conn = sqlite3.connect(path)
+        players = [
+            row[0]
+            for row in conn.execute("SELECT username FROM players ORDER BY id LIMIT ?", (PLAYERS,))
+        ]
+        conn.close()
+
+        # Alternate the two settings and keep each one's best round, so a
+        # noisy machine does not decide the comparison.
+        throughput = {}
+        for _ in range(ROUNDS):
+            for label, window, max_batch in (
+                ("one commit per game", 0, 1),
+                ("group commit", write_queue.DEFAULT_WINDOW, write_queue.DEFAULT_MAX_BATCH),
+            ):
+                admin_api.writes = write_queue.WriteQueue(admin_api.db, window, max_batch)
+                before = snapshot(path)
+                elapsed, errors = run_threads(admin_api, players, THREADS, GAMES_PER_THREAD)
+                failures += [f"{label}: {error}" for error in errors[:5]]
+                verify(label, path, before, submitted, failures)
+                throughput[label] = max(throughput.get(label, 0), submitted / elapsed)
+                status = admin_api.writes.status()
+                print(
+                    f"{label}: {submitted} games from {THREADS} threads in {elapsed:.2f} s "
+                    f"({submitted / elapsed:.0f} games/s, {status['batches']} commits, "
+                    f"largest batch {status['largest_batch']})"
+                )
+        ratio = throughput["group commit"] / throughput["one commit per game"]
+        print(f"Group commit throughput (best rounds): {ratio:.2f}x")
+        if ratio <= 1:
+            failures.append(f"group commit was not faster ({ratio:.2f}x)")
+
+        # Statements run on the writer thread are charged to the requests.
+        import metrics
+
+        statements = sum(
+            float(line.rsplit(" ", 1)[1])
+            for line in metrics.render().splitlines()
+            if line.startswith('sqlite_statements_per_request_sum{app="admin"')
+        )
+        print(f"Statements charged to admin requests: {statements:.0f}")
+        if statements < submitted * ROUNDS * 2:
+            failures.append(f"admin requests were charged {statements:.0f} statements")
+
+        # Several processes, each with its own writer thread, as gunicorn
+        # workers would run.
+        admin_api.writes = write_queue.WriteQueue(admin_api.db)
+        before = snapshot(path)
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        per_process = THREADS // PROCESSES
+        processes = [
+            context.Process(
+                target=process_main, args=(players, per_process, GAMES_PER_THREAD, results)
+            )
+            for _ in range(PROCESSES)
+        ]
+        for process in processes:
+            process.start()
+        outcomes = [results.get(timeout=300) for _ in processes]
+        for process in processes:
+            process.join()
+        for _, errors, _ in outcomes:
+            failures += [f"processes: {error}" for error in errors[:5]]
+        verify("processes", path, before, submitted, failures)
+        print(
+            f"{PROCESSES} processes: {submitted} games, largest batch "
+            f"{max(largest for _, _, largest in outcomes)}"
+        )
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK (write queue)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+#!/bin/bash
+# Ships new change_log entries to the production replica instead of
+# committing the whole database file. Use it from the admin app with
+#   DEPLOY_SCRIPT=./scripts/deploy_changes.sh python admin_api.py
+# The replica's API picks the changes up without a restart (data_version).
+# apply replays every season, the scope main.py's startup replay uses, so
+# the replica's ratings fingerprint stays current and it does not replay
+# again when it restarts.
+set -euo pipefail
+
+REMOTE="${DEPLOY_REMOTE:-ubuntu@51.195.255.193}"
+REMOTE_DIR="${DEPLOY_REMOTE_DIR:-.}"
+
+since=$(ssh "$REMOTE" "cd '$REMOTE_DIR' && python3 replication.py position game_database.db")
+python3 replication.py export game_database.db --since "$since" \
+    | ssh "$REMOTE" "cd '$REMOTE_DIR' && python3 replication.py apply game_database.db -"
@@ -0,0 +1,19 @@
+#!/bin/bash
+# Stand-in for deploy_db.sh when testing the deploy queue locally:
+#   DEPLOY_SCRIPT=./scripts/deploy_stub.sh python admin_api.py
+# Sleeps like a slow push, logs each run, and fails if two runs overlap.
+
+LOG="${DEPLOY_STUB_LOG:-/tmp/deploy_stub.log}"
+LOCK="${LOG}.lock"
+
+if ! mkdir "$LOCK" 2>/dev/null; then
+    echo "overlap $(date +%s.%N)" >> "$LOG"
+    echo "Another deploy is already running" >&2
+    exit 1
+fi
+trap 'rmdir "$LOCK"' EXIT
+
+echo "start $(date +%s.%N)" >> "$LOG"
+sleep "${DEPLOY_STUB_SLEEP:-2}"
+echo "end $(date +%s.%N)" >> "$LOG"
+echo "stub deploy done"
@@ -0,0 +1,190 @@
+"""
+Generates a synthetic league database with the production schema, for
+benchmarks and load tests. The same options and seed always produce the
+same database.
+
+Players have a hidden skill that decides who wins, activity is skewed so a
+few players play most games, games are spread evenly over the seasons in
+date order, and a share of them is archived. Tournaments are 8-player
+single-elimination brackets; the last one is left in progress.
+
+Usage (from backend/):
+    python scripts/synthetic_league.py OUT.db [--players N] [--games N]
+        [--seasons N] [--archived RATIO] [--tournaments N] [--seed N]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import elo_engine  # noqa: E402
+import migrations  # noqa: E402
+
+# The tables that predate migrations.py, as they exist in game_database.db.
+BASE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS "players" ("id" integer,"username" text,"description" text, "ELO" int NOT NULL DEFAULT '400', "achievements" text DEFAULT '[]', PRIMARY KEY (id))""",
+    """CREATE TABLE games (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date_played INT,
+    p1 TEXT NOT NULL,
+    p2 TEXT NOT NULL,
+    doubles NUM NOT NULL,
+    winner TEXT NOT NULL,
+    archived INT NOT NULL
+, "season" int NOT NULL DEFAULT '')""",
+    """CREATE TABLE IF NOT EXISTS "tournaments" ("id" integer NOT NULL,"active" integer NOT NULL, "name" text, "winner" text, "finished" integer, PRIMARY KEY (id))""",
+    """CREATE TABLE IF NOT EXISTS "seasons" ("id" integer,"active" integer NOT NULL, PRIMARY KEY (id))""",
+    """CREATE TABLE IF NOT EXISTS "tournament_games" ("id" integer,"player_one" TEXT,"player_two" TEXT,"winner" TEXT,"tournament_id" INT,"finished" INT,"round" INT, PRIMARY KEY (id))""",
+]
+
+START_DATE = 1_700_000_000
+SECONDS_PER_GAME = 600
+BADGE = {
+    "name": "Centurion",
+    "description": "Played 100 games in one season",
+    "icon_url": "💯",
+}
+
+
+def _winner(rng, skills, p1, p2):
+    p1_wins = rng.random() < elo_engine.expected(skills[p1], skills[p2])
+    return p1 if p1_wins else p2
+
+
+def _games(rng, names, skills, games, seasons, archived_ratio):
+    # Activity follows a long tail: player i is picked with weight 1/(i+1).
+    weights = [1 / (i + 1) for i in range(len(names))]
+    per_season = -(-games // seasons)
+    for i in range(games):
+        p1, p2 = rng.choices(names, weights, k=2)
+        while p2 == p1:
+            p2 = rng.choices(names, weights)[0]
+        yield (
+            START_DATE + i * SECONDS_PER_GAME,
+            p1,
+            p2,
+            0,
+            _winner(rng, skills, p1, p2),
+            1 if rng.random() < archived_ratio else 0,
+            i // per_season + 1,
+        )
+
+
+def _tournaments(rng, names, skills, tournaments):
+    rows, games = [], []
+    for tournament_id in range(1, tournaments + 1):
+        in_progress = tournament_id == tournaments
+        bracket = rng.sample(names, min(8, len(names)))
+        round_number = 1
+        while len(bracket) > 1:
+            next_round = []
+            for p1, p2 in zip(bracket[::2], bracket[1::2]):
+                finished = not (in_progress and round_number > 1)
+                winner = _winner(rng, skills, p1, p2) if finished else None
+                games.append(
+                    (len(games) + 1, p1, p2, winner, tournament_id, int(finished), round_number)
+                )
+                next_round.append(winner or p1)
+            bracket = next_round
+            round_number += 1
+        champion = None if in_progress else bracket[0]
+        rows.append(
+            (tournament_id, int(in_progress), f"Tournament {tournament_id}", champion, int(not in_progress))
+        )
+    return rows, games
+
+
+def generate(
+    path,
+    players=200,
+    games=10_000,
+    seasons=3,
+    archived_ratio=0.05,
+    tournaments=2,
+    seed=0,
+):
+    """
+    Writes a new database at path (replacing any existing file), migrates
+    it and runs a full rating replay so it looks like a live league.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(seed)
+    names = [f"player{i:05d}" for i in range(players)]
+    skills = {name: rng.gauss(elo_engine.DEFAULT_ELO, 150) for name in names}
+
+    conn = sqlite3.connect(path)
+    try:
+        for statement in BASE_SCHEMA:
+            conn.execute(statement)
+        conn.executemany(
+            "INSERT INTO players (username, description, ELO, achievements) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    name,
+                    "Synthetic player",
+                    elo_engine.DEFAULT_ELO,
+                    json.dumps([BADGE]) if i % 10 == 0 else "[]",
+                )
+                for i, name in enumerate(names)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO seasons (id, active) VALUES (?, ?)",
+            [(season, int(season == seasons)) for season in range(1, seasons + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO games (date_played, p1, p2, doubles, winner, archived, season) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            _games(rng, names, skills, games, seasons, archived_ratio),
+        )
+        tournament_rows, tournament_games = _tournaments(rng, names, skills, tournaments)
+        conn.executemany(
+            "INSERT INTO tournaments (id, active, name, winner, finished) VALUES (?, ?, ?, ?, ?)",
+            tournament_rows,
+        )
+        conn.executemany(
+            "INSERT INTO tournament_games (id, player_one, player_two, winner, tournament_id, finished, round) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            tournament_games,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    database.init(path)
+    migrations.migrate(path)
+    elo_engine.ensure_ratings(path)
+    return path
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Generate a synthetic league database.")
+    parser.add_argument("out")
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--games", type=int, default=10_000)
+    parser.add_argument("--seasons", type=int, default=3)
+    parser.add_argument("--archived", type=float, default=0.05)
+    parser.add_argument("--tournaments", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(
+        args.out,
+        players=args.players,
+        games=args.games,
+        seasons=args.seasons,
+        archived_ratio=args.archived,
+        tournaments=args.tournaments,
+        seed=args.seed,
+    )
+    database.close_all()
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
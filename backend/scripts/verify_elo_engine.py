@@ -0,0 +1,243 @@
+"""
+Checks that elo_engine produces exactly the same players.ELO values as the
+original per-row recalculate_all_elos() on a copy of the database, and that
+a checkpointed recompute after deleting or editing a game matches a full
+replay, and that season_ratings (sequential and through the process pool)
+holds what a replay of each season alone produces. Also reports where the
+games-played counters disagree with the replay's game_counts.
+
+Usage (from backend/):
+    python scripts/verify_elo_engine.py [path/to/game_database.db]
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import elo_engine  # noqa: E402
+import migrations  # noqa: E402
+import player_ids  # noqa: E402
+
+DEFAULT_DB = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "game_database.db"
+)
+# The reference reads games by name, as it did before the player id columns.
+GAMES = player_ids.GAMES_WITH_NAMES
+
+
+# --- Reference implementation (the original per-row replay, kept verbatim) ---
+def reference_recalculate_all_elos(
+    db_path, season=None, default_elo=elo_engine.DEFAULT_ELO
+):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("UPDATE players SET ELO = ?", (default_elo,))
+    if season is None:
+        cursor.execute(f"SELECT p1, p2, winner FROM ({GAMES}) ORDER BY id ASC")
+    else:
+        cursor.execute(
+            f"SELECT p1, p2, winner FROM ({GAMES}) WHERE season = ? ORDER BY id ASC",
+            (season,),
+        )
+    all_games = cursor.fetchall()
+    game_counts = {}
+    for p1_name, p2_name, winner_name in all_games:
+        game_counts[p1_name] = game_counts.get(p1_name, 0)
+        game_counts[p2_name] = game_counts.get(p2_name, 0)
+        cursor.execute("SELECT ELO FROM players WHERE username = ?", (p1_name,))
+        p1_row = cursor.fetchone()
+        cursor.execute("SELECT ELO FROM players WHERE username = ?", (p2_name,))
+        p2_row = cursor.fetchone()
+        if not p1_row or not p2_row:
+            continue
+        p1_elo = p1_row[0]
+        p2_elo = p2_row[0]
+        k1 = 16 if game_counts[p1_name] >= 30 else 32
+        k2 = 16 if game_counts[p2_name] >= 30 else 32
+        exp_p1 = elo_engine.expected(p1_elo, p2_elo)
+        exp_p2 = elo_engine.expected(p2_elo, p1_elo)
+        if winner_name == p1_name:
+            p1_elo += k1 * (1 - exp_p1)
+            p2_elo += k2 * (0 - exp_p2)
+        elif winner_name == p2_name:
+            p1_elo += k1 * (0 - exp_p1)
+            p2_elo += k2 * (1 - exp_p2)
+        else:
+            continue
+        cursor.execute(
+            "UPDATE players SET ELO = ? WHERE username = ?", (round(p1_elo), p1_name)
+        )
+        cursor.execute(
+            "UPDATE players SET ELO = ? WHERE username = ?", (round(p2_elo), p2_name)
+        )
+        game_counts[p1_name] += 1
+        game_counts[p2_name] += 1
+    conn.commit()
+    conn.close()
+    return game_counts
+
+
+def read_ratings(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT id, username, ELO FROM players ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def compare(source_db, season):
+    with tempfile.TemporaryDirectory() as tmp:
+        ref_db = os.path.join(tmp, "reference.db")
+        new_db = os.path.join(tmp, "engine.db")
+        shutil.copyfile(source_db, ref_db)
+        shutil.copyfile(source_db, new_db)
+        migrations.migrate(ref_db)
+        migrations.migrate(new_db)
+
+        ref_counts = reference_recalculate_all_elos(ref_db, season)
+        _, new_counts = elo_engine.recalculate_all_elos(new_db, season)
+        database.close_all()
+
+        ref_rows, new_rows = read_ratings(ref_db), read_ratings(new_db)
+        mismatches = [(r, n) for r, n in zip(ref_rows, new_rows) if r != n]
+        if len(ref_rows) != len(new_rows):
+            mismatches.append(("row count", len(ref_rows), len(new_rows)))
+        if ref_counts != new_counts:
+            mismatches.append(("game_counts", ref_counts, new_counts))
+        return mismatches
+
+
+def compare_season_ratings(source_db, seasons, pooled):
+    saved = elo_engine.SEASON_WORKERS, elo_engine.PARALLEL_MIN_GAMES
+    if pooled:
+        elo_engine.SEASON_WORKERS, elo_engine.PARALLEL_MIN_GAMES = 2, 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            new_db = os.path.join(tmp, "engine.db")
+            shutil.copyfile(source_db, new_db)
+            migrations.migrate(new_db)
+            elo_engine.recalculate_all_elos(new_db)
+            database.close_all()
+            mismatches = []
+            for season in seasons:
+                ref_db = os.path.join(tmp, f"reference_{season}.db")
+                shutil.copyfile(source_db, ref_db)
+                migrations.migrate(ref_db)
+                reference_recalculate_all_elos(ref_db, season)
+                conn = sqlite3.connect(new_db)
+                season_rows = conn.execute(
+                    """SELECT p.id, p.username, COALESCE(r.elo, ?) FROM players p
+                    LEFT JOIN season_ratings r ON r.season = ? AND r.username = p.username
+                    ORDER BY p.id""",
+                    (elo_engine.DEFAULT_ELO, season),
+                ).fetchall()
+                conn.close()
+                mismatches += [
+                    (season, r, n) for r, n in zip(read_ratings(ref_db), season_rows) if r != n
+                ]
+            return mismatches
+    finally:
+        elo_engine.SEASON_WORKERS, elo_engine.PARALLEL_MIN_GAMES = saved
+
+
+def compare_incremental(source_db, game_id, edit):
+    with tempfile.TemporaryDirectory() as tmp:
+        full_db = os.path.join(tmp, "full.db")
+        inc_db = os.path.join(tmp, "incremental.db")
+        shutil.copyfile(source_db, inc_db)
+        migrations.migrate(inc_db)
+        elo_engine.recalculate_all_elos(inc_db)
+
+        conn = sqlite3.connect(inc_db)
+        with conn:
+            if edit:
+                # Flip the winner of the game.
+                conn.execute(
+                    "UPDATE games SET winner_id = CASE WHEN winner_id = p1_id THEN p2_id ELSE p1_id END WHERE id = ?",
+                    (game_id,),
+                )
+            else:
+                conn.execute("DELETE FROM games WHERE id = ?", (game_id,))
+        conn.close()
+        shutil.copyfile(inc_db, full_db)
+
+        elo_engine.recalculate_from(inc_db, game_id)
+        elo_engine.recalculate_all_elos(full_db)
+        database.close_all()
+        full_rows, inc_rows = read_ratings(full_db), read_ratings(inc_db)
+        return [(f, i) for f, i in zip(full_rows, inc_rows) if f != i]
+
+
+def main():
+    source_db = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB
+    conn = sqlite3.connect(source_db)
+    seasons = [
+        r[0] for r in conn.execute("SELECT DISTINCT season FROM games ORDER BY season")
+    ]
+    conn.close()
+
+    failed = False
+    for season in [None] + seasons:
+        label = "all seasons" if season is None else f"season {season}"
+        mismatches = compare(source_db, season)
+        if mismatches:
+            failed = True
+            print(f"FAIL ({label}): {len(mismatches)} mismatches")
+            for mismatch in mismatches:
+                print(f"  {mismatch}")
+        else:
+            print(f"OK ({label})")
+
+    for pooled in (False, True):
+        label = f"season ratings, {'process pool' if pooled else 'sequential'}"
+        mismatches = compare_season_ratings(source_db, seasons, pooled)
+        if mismatches:
+            failed = True
+            print(f"FAIL ({label}): {len(mismatches)} mismatches")
+            for mismatch in mismatches:
+                print(f"  {mismatch}")
+        else:
+            print(f"OK ({label})")
+
+    conn = sqlite3.connect(source_db)
+    game_ids = [r[0] for r in conn.execute("SELECT id FROM games ORDER BY id")]
+    conn.close()
+    samples = sorted({game_ids[i] for i in (0, len(game_ids) // 2, -1)}) if game_ids else []
+    for game_id in samples:
+        for edit in (False, True):
+            label = f"{'edit' if edit else 'delete'} game {game_id}"
+            mismatches = compare_incremental(source_db, game_id, edit)
+            if mismatches:
+                failed = True
+                print(f"FAIL ({label}): {len(mismatches)} mismatches")
+                for mismatch in mismatches:
+                    print(f"  {mismatch}")
+            else:
+                print(f"OK ({label})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        counters_db = os.path.join(tmp, "counters.db")
+        shutil.copyfile(source_db, counters_db)
+        migrations.migrate(counters_db)
+        _, game_counts = elo_engine.recalculate_all_elos(counters_db)
+        database.close_all()
+        conn = sqlite3.connect(counters_db)
+        mismatches = elo_engine.compare_game_counts(conn.cursor(), game_counts)
+        conn.close()
+    if mismatches:
+        # Skipped games are counted by the counters but not the replay, so
+        # this is reported rather than treated as a failure.
+        print(f"NOTE (game counters): {len(mismatches)} players differ from the replay")
+        for username, (counter, replayed) in sorted(mismatches.items()):
+            print(f"  {username}: counter={counter} replay={replayed}")
+    else:
+        print("OK (game counters)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
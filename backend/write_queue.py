@@ -0,0 +1,171 @@
+import sqlite3
+import threading
+import time
+
+import database
+import metrics
+
+# --- Write Queue ---
+# Every admin mutation runs as a job on one writer thread per process. Jobs
+# that arrive within `window` seconds of the first waiting one (up to
+# max_batch jobs) share a single BEGIN IMMEDIATE ... COMMIT, so a burst of
+# submissions costs one commit instead of one per request. Each job runs in
+# its own SAVEPOINT: a job that raises is rolled back alone, the rest of
+# its batch still commits, and the exception is re-raised to its submitter.
+#
+# BEGIN IMMEDIATE takes SQLite's write lock before any job reads, so a
+# job's read-modify-write of ratings cannot interleave with another
+# writer, in this process (one thread) or in another gunicorn worker (the
+# lock is held until COMMIT).
+#
+# on_commit, if given, is called on the writer thread after each batch
+# commits and before its submitters are released (e.g. to refresh a read
+# snapshot, see read_snapshot.py).
+#
+# The SQLite statements and rows a job uses are counted on the writer
+# thread and handed back with its result, so metrics charges them to the
+# request that submitted the job. The batch's BEGIN and COMMIT are not
+# charged to any request.
+
+DEFAULT_WINDOW = 0.002  # Seconds the writer waits for more jobs
+DEFAULT_MAX_BATCH = 64
+
+
+class _Job:
+    __slots__ = ("fn", "exclusive", "done", "result", "error", "counts")
+
+    def __init__(self, fn, exclusive):
+        self.fn = fn
+        self.exclusive = exclusive
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.counts = (0, 0)  # (statements, rows) the job ran on the writer
+
+
+class WriteQueue:
+    def __init__(
+        self, db_path, window=DEFAULT_WINDOW, max_batch=DEFAULT_MAX_BATCH, on_commit=None
+    ):
+        self.db_path = db_path
+        self.window = window
+        self.max_batch = max_batch
+        self.on_commit = on_commit
+        self._cond = threading.Condition()
+        self._jobs = []
+        self._worker = None
+        self.batches = 0
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.largest_batch = 0
+
+    def submit(self, fn, exclusive=False):
+        """
+        Runs fn(conn) on the writer thread inside its batch's transaction
+        and waits for the batch to commit. Returns fn's result or raises its
+        exception (or the commit's sqlite3.Error). fn must not commit or
+        roll back itself. An exclusive job runs alone and outside any
+        transaction, for statements such as VACUUM.
+        """
+        job = _Job(fn, exclusive)
+        with self._cond:
+            self._jobs.append(job)
+            self._ensure_worker()
+            self._cond.notify_all()
+        job.done.wait()
+        metrics.add_counts(*job.counts)
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def status(self):
+        with self._cond:
+            return {
+                "queued": len(self._jobs),
+                "batches": self.batches,
+                "jobs": self.jobs,
+                "failed_jobs": self.failed_jobs,
+                "largest_batch": self.largest_batch,
+                "window": self.window,
+                "max_batch": self.max_batch,
+            }
+
+    # --- Writer thread ---
+    def _ensure_worker(self):
+        # Started lazily, so a gunicorn worker forked after import gets its own.
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._loop, name="write-queue", daemon=True
+            )
+            self._worker.start()
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._jobs)
+            if self._jobs[0].exclusive:
+                return [self._jobs.pop(0)]
+            deadline = time.monotonic() + self.window
+            while len(self._jobs) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or any(job.exclusive for job in self._jobs):
+                    break
+                self._cond.wait(remaining)
+            batch = []
+            while self._jobs and len(batch) < self.max_batch and not self._jobs[0].exclusive:
+                batch.append(self._jobs.pop(0))
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            conn = database.connect(self.db_path)
+            try:
+                if batch[0].exclusive:
+                    self._run_exclusive(conn, batch[0])
+                else:
+                    self._run_batch(conn, batch)
+            finally:
+                database.release(conn)
+                with self._cond:
+                    self.batches += 1
+                    self.jobs += len(batch)
+                    self.failed_jobs += sum(job.error is not None for job in batch)
+                    self.largest_batch = max(self.largest_batch, len(batch))
+                if self.on_commit and any(job.error is None for job in batch):
+                    self.on_commit()
+                for job in batch:
+                    job.done.set()
+
+    def _run_exclusive(self, conn, job):
+        metrics.take_counts()
+        try:
+            job.result = job.fn(conn)
+            if conn.in_transaction:
+                conn.commit()
+        except Exception as e:
+            job.error = e
+        job.counts = metrics.take_counts()
+
+    def _run_batch(self, conn, batch):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in batch:
+                metrics.take_counts()
+                conn.execute("SAVEPOINT job")
+                try:
+                    job.result = job.fn(conn)
+                except Exception as e:
+                    job.error = e
+                    conn.execute("ROLLBACK TO job")
+                conn.execute("RELEASE job")
+                job.counts = metrics.take_counts()
+            conn.commit()
+        except sqlite3.Error as e:
+            # The transaction itself failed (lock timeout, commit error):
+            # nothing in the batch was written.
+            if conn.in_transaction:
+                conn.rollback()
+            for job in batch:
+                job.result = None
+                if job.error is None:
+                    job.error = e
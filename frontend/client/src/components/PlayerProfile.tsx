@@ -1,6 +1,7 @@
-import { useState, useEffect } from "react";
+import { useState } from "react";
+import { useQuery } from "@tanstack/react-query";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
-import { PlayerWithStats, Game } from "@/lib/api";
+import { PlayerWithStats, Game, HeadToHeadResponse } from "@/lib/api";
 import PlayerStats from "./PlayerStats";
 import GamesList from "./GamesList";
 import PlayerBadges from "./PlayerBadges";
@@ -13,30 +14,22 @@ interface PlayerProfileProps {
 
 export default function PlayerProfile({ player, playerGames, otherPlayers }: PlayerProfileProps) {
   const [compareUsername, setCompareUsername] = useState<string>("");
-  const [headToHead, setHeadToHead] = useState<{ player1Wins: number; player2Wins: number }>({ player1Wins: 0, player2Wins: 0 });
   const comparePlayer = otherPlayers.find(p => p.username === compareUsername);
 
+  // Head-to-head records are maintained by the server, one lookup per player
+  const { data: headToHeadData } = useQuery<HeadToHeadResponse>({
+    queryKey: [`/api/head_to_head/${encodeURIComponent(player.username)}`],
+  });
+  const matchup = headToHeadData?.opponents.find(record => record.opponent === compareUsername);
+  const headToHead = {
+    player1Wins: matchup?.wins ?? 0,
+    player2Wins: matchup?.losses ?? 0,
+  };
+
   const filterGames = (games: Game[], username: string) => {
     return games.filter(game => game.players.includes(username));
   };
   
-  // Calculate head-to-head stats when a player is selected for comparison
-  useEffect(() => {
-    if (comparePlayer) {
-      // Find games where both players participated
-      const matchups = playerGames.filter(game => 
-        game.players.includes(player.username) && 
-        game.players.includes(comparePlayer.username)
-      );
-      
-      // Count wins for each player
-      const player1Wins = matchups.filter(game => game.winner === player.username).length;
-      const player2Wins = matchups.filter(game => game.winner === comparePlayer.username).length;
-      
-      setHeadToHead({ player1Wins, player2Wins });
-    }
-  }, [compareUsername, player, comparePlayer, playerGames]);
-
   return (
     <div className="bg-white rounded-lg shadow-md p-6 mb-8">
       <div className="flex flex-col md:flex-row items-start md:items-center justify-between mb-6">
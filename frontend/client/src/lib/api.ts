@@ -34,6 +34,28 @@ export interface APIResponse {
   players: Player[] | Record<string, Player>;
 }
 
+// Players with server-computed season stats, already ranked by ELO.
+export interface LeaderboardResponse {
+  season: number;
+  players: PlayerWithStats[];
+}
+
+export interface HeadToHeadRecord {
+  player: string;
+  opponent: string;
+  wins: number;
+  losses: number;
+  games: number;
+  last_played: number | null;
+  last_game_id: number;
+}
+
+export interface HeadToHeadResponse {
+  username: string;
+  season: number;
+  opponents: HeadToHeadRecord[];
+}
+
 export const fetchData = async (): Promise<APIResponse> => {
   const response = await fetch("/api/get_data");
   if (!response.ok) {
@@ -41,3 +63,33 @@ export const fetchData = async (): Promise<APIResponse> => {
   }
   return response.json();
 };
+
+export interface GamesPage {
+  games: Game[];
+  next_cursor: number | null;
+}
+
+export interface GamesPageParams {
+  player?: string;
+  winner?: string;
+  season?: number;
+  order?: "asc" | "desc";
+  cursor?: number | null;
+  limit?: number;
+}
+
+// Server-side filtered, keyset-paginated games. Pass the previous page's
+// next_cursor to fetch the following page.
+export const fetchGamesPage = async (params: GamesPageParams = {}): Promise<GamesPage> => {
+  const query = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== "") {
+      query.set(key, String(value));
+    }
+  });
+  const response = await fetch(`/api/games?${query.toString()}`);
+  if (!response.ok) {
+    throw new Error("Failed to fetch games");
+  }
+  return response.json();
+};
@@ -6,15 +6,24 @@ import GamesList from "@/components/GamesList";
 import Leaderboard from "@/components/Leaderboard";
 import Pagination from "@/components/Pagination";
 import { Card } from "@/components/ui/card";
-import { calculatePlayerStats } from "@/lib/utils";
+import { LeaderboardResponse } from "@/lib/api";
 
 export default function Dashboard() {
   const [gamesPage, setGamesPage] = useState(1);
   const gamesPerPage = 5;
 
-  const { data, isLoading, error } = useQuery({
+  const { data, isLoading: gamesLoading, error: gamesError } = useQuery({
     queryKey: ["/api/get_data"],
   });
+  const {
+    data: leaderboard,
+    isLoading: leaderboardLoading,
+    error: leaderboardError,
+  } = useQuery<LeaderboardResponse>({
+    queryKey: ["/api/leaderboard"],
+  });
+  const isLoading = gamesLoading || leaderboardLoading;
+  const error = gamesError || leaderboardError;
 
   if (isLoading) {
     return (
@@ -35,10 +44,10 @@ export default function Dashboard() {
     );
   }
 
-  const { games, players } = data;
+  const { games } = data;
   
-  // Process players data to include wins, losses, etc.
-  const playersWithStats = calculatePlayerStats(players, games);
+  // Wins, losses, etc. are computed by the server
+  const playersWithStats = leaderboard?.players ?? [];
   
   // Sort players by ELO for the leaderboard
   const sortedPlayers = [...playersWithStats].sort((a, b) => b.elo - a.elo);
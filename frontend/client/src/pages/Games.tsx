@@ -1,22 +1,56 @@
 import { useState } from "react";
-import { useQuery } from "@tanstack/react-query";
-import { Input } from "@/components/ui/input";
+import { keepPreviousData, useQuery } from "@tanstack/react-query";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 import { Card } from "@/components/ui/card";
 import Pagination from "@/components/Pagination";
-import { Game } from "@/lib/api";
+import { Game, GamesPageParams, LeaderboardResponse, fetchGamesPage } from "@/lib/api";
 
 export default function Games() {
-  const [searchTerm, setSearchTerm] = useState("");
   const [playerFilter, setPlayerFilter] = useState("all");
+  const [winnerFilter, setWinnerFilter] = useState("all");
   const [sortOrder, setSortOrder] = useState<"latest" | "oldest">("latest");
   const [currentPage, setCurrentPage] = useState(1);
+  // cursors[i] is the cursor that fetches page i + 1; page 1 has none.
+  // /api/games pages by keyset, so only pages already reached (and the one
+  // after the last of them) can be offered.
+  const [cursors, setCursors] = useState<(number | null)[]>([null]);
   const gamesPerPage = 10;
 
-  const { data, isLoading, error } = useQuery({
-    queryKey: ["/api/get_data"],
+  const params: GamesPageParams = {
+    player: playerFilter === "all" ? undefined : playerFilter,
+    winner: winnerFilter === "all" ? undefined : winnerFilter,
+    order: sortOrder === "latest" ? "desc" : "asc",
+    cursor: cursors[currentPage - 1],
+    limit: gamesPerPage,
+  };
+
+  // Keeps showing the current page, filters and pager while the next
+  // page or filter result loads, instead of the full-view spinner.
+  const { data, isLoading, isPlaceholderData, error } = useQuery({
+    queryKey: ["/api/games", params],
+    queryFn: () => fetchGamesPage(params),
+    placeholderData: keepPreviousData,
+  });
+  const { data: leaderboard } = useQuery<LeaderboardResponse>({
+    queryKey: ["/api/leaderboard"],
   });
 
+  // Any filter change starts again from the first page.
+  const changeFilter = (setter: (value: string) => void) => (value: string) => {
+    setter(value);
+    setCurrentPage(1);
+    setCursors([null]);
+  };
+
+  const changePage = (page: number) => {
+    // While the previous page stands in, its next_cursor is not this page's.
+    if (isPlaceholderData) return;
+    if (page === cursors.length + 1 && data?.next_cursor != null) {
+      setCursors([...cursors, data.next_cursor]);
+    }
+    setCurrentPage(page);
+  };
+
   if (isLoading) {
     return (
       <div className="flex justify-center items-center h-96">
@@ -25,7 +59,7 @@ export default function Games() {
     );
   }
 
-  if (error) {
+  if (error || !data) {
     return (
       <Card className="p-6">
         <div className="text-center text-danger">
@@ -36,33 +70,10 @@ export default function Games() {
     );
   }
 
-  const { games, players } = data;
-  const playersArray = Array.isArray(players) ? players : Object.values(players);
-
-  // Filter games based on search term and player filter
-  const filteredGames = games.filter((game: Game) => {
-    const matchesSearch =
-      game.id.toString().includes(searchTerm) ||
-      game.players.some(player => player.toLowerCase().includes(searchTerm.toLowerCase())) ||
-      game.winner.toLowerCase().includes(searchTerm.toLowerCase());
-
-    const matchesPlayer = playerFilter === "all" ||
-      game.players.includes(playerFilter);
-
-    return matchesSearch && matchesPlayer;
-  });
-
-  // Sort games based on selected option
-  const sortedGames = [...filteredGames].sort((a: Game, b: Game) => {
-    const idA = typeof a.id === 'number' ? a.id : parseInt(a.id);
-    const idB = typeof b.id === 'number' ? b.id : parseInt(b.id);
-    return sortOrder === "latest" ? idB - idA : idA - idB;
-  });
-
-  // Paginate games
-  const indexOfLastGame = currentPage * gamesPerPage;
-  const indexOfFirstGame = indexOfLastGame - gamesPerPage;
-  const currentGames = sortedGames.slice(indexOfFirstGame, indexOfLastGame);
+  const currentGames = data.games;
+  const playersArray = leaderboard?.players ?? [];
+  const totalPages =
+    currentPage === cursors.length && data.next_cursor != null ? cursors.length + 1 : cursors.length;
 
   // Format date for display
   const formatDate = (date: string | null) => {
@@ -75,27 +86,36 @@ export default function Games() {
       <div className="flex flex-col md:flex-row justify-between items-start md:items-center mb-6">
         <h2 className="text-xl font-semibold text-slate-800 mb-4 md:mb-0">All Games</h2>
         <div className="flex flex-wrap gap-2">
-          <Input
-            type="text"
-            placeholder="Search games"
-            value={searchTerm}
-            onChange={(e) => setSearchTerm(e.target.value)}
-            className="w-full md:w-auto"
-          />
-          <Select value={playerFilter} onValueChange={setPlayerFilter}>
+          <Select value={playerFilter} onValueChange={changeFilter(setPlayerFilter)}>
             <SelectTrigger className="w-[150px]">
               <SelectValue placeholder="All Players" />
             </SelectTrigger>
             <SelectContent>
               <SelectItem value="all">All Players</SelectItem>
-              {playersArray.map((player: any) => (
+              {playersArray.map((player) => (
+                <SelectItem key={player.username} value={player.username}>
+                  {player.username}
+                </SelectItem>
+              ))}
+            </SelectContent>
+          </Select>
+          <Select value={winnerFilter} onValueChange={changeFilter(setWinnerFilter)}>
+            <SelectTrigger className="w-[150px]">
+              <SelectValue placeholder="Any Winner" />
+            </SelectTrigger>
+            <SelectContent>
+              <SelectItem value="all">Any Winner</SelectItem>
+              {playersArray.map((player) => (
                 <SelectItem key={player.username} value={player.username}>
                   {player.username}
                 </SelectItem>
               ))}
             </SelectContent>
           </Select>
-          <Select value={sortOrder} onValueChange={(value: string) => setSortOrder(value as "latest" | "oldest")}>
+          <Select
+            value={sortOrder}
+            onValueChange={changeFilter((value: string) => setSortOrder(value as "latest" | "oldest"))}
+          >
             <SelectTrigger className="w-[150px]">
               <SelectValue placeholder="Sort Order" />
             </SelectTrigger>
@@ -149,17 +169,17 @@ export default function Games() {
         </table>
       </div>
 
-      {filteredGames.length === 0 && (
+      {currentGames.length === 0 && (
         <div className="text-center py-8 text-slate-500">
           No games found matching your criteria.
         </div>
       )}
 
-      {filteredGames.length > 0 && (
+      {currentGames.length > 0 && (
         <Pagination
           currentPage={currentPage}
-          totalPages={Math.ceil(filteredGames.length / gamesPerPage)}
-          onPageChange={setCurrentPage}
+          totalPages={totalPages}
+          onPageChange={changePage}
         />
       )}
     </div>
@@ -2,15 +2,24 @@ import { useQuery } from "@tanstack/react-query";
 import { useParams, useLocation } from "wouter";
 import { Card } from "@/components/ui/card";
 import PlayerProfile from "@/components/PlayerProfile";
-import { calculatePlayerStats } from "@/lib/utils";
+import { LeaderboardResponse } from "@/lib/api";
 
 export default function PlayerDetail() {
   const { username } = useParams();
   const [, setLocation] = useLocation();
 
-  const { data, isLoading, error } = useQuery({
+  const { data, isLoading: gamesLoading, error: gamesError } = useQuery({
     queryKey: ["/api/get_data"],
   });
+  const {
+    data: leaderboard,
+    isLoading: leaderboardLoading,
+    error: leaderboardError,
+  } = useQuery<LeaderboardResponse>({
+    queryKey: ["/api/leaderboard"],
+  });
+  const isLoading = gamesLoading || leaderboardLoading;
+  const error = gamesError || leaderboardError;
 
   if (isLoading) {
     return (
@@ -31,10 +40,10 @@ export default function PlayerDetail() {
     );
   }
 
-  const { games, players } = data;
+  const { games } = data;
   
-  // Process players data to include wins, losses, etc.
-  const playersWithStats = calculatePlayerStats(players, games);
+  // Wins, losses, etc. are computed by the server
+  const playersWithStats = leaderboard?.players ?? [];
   
   // Find the selected player
   const player = playersWithStats.find(p => p.username === username);
@@ -4,7 +4,7 @@ import { Input } from "@/components/ui/input";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 import { Card, CardContent } from "@/components/ui/card";
 import PlayerCard from "@/components/PlayerCard";
-import { calculatePlayerStats } from "@/lib/utils";
+import { LeaderboardResponse } from "@/lib/api";
 
 type SortOption = "elo" | "winRate" | "gamesPlayed" | "alphabetical";
 
@@ -12,8 +12,8 @@ export default function Players() {
   const [searchTerm, setSearchTerm] = useState("");
   const [sortBy, setSortBy] = useState<SortOption>("elo");
 
-  const { data, isLoading, error } = useQuery({
-    queryKey: ["/api/get_data"],
+  const { data, isLoading, error } = useQuery<LeaderboardResponse>({
+    queryKey: ["/api/leaderboard"],
   });
 
   if (isLoading) {
@@ -35,10 +35,8 @@ export default function Players() {
     );
   }
 
-  const { games, players } = data;
-  
-  // Process players data to include wins, losses, etc.
-  const playersWithStats = calculatePlayerStats(players, games);
+  // Wins, losses, etc. are computed by the server
+  const playersWithStats = data?.players ?? [];
   
   // Filter players based on search term
   const filteredPlayers = playersWithStats.filter(player => 
@@ -60,6 +60,93 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // API endpoint for one page of games (filters and cursor in the query string)
+  app.get("/api/games", async (req, res) => {
+    try {
+      // Attempt to forward the request to the Python server
+      const response = await axios.get("http://localhost:3000/api/games", {
+        params: req.query,
+        timeout: 1000,
+      });
+      res.json(response.data);
+    } catch (error) {
+      // When Python server is not available, page through the sample data
+      console.log("Using sample table tennis data for games");
+      const { player, winner, order = "desc", cursor, limit = "20" } = req.query as Record<string, string>;
+      const pageSize = Number(limit);
+      const games = sampleData.games
+        .filter(game => !player || game.players.includes(player))
+        .filter(game => !winner || game.winner === winner)
+        .filter(game => !cursor || (order === "asc" ? game.id > Number(cursor) : game.id < Number(cursor)))
+        .sort((a, b) => (order === "asc" ? a.id - b.id : b.id - a.id));
+      const page = games.slice(0, pageSize);
+      const nextCursor = games.length > pageSize ? page[page.length - 1].id : null;
+      return res.json({ games: page, next_cursor: nextCursor });
+    }
+  });
+
+  // API endpoint for the leaderboard (players with season stats)
+  app.get("/api/leaderboard", async (req, res) => {
+    try {
+      // Attempt to forward the request to the Python server
+      const response = await axios.get("http://localhost:3000/api/leaderboard", { timeout: 1000 });
+      res.json(response.data);
+    } catch (error) {
+      // When Python server is not available, derive stats from the sample data
+      console.log("Using sample table tennis data for leaderboard");
+      const players = Object.values(sampleData.players)
+        .map(player => {
+          const playerGames = sampleData.games.filter(game => game.players.includes(player.username));
+          const wins = playerGames.filter(game => game.winner === player.username).length;
+          return {
+            ...player,
+            wins,
+            losses: playerGames.length - wins,
+            winRate: playerGames.length > 0 ? Math.round((wins / playerGames.length) * 100) : 0,
+            gamesPlayed: playerGames.length,
+          };
+        })
+        .sort((a, b) => b.elo - a.elo)
+        .map((player, index) => ({ ...player, rank: index + 1 }));
+      return res.json({ season: 0, players });
+    }
+  });
+
+  // API endpoint for one player's head-to-head records
+  app.get("/api/head_to_head/:username", async (req, res) => {
+    try {
+      // Attempt to forward the request to the Python server
+      const response = await axios.get(
+        `http://localhost:3000/api/head_to_head/${encodeURIComponent(req.params.username)}`,
+        { timeout: 1000 },
+      );
+      res.json(response.data);
+    } catch (error) {
+      // When Python server is not available, derive records from the sample data
+      console.log("Using sample table tennis data for head-to-head");
+      const username = req.params.username;
+      const records: Record<string, { wins: number; losses: number; last_game_id: number }> = {};
+      sampleData.games
+        .filter(game => game.players.includes(username))
+        .forEach(game => {
+          const opponent = game.players.find(p => p !== username) as string;
+          const record = records[opponent] || { wins: 0, losses: 0, last_game_id: 0 };
+          if (game.winner === username) record.wins += 1;
+          else record.losses += 1;
+          record.last_game_id = Math.max(record.last_game_id, game.id);
+          records[opponent] = record;
+        });
+      const opponents = Object.entries(records).map(([opponent, record]) => ({
+        player: username,
+        opponent,
+        ...record,
+        games: record.wins + record.losses,
+        last_played: null,
+      }));
+      return res.json({ username, season: 0, opponents });
+    }
+  });
+
   // API endpoint for tournaments
   app.get("/api/get_tournaments", async (req, res) => {
     try {